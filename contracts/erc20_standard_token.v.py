@@ -13,6 +13,11 @@
 # 
 # See https://github.com/OpenZeppelin
 # Open Zeppelin tests ported: BasicToken.test.js, DetailedERC20.test.js, MintableToken.behaviour.js, MintableToken.test.js, StandardToken.test.js
+
+#@dev Features referenced by this contract
+contract TokenReceiver:
+    def onTokenTransfer(_from: address, _value: uint256, _data: bytes[1024]) -> bool: modifying
+
 Transfer: event({_from: indexed(address), _to: indexed(address), _value: uint256})
 Approval: event({_owner: indexed(address), _spender: indexed(address), _value: uint256})
 
@@ -60,6 +65,31 @@ def transfer(_to: address, _value: uint256) -> bool:
     return True
 
 
+@public
+def transferAndCall(_to: address, _value: uint256, _data: bytes[1024]) -> bool:
+    """
+    @notice Transfers tokens and notifies the destination contract in the same
+    transaction (ERC-677). When the destination is a contract its
+    onTokenTransfer function is called and must return true.
+    @param _to The destination wallet or contract address.
+    @param _value The amount of tokens to send to the destination address.
+    @param _data The data passed on to the destination contract.
+    """
+
+    assert _value <= self.balances[msg.sender], "You do not have sufficient balance to transfer these many tokens."
+    assert _to != ZERO_ADDRESS, "Invalid address"
+
+    self.balances[msg.sender] -= _value
+    self.balances[_to] += _value
+
+    log.Transfer(msg.sender, _to, _value)
+
+    if _to.is_contract:
+        assert TokenReceiver(_to).onTokenTransfer(msg.sender, _value, _data), "The recipient contract did not accept the tokens."
+
+    return True
+
+
 @public
 def transferFrom(_from: address, _to: address, _value: uint256) -> bool:
     """
@@ -80,6 +110,77 @@ def transferFrom(_from: address, _to: address, _value: uint256) -> bool:
     log.Transfer(_from, _to, _value)
     return True
 
+@private
+def spendAllowance(_from: address, _spender: address, _value: uint256) -> bool:
+    """
+    @notice Debits tokens of a holder spent by an approved spender.
+    @return True. Private functions without a return value cannot be called in a loop.
+    """
+
+    assert _value <= self.balances[_from], "The specified account does not have sufficient balance to transfer these many tokens."
+    assert _value <= self.allowed[_from][_spender], "You don't have approval to transfer these many tokens."
+
+    self.balances[_from] -= _value
+    self.allowed[_from][_spender] -= _value
+
+    return True
+
+
+@private
+def receiveTokens(_from: address, _to: address, _value: uint256) -> bool:
+    """
+    @notice Credits tokens debited from a holder.
+    @return True. Private functions without a return value cannot be called in a loop.
+    """
+
+    assert _to != ZERO_ADDRESS, "Invalid address"
+
+    self.balances[_to] += _value
+    log.Transfer(_from, _to, _value)
+    return True
+
+
+@public
+def batchTransferFrom(_from: address[10], _to: address[10], _value: uint256[10]) -> bool:
+    """
+    @notice Transfers tokens from up to ten wallet addresses which approved the sender.
+    The entries of every distinct holder are added up first, so that its balance
+    and allowance are checked and written once. Unused entries have the zero
+    address as the holder. The whole batch reverts when a holder has not
+    approved or does not have the sum of its entries.
+    @param _from The addresses to transfer funds from.
+    @param _to The addresses to transfer funds to.
+    @param _value The amounts of tokens to transfer.
+    """
+
+    _total: uint256
+    _seen: bool
+
+    for i in range(10):
+        if _from[i] == ZERO_ADDRESS:
+            continue
+
+        _seen = False
+        _total = 0
+
+        for j in range(10):
+            if _from[j] == _from[i]:
+                _seen = _seen or j < i
+                _total += _value[j]
+
+        if _seen:
+            continue
+
+        assert self.spendAllowance(_from[i], msg.sender, _total)
+
+    for i in range(10):
+        if _from[i] == ZERO_ADDRESS:
+            continue
+
+        assert self.receiveTokens(_from[i], _to[i], _value[i])
+
+    return True
+
 @public
 def approve(_spender: address, _amount: uint256) -> bool:
     """
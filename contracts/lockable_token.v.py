@@ -12,6 +12,10 @@
 # 
 # See https://github.com/OpenZeppelin
 
+#@dev Features referenced by this contract
+contract TokenReceiver:
+    def onTokenTransfer(_from: address, _value: uint256, _data: bytes[1024]) -> bool: modifying
+
 #OWNABLE
 OwnershipRenounced: event({_previousOwner: indexed(address)})
 OwnershipTransferred: event({_previousOwner: indexed(address), _newOwner: indexed(address)})
@@ -38,6 +42,16 @@ MintFinished: event()
 #BURNABLE
 Burn: event({_burner: indexed(address), _value: uint256})
 
+#SNAPSHOT
+Snapshot: event({_id: uint256})
+
+#DELEGATION
+DelegateChanged: event({_delegator: indexed(address), _fromDelegate: indexed(address), _toDelegate: indexed(address)})
+DelegateVotesChanged: event({_delegate: indexed(address), _previousBalance: uint256, _newBalance: uint256})
+
+#META TRANSACTIONS
+TransferBySig: event({_from: indexed(address), _relayer: indexed(address), _nonce: uint256})
+
 #RECLAIMABLE
 EtherClaimed: event() #todo
 TokenReclaimed: event() #todo
@@ -67,6 +81,25 @@ allowed: public(map(address, map(address, uint256)))
 #MINTABLE
 mintingFinished: public(bool)
 
+#SNAPSHOT
+currentSnapshotId: public(uint256)
+accountSnapshotIds: map(address, map(uint256, uint256))
+accountSnapshotValues: map(address, map(uint256, uint256))
+accountSnapshotCount: map(address, uint256)
+totalSupplySnapshotIds: map(uint256, uint256)
+totalSupplySnapshotValues: map(uint256, uint256)
+totalSupplySnapshotCount: uint256
+
+#DELEGATION
+delegates: public(map(address, address))
+checkpointBlocks: map(address, map(uint256, uint256))
+checkpointVotes: map(address, map(uint256, uint256))
+numCheckpoints: public(map(address, uint256))
+
+#META TRANSACTIONS
+domainSeparator: public(bytes32)
+nonces: public(map(address, uint256))
+
 
 
 #OWNABLE
@@ -74,6 +107,16 @@ mintingFinished: public(bool)
 # The ownable feature provides basic authorization control functions 
 # and simplifies the implementation of "user permissions".
 
+@private
+@constant
+def assertIsOwner(_who: address):
+    """
+    @notice Reverts if the supplied address is not the owner.
+    @param _who The address to check.
+    """
+
+    assert _who == self.owner, "Access is denied."
+
 @public
 def renounceOwnership():
     """
@@ -83,7 +126,7 @@ def renounceOwnership():
     modifier anymore.
     """
 
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert not self.paused, "You may not renounce ownership when the contract is paused."
 
     log.OwnershipRenounced(msg.sender)
@@ -95,7 +138,7 @@ def transferOwnership(_newOwner: address):
     @dev Allows the current owner to transfer control of the contract to a newOwner.
     @param _newOwner The address to transfer ownership to.
     """
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert not self.paused, "You may not transfer ownership when the contract is paused."
     assert _newOwner != ZERO_ADDRESS, "Invalid owner supplied."
 
@@ -118,6 +161,16 @@ def isAdmin(_who: address) -> bool:
 
     return self.admins[_who]
 
+@private
+@constant
+def assertIsAdmin(_who: address):
+    """
+    @notice Reverts if the supplied address is not an administrator.
+    @param _who The address to check.
+    """
+
+    assert self.isAdmin(_who), "Access is denied."
+
 
 @public
 def addAdmin(_address: address) -> bool:
@@ -157,13 +210,22 @@ def removeAdmin(_address: address) -> bool:
 # This feature enables you to create pausable mechanism 
 # to stop in case of emergency.
 
+@private
+@constant
+def assertNotPaused():
+    """
+    @notice Reverts if the contract is paused.
+    """
+
+    assert not self.paused, "Sorry but the contract is paused."
+
 @public
 def pause():
     """
     @notice Pauses the contract
     """
 
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert not self.paused, "The contract is already paused."
 
     self.paused = True
@@ -175,7 +237,7 @@ def unpause():
     @notice Unpauses the contract.
     """
 
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert self.paused, "The contract is already unpaused."
 
     self.paused = False
@@ -197,12 +259,22 @@ def canTransfer(_who: address) -> bool:
  
     return True
 
+@private
+@constant
+def assertCanTransfer(_who: address):
+    """
+    @notice Reverts if the supplied address is not able to perform transfers.
+    @param _who The address to check against if the transfer is allowed.
+    """
+
+    assert self.canTransfer(_who), "Could not complete this request because transfer state is locked or paused."
+
 @public
 def enableTransfers():
     """
     @notice This function enables token transfers for everyone.
     """
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert not self.paused, "You cannot enable transfers when contract is paused."
     assert self.transferLocked, "The transfer state is already enabled."
 
@@ -215,7 +287,7 @@ def disableTransfers():
     @notice This function disables token transfers for everyone.
     """
 
-    assert msg.sender == self.owner, "Access is denied."
+    self.assertIsOwner(msg.sender)
     assert not self.paused, "You cannot disable transfers when contract is paused."
     assert not self.transferLocked, "The transfer state is already disabled."
 
@@ -223,11 +295,254 @@ def disableTransfers():
     log.TokenReleased(True)
 
 
+#SNAPSHOT
+# Balances and the total supply are recorded lazily: the value of an account
+# is only written when it changes for the first time after a snapshot.
+
+@private
+def updateAccountSnapshot(_account: address):
+    """
+    @notice Records the balance of an account before it changes for the first time after a snapshot.
+    @param _account The account whose balance is about to change.
+    """
+
+    _current: uint256 = self.currentSnapshotId
+
+    if _current > 0:
+        _count: uint256 = self.accountSnapshotCount[_account]
+        _last: uint256 = 0
+
+        if _count > 0:
+            _last = self.accountSnapshotIds[_account][_count - 1]
+
+        if _last < _current:
+            self.accountSnapshotIds[_account][_count] = _current
+            self.accountSnapshotValues[_account][_count] = self.balances[_account]
+            self.accountSnapshotCount[_account] = _count + 1
+
+@private
+def updateTotalSupplySnapshot():
+    """
+    @notice Records the total supply before it changes for the first time after a snapshot.
+    """
+
+    _current: uint256 = self.currentSnapshotId
+
+    if _current > 0:
+        _count: uint256 = self.totalSupplySnapshotCount
+        _last: uint256 = 0
+
+        if _count > 0:
+            _last = self.totalSupplySnapshotIds[_count - 1]
+
+        if _last < _current:
+            self.totalSupplySnapshotIds[_count] = _current
+            self.totalSupplySnapshotValues[_count] = self.totalSupply
+            self.totalSupplySnapshotCount = _count + 1
+
+@public
+def snapshot() -> uint256:
+    """
+    @notice Creates a new snapshot of the balances and the total supply.
+    @return The id of the new snapshot.
+    """
+
+    self.assertIsAdmin(msg.sender)
+
+    self.currentSnapshotId += 1
+    log.Snapshot(self.currentSnapshotId)
+
+    return self.currentSnapshotId
+
+@public
+@constant
+def balanceOfAt(_owner: address, _snapshotId: uint256) -> uint256:
+    """
+    @notice Returns the balance of an account at the time a snapshot was created.
+    @param _owner The address to query the balance of.
+    @param _snapshotId The id of the snapshot.
+    """
+
+    assert _snapshotId > 0 and _snapshotId <= self.currentSnapshotId, "Invalid snapshot id."
+
+    # Finds the first checkpoint recorded on or after the snapshot.
+    _count: uint256 = self.accountSnapshotCount[_owner]
+    _low: uint256 = 0
+    _high: uint256 = _count
+    _middle: uint256
+
+    for i in range(256):
+        if _low >= _high:
+            break
+
+        _middle = (_low + _high) / 2
+
+        if self.accountSnapshotIds[_owner][_middle] >= _snapshotId:
+            _high = _middle
+        else:
+            _low = _middle + 1
+
+    if _low == _count:
+        return self.balances[_owner]
+
+    return self.accountSnapshotValues[_owner][_low]
+
+@public
+@constant
+def totalSupplyAt(_snapshotId: uint256) -> uint256:
+    """
+    @notice Returns the total supply at the time a snapshot was created.
+    @param _snapshotId The id of the snapshot.
+    """
+
+    assert _snapshotId > 0 and _snapshotId <= self.currentSnapshotId, "Invalid snapshot id."
+
+    _count: uint256 = self.totalSupplySnapshotCount
+    _low: uint256 = 0
+    _high: uint256 = _count
+    _middle: uint256
+
+    for i in range(256):
+        if _low >= _high:
+            break
+
+        _middle = (_low + _high) / 2
+
+        if self.totalSupplySnapshotIds[_middle] >= _snapshotId:
+            _high = _middle
+        else:
+            _low = _middle + 1
+
+    if _low == _count:
+        return self.totalSupply
+
+    return self.totalSupplySnapshotValues[_low]
+
+
+#DELEGATION
+# Holders delegate the voting power of their balance to a delegate, which
+# may be themselves. The votes of every delegate are checkpointed per block,
+# and checkpoints are only written when the votes of a delegate change.
+
+@private
+def writeCheckpoint(_delegate: address, _newVotes: uint256):
+    """
+    @notice Records the votes of a delegate at the current block.
+    @param _delegate The delegate whose votes changed.
+    @param _newVotes The votes after the change.
+    """
+
+    _count: uint256 = self.numCheckpoints[_delegate]
+    _current: uint256 = block.number
+    _last: uint256 = 0
+
+    if _count > 0:
+        _last = self.checkpointBlocks[_delegate][_count - 1]
+
+    if _count > 0 and _last == _current:
+        self.checkpointVotes[_delegate][_count - 1] = _newVotes
+    else:
+        self.checkpointBlocks[_delegate][_count] = _current
+        self.checkpointVotes[_delegate][_count] = _newVotes
+        self.numCheckpoints[_delegate] = _count + 1
+
+@private
+@constant
+def currentVotes(_account: address) -> uint256:
+    _count: uint256 = self.numCheckpoints[_account]
+
+    if _count == 0:
+        return 0
+
+    return self.checkpointVotes[_account][_count - 1]
+
+@private
+def moveDelegates(_from: address, _to: address, _amount: uint256):
+    """
+    @notice Moves votes between delegates when delegated tokens move.
+    @param _from The delegate losing votes, or the zero address.
+    @param _to The delegate gaining votes, or the zero address.
+    @param _amount The number of votes to move.
+    """
+
+    _votes: uint256
+
+    if _from != _to and _amount > 0:
+        if _from != ZERO_ADDRESS:
+            _votes = self.currentVotes(_from)
+            self.writeCheckpoint(_from, _votes - _amount)
+            log.DelegateVotesChanged(_from, _votes, _votes - _amount)
+
+        if _to != ZERO_ADDRESS:
+            _votes = self.currentVotes(_to)
+            self.writeCheckpoint(_to, _votes + _amount)
+            log.DelegateVotesChanged(_to, _votes, _votes + _amount)
+
+@public
+def delegate(_delegatee: address):
+    """
+    @notice Delegates the votes of the sender's balance to the supplied address.
+    Delegate to the zero address to stop delegating.
+    @param _delegatee The address which receives the votes.
+    """
+
+    _previous: address = self.delegates[msg.sender]
+    self.delegates[msg.sender] = _delegatee
+
+    log.DelegateChanged(msg.sender, _previous, _delegatee)
+
+    self.moveDelegates(_previous, _delegatee, self.balances[msg.sender])
+
+@public
+@constant
+def getCurrentVotes(_account: address) -> uint256:
+    """
+    @notice Returns the current votes of an account.
+    @param _account The address to query the votes of.
+    """
+
+    return self.currentVotes(_account)
+
+@public
+@constant
+def getPriorVotes(_account: address, _blockNumber: uint256) -> uint256:
+    """
+    @notice Returns the votes of an account at the end of a past block.
+    @param _account The address to query the votes of.
+    @param _blockNumber The block number, which must be lower than the current block.
+    """
+
+    assert _blockNumber < block.number, "The votes of this block are not final yet."
+
+    # Finds the first checkpoint recorded after the block.
+    _low: uint256 = 0
+    _high: uint256 = self.numCheckpoints[_account]
+    _middle: uint256
+
+    for i in range(256):
+        if _low >= _high:
+            break
+
+        _middle = (_low + _high) / 2
+
+        if self.checkpointBlocks[_account][_middle] > _blockNumber:
+            _high = _middle
+        else:
+            _low = _middle + 1
+
+    if _low == 0:
+        return 0
+
+    return self.checkpointVotes[_account][_low - 1]
+
+
 #ERC 20
 @public
-def __init__(_name: bytes32, _symbol: bytes32, _totalSupply: uint256, _maximumSupply: uint256, _decimals: int128):
+def __init__(_name: bytes32, _symbol: bytes32, _totalSupply: uint256, _maximumSupply: uint256, _decimals: int128, _chainId: uint256):
     """
     @dev Initializes this contract.
+    @param _chainId The id of the chain this contract is deployed to,
+    which is part of the EIP-712 domain of signed transfers.
     """
 
     assert _maximumSupply >= _totalSupply, "Sorry but the total supply cannot be more than maximum supply."
@@ -243,12 +558,49 @@ def __init__(_name: bytes32, _symbol: bytes32, _totalSupply: uint256, _maximumSu
     self.paused = False
     self.transferLocked = True
 
+    self.domainSeparator = keccak256(concat(
+        keccak256("EIP712Domain(uint256 chainId,address verifyingContract)"),
+        convert(_chainId, bytes32),
+        convert(self, bytes32)
+    ))
+
 
 @public
 @constant
 def balanceOf(_owner: address) -> uint256:
     return self.balances[_owner]
 
+@private
+def transferTokens(_from: address, _to: address, _amount: uint256) -> bool:
+    """
+    @notice Moves tokens between two accounts if the sender has enough of them.
+    @return False if the balance of the sender is too low.
+    """
+
+    if self.balances[_from] < _amount:
+        return False
+
+    self.updateAccountSnapshot(_from)
+    self.updateAccountSnapshot(_to)
+
+    self.balances[_from] -= _amount
+    self.balances[_to] += _amount
+
+    self.moveDelegates(self.delegates[_from], self.delegates[_to], _amount)
+
+    log.Transfer(_from, _to, _amount)
+    return True
+
+@private
+def assertTransfer(_from: address, _to: address, _amount: uint256):
+    """
+    @notice Moves tokens between two accounts or reverts if the sender is
+    locked or does not have enough of them.
+    """
+
+    self.assertCanTransfer(_from)
+    assert self.transferTokens(_from, _to, _amount), "You do not have sufficient balance to transfer these many tokens."
+
 @public
 def transfer(_to: address, _amount: uint256) -> bool:
     """
@@ -258,18 +610,8 @@ def transfer(_to: address, _amount: uint256) -> bool:
     @param _value The amount of tokens to send to the destination address.
     """
 
-    assert self.canTransfer(msg.sender), "Could not complete this request because transfer state is locked or paused."
-
-    if self.balances[msg.sender] >= _amount and \
-       self.balances[_to] + _amount >= self.balances[_to]:
-        self.balances[msg.sender] -= _amount
-        self.balances[_to] += _amount
-
-        log.Transfer(msg.sender, _to, _amount)
-        return True
-    else:
-        return False
-
+    self.assertCanTransfer(msg.sender)
+    return self.transferTokens(msg.sender, _to, _amount)
 
 @public
 def transferFrom(_from: address, _to: address, _value: uint256) -> bool:
@@ -280,19 +622,14 @@ def transferFrom(_from: address, _to: address, _value: uint256) -> bool:
     @param _to The address to transfer funds to.
     @param _value The amount of tokens to transfer.
     """
-    assert self.canTransfer(msg.sender), "Could not complete this request because transfer state is locked or paused."
-
-    if _value <= self.allowed[_from][msg.sender] and \
-       _value <= self.balances[_from]:
-        self.balances[_from] -= _value
-        self.allowed[_from][msg.sender] -= _value
-        self.balances[_to] += _value
+    self.assertCanTransfer(msg.sender)
 
-        log.Transfer(_from, _to, _value)
-        return True
-    else:
+    if _value > self.allowed[_from][msg.sender] or _value > self.balances[_from]:
         return False
 
+    self.allowed[_from][msg.sender] -= _value
+    return self.transferTokens(_from, _to, _value)
+
 @public
 def approve(_spender: address, _amount: uint256) -> bool:
     """
@@ -302,7 +639,7 @@ def approve(_spender: address, _amount: uint256) -> bool:
     @param _value The amount of tokens approve to spend. 
     """
 
-    assert not self.paused, "Sorry but the contract is paused."
+    self.assertNotPaused()
 
     self.allowed[msg.sender][_spender] = _amount
     log.Approval(msg.sender, _spender, _amount)
@@ -317,7 +654,7 @@ def increaseApproval(_spender: address, _addedValue: uint256) -> bool:
     @param _addedValue The added amount of tokens approved to spend.
     """
 
-    assert not self.paused, "Sorry but the contract is paused."
+    self.assertNotPaused()
 
     self.allowed[msg.sender][_spender] += _addedValue
     log.Approval(msg.sender, _spender, self.allowed[msg.sender][_spender])
@@ -332,7 +669,7 @@ def decreaseApproval(_spender: address, _subtractedValue: uint256) -> bool:
     @param _subtractedValue The amount of tokens to subtract from the approved allocation.
     """
 
-    assert not self.paused, "Sorry but the contract is paused."
+    self.assertNotPaused()
 
     if(_subtractedValue >= self.allowed[msg.sender][_spender]):
         self.allowed[msg.sender][_spender] = 0
@@ -367,7 +704,7 @@ def finishMinting() -> bool:
     @return True if the operation was successful.
     """
 
-    assert self.isAdmin(msg.sender), "Access is denied."
+    self.assertIsAdmin(msg.sender)
     assert not self.mintingFinished, "The minting was already finished."
 
     self.mintingFinished = True
@@ -385,13 +722,18 @@ def mint(_to: address, _amount: uint256) -> bool:
 
     assert self.canTransfer(msg.sender)
 
-    assert self.isAdmin(msg.sender), "Access is denied."
+    self.assertIsAdmin(msg.sender)
     assert self.totalSupply + _amount <= self.maximumSupply, "You cannot print those many tokens."
     assert not self.mintingFinished, "Minting cannot be performed anymore."
 
+    self.updateAccountSnapshot(_to)
+    self.updateTotalSupplySnapshot()
+
     self.totalSupply += _amount
     self.balances[_to] += _amount
 
+    self.moveDelegates(ZERO_ADDRESS, self.delegates[_to], _amount)
+
     log.Mint(_to, _amount)
     log.Transfer(ZERO_ADDRESS, _to, _amount)
 
@@ -405,11 +747,265 @@ def burn(_value: uint256):
     @param _value The amount of token to be burned.
     """
 
-    assert self.canTransfer(msg.sender), "Could not complete this request because transfer state is locked or paused."
+    self.assertCanTransfer(msg.sender)
     assert _value <= self.balances[msg.sender], "You don't have that many tokens to burn."
 
+    self.updateAccountSnapshot(msg.sender)
+    self.updateTotalSupplySnapshot()
+
     self.balances[msg.sender] -= _value
     self.totalSupply -= _value
 
+    self.moveDelegates(self.delegates[msg.sender], ZERO_ADDRESS, _value)
+
     log.Burn(msg.sender, _value)
     log.Transfer(msg.sender, ZERO_ADDRESS, _value)
+
+
+#META TRANSACTIONS
+# Holders sign EIP-712 transfer messages off-chain and a relayer submits
+# them, paying the gas. Every signature carries the nonce of the holder,
+# which is consumed by the transfer, and a deadline after which it expires.
+
+@private
+@constant
+def transferSigner(_from: address, _to: address, _amount: uint256, _deadline: timestamp, _v: uint256, _r: bytes32, _s: bytes32) -> address:
+    """
+    @notice Returns the address which signed a transfer with the current nonce of the sender.
+    """
+
+    _structHash: bytes32 = keccak256(concat(
+        keccak256("Transfer(address from,address to,uint256 amount,uint256 nonce,uint256 deadline)"),
+        convert(_from, bytes32),
+        convert(_to, bytes32),
+        convert(_amount, bytes32),
+        convert(self.nonces[_from], bytes32),
+        convert(_deadline, bytes32)
+    ))
+
+    _digest: bytes32 = keccak256(concat("\x19\x01", self.domainSeparator, _structHash))
+
+    return ecrecover(_digest, _v, convert(_r, uint256), convert(_s, uint256))
+
+@public
+def transferBySig(_from: address, _to: address, _amount: uint256, _deadline: timestamp, _v: uint256, _r: bytes32, _s: bytes32) -> bool:
+    """
+    @notice Transfers tokens on behalf of a holder who signed the transfer.
+    Anyone may submit the signature and pay for the gas.
+    Transfers can only happen when the transfer state is enabled for the holder.
+    @param _from The holder who signed the transfer.
+    @param _to The destination wallet address to transfer funds to.
+    @param _amount The amount of tokens to send to the destination address.
+    @param _deadline The timestamp after which the signature expires.
+    @param _v The recovery id of the signature.
+    @param _r The r value of the signature.
+    @param _s The s value of the signature.
+    """
+
+    assert block.timestamp <= _deadline, "This signature has expired."
+    assert _from != ZERO_ADDRESS, "Invalid signature."
+    assert self.transferSigner(_from, _to, _amount, _deadline, _v, _r, _s) == _from, "Invalid signature."
+    self.assertTransfer(_from, _to, _amount)
+
+    log.TransferBySig(_from, msg.sender, self.nonces[_from])
+    self.nonces[_from] += 1
+
+    return True
+
+@private
+def transferSigned(_relayer: address, _from: address, _to: address, _amount: uint256, _deadline: timestamp, _v: uint256, _r: bytes32, _s: bytes32) -> bool:
+    """
+    @notice Makes a signed transfer submitted by a relayer, if it can be made.
+    @return False if the signature has expired, is not signed by the holder,
+    the holder is locked or its balance is too low.
+    """
+
+    if block.timestamp > _deadline:
+        return False
+
+    if self.transferSigner(_from, _to, _amount, _deadline, _v, _r, _s) != _from:
+        return False
+
+    if not self.canTransfer(_from):
+        return False
+
+    if not self.transferTokens(_from, _to, _amount):
+        return False
+
+    log.TransferBySig(_from, _relayer, self.nonces[_from])
+    self.nonces[_from] += 1
+
+    return True
+
+@public
+def transferManyBySig(_from: address[10], _to: address[10], _amount: uint256[10], _deadline: timestamp[10], _v: uint256[10], _r: bytes32[10], _s: bytes32[10]) -> int128:
+    """
+    @notice Submits up to ten signed transfers in a single transaction.
+    Unused entries have the zero address as the holder. Transfers which
+    have expired, are not signed by their holder, are locked or exceed
+    the balance of their holder are skipped without consuming the nonce.
+    @return The number of transfers which were made.
+    """
+
+    _count: int128 = 0
+
+    for i in range(10):
+        if _from[i] == ZERO_ADDRESS:
+            continue
+
+        if self.transferSigned(msg.sender, _from[i], _to[i], _amount[i], _deadline[i], _v[i], _r[i], _s[i]):
+            _count += 1
+
+    return _count
+
+
+#TRANSFER AND CALL
+# ERC-677: tokens are transferred to a contract and the contract is notified
+# in the same transaction, instead of an approve followed by a transferFrom.
+
+@public
+def transferAndCall(_to: address, _amount: uint256, _data: bytes[1024]) -> bool:
+    """
+    @notice Transfers tokens and notifies the destination contract in the same
+    transaction. When the destination is a contract its onTokenTransfer
+    function is called and must return true.
+    Transfers can only happen when the transfer state is enabled.
+    @param _to The destination wallet or contract address.
+    @param _amount The amount of tokens to send to the destination address.
+    @param _data The data passed on to the destination contract.
+    """
+
+    self.assertTransfer(msg.sender, _to, _amount)
+
+    if _to.is_contract:
+        assert TokenReceiver(_to).onTokenTransfer(msg.sender, _amount, _data), "The recipient contract did not accept the tokens."
+
+    return True
+
+
+#BATCH TRANSFERS
+# A spender moves the tokens of several holders in one transaction. The
+# entries of every distinct holder are added up first, so that its balance
+# and allowance are checked and written once however many entries it has.
+
+@private
+def spendAllowance(_from: address, _spender: address, _value: uint256) -> bool:
+    """
+    @notice Debits tokens of a holder spent by an approved spender.
+    @return True. Private functions without a return value cannot be called in a loop.
+    """
+
+    assert _value <= self.allowed[_from][_spender], "You don't have approval to transfer these many tokens."
+    assert _value <= self.balances[_from], "The specified account does not have sufficient balance to transfer these many tokens."
+
+    self.updateAccountSnapshot(_from)
+
+    self.balances[_from] -= _value
+    self.allowed[_from][_spender] -= _value
+
+    return True
+
+
+@private
+def receiveTokens(_from: address, _to: address, _value: uint256) -> bool:
+    """
+    @notice Credits tokens debited from a holder.
+    @return True. Private functions without a return value cannot be called in a loop.
+    """
+
+    self.updateAccountSnapshot(_to)
+    self.balances[_to] += _value
+
+    self.moveDelegates(self.delegates[_from], self.delegates[_to], _value)
+
+    log.Transfer(_from, _to, _value)
+    return True
+
+
+@public
+def batchTransferFrom(_from: address[10], _to: address[10], _value: uint256[10]) -> bool:
+    """
+    @notice Transfers tokens from up to ten wallet addresses which approved the sender.
+    Unused entries have the zero address as the holder. The whole batch reverts
+    when a holder has not approved or does not have the sum of its entries.
+    Transfers can only happen when the transfer state is enabled.
+    @param _from The addresses to transfer funds from.
+    @param _to The addresses to transfer funds to.
+    @param _value The amounts of tokens to transfer.
+    """
+
+    self.assertCanTransfer(msg.sender)
+
+    _total: uint256
+    _seen: bool
+
+    for i in range(10):
+        if _from[i] == ZERO_ADDRESS:
+            continue
+
+        _seen = False
+        _total = 0
+
+        for j in range(10):
+            if _from[j] == _from[i]:
+                _seen = _seen or j < i
+                _total += _value[j]
+
+        if _seen:
+            continue
+
+        assert self.spendAllowance(_from[i], msg.sender, _total)
+
+    for i in range(10):
+        if _from[i] == ZERO_ADDRESS:
+            continue
+
+        assert self.receiveTokens(_from[i], _to[i], _value[i])
+
+    return True
+
+
+#PACKED TRANSFERS
+# Large distributions are dominated by the cost of their calldata. Every
+# entry is packed in 32 bytes: the 20-byte destination address followed by
+# the amount as a 12-byte big-endian integer, instead of the 64 bytes of an
+# ABI-encoded (address, uint256) pair. The recipients are credited while the
+# amounts are added up, and the sender is debited once for the whole batch.
+
+@private
+def sendTokens(_from: address, _value: uint256):
+    """
+    @notice Debits the sum of the tokens a holder sent in a batch.
+    """
+
+    self.assertCanTransfer(_from)
+    assert _value <= self.balances[_from], "The specified account does not have sufficient balance to transfer these many tokens."
+
+    self.updateAccountSnapshot(_from)
+    self.balances[_from] -= _value
+
+@public
+def transferPacked(_transfers: bytes[1024]) -> bool:
+    """
+    @notice Transfers tokens from the sender to up to 32 wallet addresses.
+    The whole batch reverts when the sender does not have the sum of the amounts.
+    Transfers can only happen when the transfer state is enabled.
+    @param _transfers The packed transfers, 32 bytes each.
+    """
+
+    assert len(_transfers) % 32 == 0, "Every packed transfer must be 32 bytes long."
+
+    _entry: uint256
+    _total: uint256 = 0
+
+    # The address is the upper 160 bits of an entry and the amount the lower 96 bits.
+    for i in range(32):
+        if i * 32 >= len(_transfers):
+            break
+
+        _entry = extract32(_transfers, i * 32, type=uint256)
+        _total += bitwise_and(_entry, 79228162514264337593543950335)
+        assert self.receiveTokens(msg.sender, convert(convert(shift(_entry, -96), bytes32), address), bitwise_and(_entry, 79228162514264337593543950335))
+
+    self.sendTokens(msg.sender, _total)
+    return True
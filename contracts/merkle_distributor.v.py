@@ -0,0 +1,90 @@
+# Merkle Distributor
+# Contributors: Binod Nirvan
+# This file is released under Apache 2.0 license.
+# @dev A token holder contract that lets the recipients of an airdrop
+# claim their tokens. Instead of the list of recipients, only the root
+# of a Merkle tree of (index, account, amount) entries is stored, and
+# every recipient pays for their own claim with a proof of their entry.
+# Use `python -m tools.merkle` to build the tree and the proofs.
+#
+# Based on the Uniswap Merkle Distributor
+# https://github.com/Uniswap/merkle-distributor
+
+
+#@dev Features referenced by this contract
+contract TokenContract:
+    def transfer(_to: address, _value: uint256) -> bool: modifying
+
+Claimed: event({_index: uint256, _account: indexed(address), _amount: uint256})
+
+# ERC20 token being distributed
+token: public(address)
+
+# Root of the Merkle tree of entries
+merkleRoot: public(bytes32)
+
+# Claimed flags, 256 entries per storage word
+claimedBitmap: map(uint256, uint256)
+
+@public
+def __init__(_token: address, _merkleRoot: bytes32):
+    """
+    @notice Initializes this contract.
+    @param _token The address of the ERC20 token to distribute.
+    @param _merkleRoot The root of the Merkle tree of entries.
+    """
+
+    assert _token != ZERO_ADDRESS, "Invalid token address."
+
+    self.token = _token
+    self.merkleRoot = _merkleRoot
+
+@public
+@constant
+def isClaimed(_index: uint256) -> bool:
+    """
+    @notice Checks if the entry at the supplied index was already claimed.
+    @param _index The index of the entry.
+    """
+
+    _word: uint256 = self.claimedBitmap[_index / 256]
+    _mask: uint256 = shift(1, convert(_index % 256, int128))
+
+    return bitwise_and(_word, _mask) != 0
+
+@public
+def claim(_index: uint256, _account: address, _amount: uint256, _proof: bytes32[32]):
+    """
+    @notice Transfers the amount of an entry of the Merkle tree to its account.
+    @param _index The index of the entry.
+    @param _account The account of the entry, which receives the tokens.
+    @param _amount The amount of tokens of the entry.
+    @param _proof The sibling hashes from the leaf to the root, followed by
+    empty (zero) elements.
+    """
+
+    _wordIndex: uint256 = _index / 256
+    _mask: uint256 = shift(1, convert(_index % 256, int128))
+    _word: uint256 = self.claimedBitmap[_wordIndex]
+
+    assert bitwise_and(_word, _mask) == 0, "This entry was already claimed."
+
+    _node: bytes32 = keccak256(concat(convert(_index, bytes32), convert(_account, bytes32), convert(_amount, bytes32)))
+
+    # Pairs are hashed in sorted order, so the proof needs no positions.
+    for _sibling in _proof:
+        if _sibling == EMPTY_BYTES32:
+            break
+
+        if convert(_node, uint256) <= convert(_sibling, uint256):
+            _node = keccak256(concat(_node, _sibling))
+        else:
+            _node = keccak256(concat(_sibling, _node))
+
+    assert _node == self.merkleRoot, "Invalid proof."
+
+    self.claimedBitmap[_wordIndex] = bitwise_or(_word, _mask)
+
+    assert TokenContract(self.token).transfer(_account, _amount), "Sorry but the transaction was reverted due to an unknown error."
+
+    log.Claimed(_index, _account, _amount)
@@ -0,0 +1,30 @@
+# TokenReceiverMock
+# Contributors: Binod Nirvan
+# This file is released under Apache 2.0 license.
+# @dev A contract receiving tokens with transferAndCall (ERC-677), used by the tests.
+# It logs every notification and accepts or rejects the tokens as configured.
+
+TokenReceived: event({_token: indexed(address), _from: indexed(address), _value: uint256, _data: bytes[1024]})
+
+accept: public(bool)
+
+@public
+def __init__(_accept: bool):
+    """
+    @dev Initializes this contract.
+    @param _accept Whether onTokenTransfer accepts the tokens.
+    """
+    self.accept = _accept
+
+
+@public
+def onTokenTransfer(_from: address, _value: uint256, _data: bytes[1024]) -> bool:
+    """
+    @notice Called by a token after it transferred tokens to this contract.
+    @param _from The address which sent the tokens.
+    @param _value The amount of tokens received.
+    @param _data The data supplied to transferAndCall.
+    @return True if the tokens are accepted.
+    """
+    log.TokenReceived(msg.sender, _from, _value, _data)
+    return self.accept
@@ -0,0 +1,200 @@
+# Token Stream
+# Contributors: Binod Nirvan
+# This file is released under Apache 2.0 license.
+# @dev A token holder contract for continuous payments. Every stream pays
+# its recipient a fixed amount of an ERC20 token per second between a
+# start and a stop time, like a TokenVesting schedule without cliff.
+# The sender deposits the whole amount when the stream is created, and
+# the recipient withdraws whatever has accrued whenever they like.
+# Many streams of many senders and tokens live in this single contract.
+#
+# Based on the Sablier protocol
+# https://github.com/sablierhq/sablier
+
+
+struct Stream:
+    sender: address
+    recipient: address
+    token: address
+    ratePerSecond: uint256
+    startTime: timestamp
+    stopTime: timestamp
+    withdrawn: uint256
+
+#@dev Features referenced by this contract
+contract TokenContract:
+    def transfer(_to: address, _value: uint256) -> bool: modifying
+    def transferFrom(_from: address, _to: address, _value: uint256) -> bool: modifying
+
+StreamCreated: event({_streamId: indexed(uint256), _sender: indexed(address), _recipient: indexed(address), _token: address, _ratePerSecond: uint256, _startTime: timestamp, _stopTime: timestamp})
+Withdrawn: event({_streamId: indexed(uint256), _recipient: indexed(address), _amount: uint256})
+StreamCancelled: event({_streamId: indexed(uint256), _recipientAmount: uint256, _senderAmount: uint256})
+
+streams: map(uint256, Stream)
+nextStreamId: public(uint256)
+
+
+@public
+def __init__():
+    """
+    @dev Initializes this contract. Stream ids start at 1.
+    """
+
+    self.nextStreamId = 1
+
+@private
+@constant
+def accruedAmount(_streamId: uint256) -> uint256:
+    """
+    @notice Returns the amount a stream has paid since its start, withdrawn or not.
+    @param _streamId The id of the stream.
+    """
+
+    _startTime: timestamp = self.streams[_streamId].startTime
+
+    if block.timestamp <= _startTime:
+        return 0
+
+    _stopTime: timestamp = self.streams[_streamId].stopTime
+
+    if block.timestamp < _stopTime:
+        return self.streams[_streamId].ratePerSecond * as_unitless_number(block.timestamp - _startTime)
+
+    return self.streams[_streamId].ratePerSecond * as_unitless_number(_stopTime - _startTime)
+
+@public
+@constant
+def getStream(_streamId: uint256) -> (address, address, address, uint256, timestamp, timestamp, uint256):
+    """
+    @notice Returns the sender, recipient, token, rate per second, start time,
+    stop time and withdrawn amount of a stream.
+    @param _streamId The id of the stream.
+    """
+
+    assert self.streams[_streamId].recipient != ZERO_ADDRESS, "This stream does not exist."
+
+    return self.streams[_streamId].sender, self.streams[_streamId].recipient, self.streams[_streamId].token, self.streams[_streamId].ratePerSecond, self.streams[_streamId].startTime, self.streams[_streamId].stopTime, self.streams[_streamId].withdrawn
+
+@public
+@constant
+def getAccruedAmount(_streamId: uint256) -> uint256:
+    """
+    @notice Returns the amount a stream has paid since its start, withdrawn or not.
+    @param _streamId The id of the stream.
+    """
+
+    assert self.streams[_streamId].recipient != ZERO_ADDRESS, "This stream does not exist."
+
+    return self.accruedAmount(_streamId)
+
+@public
+@constant
+def getWithdrawableAmount(_streamId: uint256) -> uint256:
+    """
+    @notice Returns the amount the recipient of a stream can withdraw now.
+    @param _streamId The id of the stream.
+    """
+
+    assert self.streams[_streamId].recipient != ZERO_ADDRESS, "This stream does not exist."
+
+    return self.accruedAmount(_streamId) - self.streams[_streamId].withdrawn
+
+@public
+def createStream(_recipient: address, _token: address, _ratePerSecond: uint256, _startTime: timestamp, _stopTime: timestamp) -> uint256:
+    """
+    @notice Creates a stream and deposits its whole amount, which is taken
+    from the sender with transferFrom. The sender must approve this contract first.
+    @param _recipient The wallet address of the recipient of the stream.
+    @param _token The address of the ERC20 token to stream.
+    @param _ratePerSecond The amount of tokens paid per second.
+    @param _startTime The timestamp on which the stream starts.
+    @param _stopTime The timestamp on which the stream ends.
+    @return The id of the new stream.
+    """
+
+    assert _recipient != ZERO_ADDRESS, "Invalid recipient address."
+    assert _recipient != self, "Invalid recipient address."
+    assert _ratePerSecond > 0, "The rate must be greater than zero."
+    assert _startTime >= block.timestamp, "The stream cannot start in the past."
+    assert _stopTime > _startTime, "The stop time must be after the start time."
+
+    _deposit: uint256 = _ratePerSecond * as_unitless_number(_stopTime - _startTime)
+    _streamId: uint256 = self.nextStreamId
+
+    self.streams[_streamId] = Stream({
+        sender: msg.sender,
+        recipient: _recipient,
+        token: _token,
+        ratePerSecond: _ratePerSecond,
+        startTime: _startTime,
+        stopTime: _stopTime,
+        withdrawn: 0
+    })
+    self.nextStreamId = _streamId + 1
+
+    assert TokenContract(_token).transferFrom(msg.sender, self, _deposit), "Could not deposit the tokens of this stream."
+
+    log.StreamCreated(_streamId, msg.sender, _recipient, _token, _ratePerSecond, _startTime, _stopTime)
+
+    return _streamId
+
+@public
+def withdraw(_streamId: uint256, _amount: uint256):
+    """
+    @notice Transfers the supplied amount of the accrued tokens to the recipient of a stream.
+    @param _streamId The id of the stream.
+    @param _amount The amount of tokens to withdraw.
+    """
+
+    _recipient: address = self.streams[_streamId].recipient
+
+    assert msg.sender == _recipient, "Access is denied."
+    assert _amount > 0, "Nothing to withdraw."
+
+    _withdrawn: uint256 = self.streams[_streamId].withdrawn + _amount
+    assert _withdrawn <= self.accruedAmount(_streamId), "You cannot withdraw more than the accrued amount."
+
+    self.streams[_streamId].withdrawn = _withdrawn
+
+    assert TokenContract(self.streams[_streamId].token).transfer(_recipient, _amount), "Sorry but the transaction was reverted due to an unknown error."
+
+    log.Withdrawn(_streamId, _recipient, _amount)
+
+@public
+def cancel(_streamId: uint256):
+    """
+    @notice Ends a stream. The recipient receives the accrued amount not
+    withdrawn yet and the sender the amount which has not accrued.
+    Either the sender or the recipient may cancel a stream.
+    @param _streamId The id of the stream.
+    """
+
+    _sender: address = self.streams[_streamId].sender
+    _recipient: address = self.streams[_streamId].recipient
+    _token: address = self.streams[_streamId].token
+
+    assert _recipient != ZERO_ADDRESS, "This stream does not exist."
+    assert msg.sender == _sender or msg.sender == _recipient, "Access is denied."
+
+    _accrued: uint256 = self.accruedAmount(_streamId)
+    _deposit: uint256 = self.streams[_streamId].ratePerSecond * as_unitless_number(self.streams[_streamId].stopTime - self.streams[_streamId].startTime)
+    _recipientAmount: uint256 = _accrued - self.streams[_streamId].withdrawn
+    _senderAmount: uint256 = _deposit - _accrued
+
+    self.streams[_streamId] = Stream({
+        sender: ZERO_ADDRESS,
+        recipient: ZERO_ADDRESS,
+        token: ZERO_ADDRESS,
+        ratePerSecond: 0,
+        startTime: 0,
+        stopTime: 0,
+        withdrawn: 0
+    })
+
+    if _recipientAmount > 0:
+        assert TokenContract(_token).transfer(_recipient, _recipientAmount), "Sorry but the transaction was reverted due to an unknown error."
+
+    if _senderAmount > 0:
+        assert TokenContract(_token).transfer(_sender, _senderAmount), "Sorry but the transaction was reverted due to an unknown error."
+
+    log.StreamCancelled(_streamId, _recipientAmount, _senderAmount)
@@ -22,6 +22,7 @@ OwnershipTransferred: event({_previousOwner: indexed(address), _newOwner: indexe
 
 Released: event({_amount: uint256})
 Revoked: event()
+TransferFailed: event({_token: indexed(address), _amount: uint256})
 
 #OWNABLE
 owner: public(address)
@@ -138,3 +139,92 @@ def revoke(_token: address):
     assert TokenContract(_token).transfer(self.owner, refund), "We could not revoke this vesting due to an unknown error."
 
     log.Revoked()
+
+@private
+def tryRelease(_token: address) -> bool:
+    """
+    @notice Releases the vested tokens of a token without reverting when the
+    token transfer returns false.
+    @return True if tokens were released.
+    """
+
+    unreleased: uint256 = self.getReleasableAmount(_token)
+
+    if unreleased == 0:
+        return False
+
+    self.released[_token] += unreleased
+
+    if not TokenContract(_token).transfer(self.beneficiary, unreleased):
+        self.released[_token] -= unreleased
+        log.TransferFailed(_token, unreleased)
+        return False
+
+    log.Released(unreleased)
+    return True
+
+@private
+def tryRevoke(_token: address) -> bool:
+    """
+    @notice Revokes the vesting of a token without reverting when the token
+    transfer returns false.
+    @return True if the vesting was revoked.
+    """
+
+    if self.revoked[_token]:
+        return False
+
+    closingBalance: uint256 = TokenContract(_token).balanceOf(self)
+    unreleased: uint256 = self.getReleasableAmount(_token)
+    refund: uint256 = closingBalance - unreleased
+
+    self.revoked[_token] = True
+
+    if not TokenContract(_token).transfer(self.owner, refund):
+        self.revoked[_token] = False
+        log.TransferFailed(_token, refund)
+        return False
+
+    log.Revoked()
+    return True
+
+@public
+def releaseMany(_tokens: address[10]) -> int128:
+    """
+    @notice Releases the vested tokens of up to 10 tokens. Empty (zero address)
+    entries, tokens with nothing to release and tokens whose transfer
+    returns false are skipped instead of reverting the whole batch.
+    @param _tokens The tokens to release, padded with the zero address.
+    @return The number of tokens released.
+    """
+
+    count: int128 = 0
+
+    for _token in _tokens:
+        if _token != ZERO_ADDRESS:
+            if self.tryRelease(_token):
+                count += 1
+
+    return count
+
+@public
+def revokeMany(_tokens: address[10]) -> int128:
+    """
+    @notice Revokes the vesting of up to 10 tokens. Empty (zero address)
+    entries, tokens already revoked and tokens whose transfer returns false
+    are skipped instead of reverting the whole batch.
+    @param _tokens The tokens to revoke, padded with the zero address.
+    @return The number of tokens revoked.
+    """
+
+    assert msg.sender == self.owner, "Access is denied."
+    assert self.revocable, "Sorry but this vesting schedule is not revocable."
+
+    count: int128 = 0
+
+    for _token in _tokens:
+        if _token != ZERO_ADDRESS:
+            if self.tryRevoke(_token):
+                count += 1
+
+    return count
@@ -0,0 +1,26 @@
+const { bufferToHex, ecsign, keccak256, privateToAddress, setLengthLeft, toBuffer } = require('ethereumjs-util');
+
+const TRANSFER_TYPEHASH = keccak256('Transfer(address from,address to,uint256 amount,uint256 nonce,uint256 deadline)');
+
+function word (value) {
+  return setLengthLeft(toBuffer(value), 32);
+}
+
+// Returns the address of a private key given as a Buffer.
+function signerAddress (privateKey) {
+  return bufferToHex(privateToAddress(privateKey));
+}
+
+// Signs an EIP-712 transfer of lockable_token and returns the [v, r, s] arguments.
+function signTransfer (privateKey, domainSeparator, from, to, amount, nonce, deadline) {
+  const structHash = keccak256(Buffer.concat([TRANSFER_TYPEHASH].concat([from, to, amount, nonce, deadline].map(word))));
+  const digest = keccak256(Buffer.concat([Buffer.from('1901', 'hex'), toBuffer(domainSeparator), structHash]));
+  const { v, r, s } = ecsign(digest, privateKey);
+
+  return [v, bufferToHex(r), bufferToHex(s)];
+}
+
+module.exports = {
+  signerAddress,
+  signTransfer,
+};
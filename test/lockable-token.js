@@ -0,0 +1,364 @@
+const LockableToken = artifacts.require('./lockable_token.vyper');
+const TokenReceiverMock = artifacts.require('./token_receiver_mock.vyper');
+const { assertRevert } = require('./helpers/assertRevert');
+const { inLogs } = require('./helpers/expectEvent');
+const { signerAddress, signTransfer } = require('./helpers/signTransfer');
+
+const BigNumber = web3.BigNumber;
+
+require('chai')
+  .use(require('chai-bignumber')(BigNumber))
+  .should();
+
+contract('lockable_token', function ([owner, holder, recipient, anotherAccount]) {
+  const initialSupply = 1000;
+  const maximumSupply = 10000;
+  const chainId = 1;
+
+  beforeEach(async function () {
+    this.token = await LockableToken.new(web3.fromAscii("Name"), web3.fromAscii("SYMBOL"), initialSupply, maximumSupply, 18, chainId, { from: owner });
+    await this.token.enableTransfers({ from: owner });
+    await this.token.transfer(holder, 100, { from: owner });
+  });
+
+  describe('snapshot', function () {
+    describe('when the sender is an administrator', function () {
+      it('emits a snapshot event with increasing ids', async function () {
+        let { logs } = await this.token.snapshot({ from: owner });
+        inLogs(logs, 'Snapshot').args._id.should.be.bignumber.equal(1);
+
+        ({ logs } = await this.token.snapshot({ from: owner }));
+        inLogs(logs, 'Snapshot').args._id.should.be.bignumber.equal(2);
+
+        (await this.token.currentSnapshotId()).should.be.bignumber.equal(2);
+      });
+    });
+
+    describe('when the sender is not an administrator', function () {
+      it('reverts', async function () {
+        await assertRevert(this.token.snapshot({ from: anotherAccount }));
+      });
+    });
+  });
+
+  describe('balanceOfAt and totalSupplyAt', function () {
+    describe('when the snapshot id does not exist', function () {
+      it('reverts', async function () {
+        await assertRevert(this.token.balanceOfAt(holder, 0));
+        await assertRevert(this.token.balanceOfAt(holder, 1));
+        await assertRevert(this.token.totalSupplyAt(1));
+      });
+    });
+
+    describe('when there were no changes after the snapshot', function () {
+      beforeEach(async function () {
+        await this.token.snapshot({ from: owner });
+      });
+
+      it('returns the current values', async function () {
+        (await this.token.balanceOfAt(holder, 1)).should.be.bignumber.equal(100);
+        (await this.token.totalSupplyAt(1)).should.be.bignumber.equal(initialSupply);
+      });
+    });
+
+    describe('when balances changed after several snapshots', function () {
+      beforeEach(async function () {
+        await this.token.snapshot({ from: owner });
+        await this.token.transfer(recipient, 10, { from: holder });
+        await this.token.transfer(recipient, 10, { from: holder });
+        await this.token.snapshot({ from: owner });
+        await this.token.snapshot({ from: owner });
+        await this.token.mint(recipient, 500, { from: owner });
+        await this.token.burn(30, { from: holder });
+      });
+
+      it('returns the balances at the time of each snapshot', async function () {
+        (await this.token.balanceOfAt(holder, 1)).should.be.bignumber.equal(100);
+        (await this.token.balanceOfAt(recipient, 1)).should.be.bignumber.equal(0);
+        (await this.token.balanceOfAt(holder, 2)).should.be.bignumber.equal(80);
+        (await this.token.balanceOfAt(recipient, 3)).should.be.bignumber.equal(20);
+      });
+
+      it('returns the total supply at the time of each snapshot', async function () {
+        (await this.token.totalSupplyAt(1)).should.be.bignumber.equal(initialSupply);
+        (await this.token.totalSupplyAt(3)).should.be.bignumber.equal(initialSupply);
+      });
+
+      it('does not change the current balances', async function () {
+        (await this.token.balanceOf(holder)).should.be.bignumber.equal(50);
+        (await this.token.balanceOf(recipient)).should.be.bignumber.equal(520);
+        (await this.token.totalSupply()).should.be.bignumber.equal(initialSupply + 470);
+      });
+    });
+  });
+
+  describe('delegation', function () {
+    describe('when the holder has not delegated', function () {
+      it('does not record votes', async function () {
+        await this.token.transfer(recipient, 10, { from: holder });
+
+        (await this.token.getCurrentVotes(holder)).should.be.bignumber.equal(0);
+        (await this.token.numCheckpoints(holder)).should.be.bignumber.equal(0);
+      });
+    });
+
+    describe('when the holder delegates', function () {
+      beforeEach(async function () {
+        ({ logs: this.logs } = await this.token.delegate(anotherAccount, { from: holder }));
+        this.delegatedBlock = web3.eth.blockNumber;
+      });
+
+      it('emits the delegation events', async function () {
+        const changed = inLogs(this.logs, 'DelegateChanged');
+        changed.args._delegator.should.equal(holder);
+        changed.args._toDelegate.should.equal(anotherAccount);
+
+        const votes = inLogs(this.logs, 'DelegateVotesChanged');
+        votes.args._delegate.should.equal(anotherAccount);
+        votes.args._newBalance.should.be.bignumber.equal(100);
+      });
+
+      it('moves the votes with the balance', async function () {
+        await this.token.transfer(recipient, 30, { from: holder });
+        await this.token.burn(20, { from: holder });
+
+        (await this.token.delegates(holder)).should.equal(anotherAccount);
+        (await this.token.getCurrentVotes(anotherAccount)).should.be.bignumber.equal(50);
+      });
+
+      it('adds minted tokens of delegating holders', async function () {
+        await this.token.mint(holder, 25, { from: owner });
+
+        (await this.token.getCurrentVotes(anotherAccount)).should.be.bignumber.equal(125);
+      });
+
+      it('returns the votes at past blocks', async function () {
+        await this.token.transfer(recipient, 40, { from: holder });
+        const transferBlock = web3.eth.blockNumber;
+        await this.token.delegate(holder, { from: recipient });
+
+        (await this.token.getPriorVotes(anotherAccount, this.delegatedBlock - 1)).should.be.bignumber.equal(0);
+        (await this.token.getPriorVotes(anotherAccount, this.delegatedBlock)).should.be.bignumber.equal(100);
+        (await this.token.getPriorVotes(anotherAccount, transferBlock)).should.be.bignumber.equal(60);
+        (await this.token.getPriorVotes(holder, transferBlock)).should.be.bignumber.equal(0);
+      });
+
+      it('does not return the votes of the current block', async function () {
+        await assertRevert(this.token.getPriorVotes(anotherAccount, web3.eth.blockNumber + 1));
+      });
+    });
+  });
+
+  describe('signed transfers', function () {
+    const signature = [27, '0x' + '1'.repeat(64), '0x' + '2'.repeat(64)];
+    const empty = '0x' + '0'.repeat(64);
+    const none = '0x' + '0'.repeat(40);
+
+    it('starts every nonce at zero', async function () {
+      (await this.token.nonces(holder)).should.be.bignumber.equal(0);
+    });
+
+    it('binds the domain to the chain and the contract', async function () {
+      const typeHash = web3.sha3('EIP712Domain(uint256 chainId,address verifyingContract)');
+      const expected = web3.sha3(typeHash.slice(2) + chainId.toString(16).padStart(64, '0') + this.token.address.slice(2).padStart(64, '0'), { encoding: 'hex' });
+
+      (await this.token.domainSeparator()).should.equal(expected);
+    });
+
+    describe('with a signature of the holder', function () {
+      const privateKey = Buffer.from('11'.repeat(32), 'hex');
+      const signer = signerAddress(privateKey);
+
+      beforeEach(async function () {
+        await this.token.transfer(signer, 100, { from: owner });
+        this.domainSeparator = await this.token.domainSeparator();
+        this.deadline = web3.eth.getBlock('latest').timestamp + 3600;
+      });
+
+      it('transferBySig transfers, consumes the nonce and rejects a replay', async function () {
+        const signature = signTransfer(privateKey, this.domainSeparator, signer, recipient, 10, 0, this.deadline);
+
+        const { logs } = await this.token.transferBySig(signer, recipient, 10, this.deadline, ...signature, { from: anotherAccount });
+
+        inLogs(logs, 'Transfer', { _from: signer, _to: recipient });
+        (await this.token.balanceOf(signer)).should.be.bignumber.equal(90);
+        (await this.token.balanceOf(recipient)).should.be.bignumber.equal(10);
+        (await this.token.nonces(signer)).should.be.bignumber.equal(1);
+
+        await assertRevert(this.token.transferBySig(signer, recipient, 10, this.deadline, ...signature, { from: anotherAccount }));
+        (await this.token.balanceOf(signer)).should.be.bignumber.equal(90);
+      });
+
+      it('transferManyBySig makes consecutive transfers and skips a replay', async function () {
+        const first = signTransfer(privateKey, this.domainSeparator, signer, recipient, 10, 0, this.deadline);
+        const second = signTransfer(privateKey, this.domainSeparator, signer, holder, 20, 1, this.deadline);
+        const batch = [
+          [signer, signer].concat(Array(8).fill(none)),
+          [recipient, holder].concat(Array(8).fill(none)),
+          [10, 20].concat(Array(8).fill(0)),
+          [this.deadline, this.deadline].concat(Array(8).fill(0)),
+          [first[0], second[0]].concat(Array(8).fill(0)),
+          [first[1], second[1]].concat(Array(8).fill(empty)),
+          [first[2], second[2]].concat(Array(8).fill(empty)),
+        ];
+
+        (await this.token.transferManyBySig.call(...batch, { from: anotherAccount })).should.be.bignumber.equal(2);
+        await this.token.transferManyBySig(...batch, { from: anotherAccount });
+
+        (await this.token.balanceOf(signer)).should.be.bignumber.equal(70);
+        (await this.token.balanceOf(recipient)).should.be.bignumber.equal(10);
+        (await this.token.balanceOf(holder)).should.be.bignumber.equal(120);
+        (await this.token.nonces(signer)).should.be.bignumber.equal(2);
+
+        (await this.token.transferManyBySig.call(...batch, { from: anotherAccount })).should.be.bignumber.equal(0);
+      });
+    });
+
+    describe('transferBySig', function () {
+      it('reverts when the signature has expired', async function () {
+        await assertRevert(this.token.transferBySig(holder, recipient, 10, 1, ...signature, { from: anotherAccount }));
+      });
+
+      it('reverts when the holder did not sign the transfer', async function () {
+        const deadline = web3.eth.getBlock('latest').timestamp + 3600;
+
+        await assertRevert(this.token.transferBySig(holder, recipient, 10, deadline, ...signature, { from: anotherAccount }));
+        (await this.token.balanceOf(holder)).should.be.bignumber.equal(100);
+        (await this.token.nonces(holder)).should.be.bignumber.equal(0);
+      });
+    });
+
+    describe('transferManyBySig', function () {
+      it('skips the transfers which were not signed by their holder', async function () {
+        const deadline = web3.eth.getBlock('latest').timestamp + 3600;
+        const holders = [holder].concat(Array(9).fill(none));
+
+        const made = await this.token.transferManyBySig.call(
+          holders, Array(10).fill(recipient), Array(10).fill(10), Array(10).fill(deadline),
+          Array(10).fill(signature[0]), Array(10).fill(signature[1]), Array(10).fill(signature[2]),
+          { from: anotherAccount }
+        );
+
+        made.should.be.bignumber.equal(0);
+      });
+
+      it('does nothing with empty entries', async function () {
+        const made = await this.token.transferManyBySig.call(
+          Array(10).fill(none), Array(10).fill(none), Array(10).fill(0), Array(10).fill(0),
+          Array(10).fill(0), Array(10).fill(empty), Array(10).fill(empty),
+          { from: anotherAccount }
+        );
+
+        made.should.be.bignumber.equal(0);
+      });
+    });
+  });
+
+  describe('transferAndCall', function () {
+    const data = web3.fromAscii('hello');
+
+    it('transfers to a wallet like transfer', async function () {
+      const { logs } = await this.token.transferAndCall(recipient, 10, data, { from: holder });
+
+      inLogs(logs, 'Transfer', { _from: holder, _to: recipient });
+      (await this.token.balanceOf(recipient)).should.be.bignumber.equal(10);
+    });
+
+    it('notifies a receiving contract', async function () {
+      const receiver = await TokenReceiverMock.new(true);
+      const { receipt } = await this.token.transferAndCall(receiver.address, 10, data, { from: holder });
+
+      receipt.logs.length.should.equal(2);
+      (await this.token.balanceOf(receiver.address)).should.be.bignumber.equal(10);
+    });
+
+    it('reverts when the receiving contract rejects the tokens', async function () {
+      const receiver = await TokenReceiverMock.new(false);
+
+      await assertRevert(this.token.transferAndCall(receiver.address, 10, data, { from: holder }));
+      (await this.token.balanceOf(holder)).should.be.bignumber.equal(100);
+    });
+
+    it('reverts when the sender does not have enough balance', async function () {
+      await assertRevert(this.token.transferAndCall(recipient, 101, data, { from: holder }));
+    });
+
+    it('reverts when transfers are locked', async function () {
+      await this.token.disableTransfers({ from: owner });
+      await assertRevert(this.token.transferAndCall(recipient, 10, data, { from: holder }));
+    });
+  });
+
+  describe('batchTransferFrom', function () {
+    const none = '0x' + '0'.repeat(40);
+
+    function pad(items, value) {
+      return items.concat(Array(10 - items.length).fill(value));
+    }
+
+    beforeEach(async function () {
+      await this.token.transfer(anotherAccount, 100, { from: owner });
+      await this.token.approve(recipient, 60, { from: holder });
+      await this.token.approve(recipient, 60, { from: anotherAccount });
+    });
+
+    it('debits every holder by the sum of its entries and logs every transfer', async function () {
+      const { logs } = await this.token.batchTransferFrom(
+        pad([holder, anotherAccount, holder], none), pad([owner, owner, recipient], none), pad([20, 30, 40], 0),
+        { from: recipient }
+      );
+
+      logs.filter(log => log.event === 'Transfer').length.should.equal(3);
+      (await this.token.balanceOf(holder)).should.be.bignumber.equal(40);
+      (await this.token.balanceOf(anotherAccount)).should.be.bignumber.equal(70);
+      (await this.token.balanceOf(recipient)).should.be.bignumber.equal(40);
+      (await this.token.allowance(holder, recipient)).should.be.bignumber.equal(0);
+      (await this.token.allowance(anotherAccount, recipient)).should.be.bignumber.equal(30);
+    });
+
+    it('reverts when the entries of a holder exceed its allowance together', async function () {
+      await assertRevert(this.token.batchTransferFrom(
+        pad([holder, holder], none), pad([owner, owner], none), pad([40, 40], 0), { from: recipient }
+      ));
+
+      (await this.token.balanceOf(holder)).should.be.bignumber.equal(100);
+    });
+
+    it('reverts when transfers are locked', async function () {
+      await this.token.disableTransfers({ from: owner });
+
+      await assertRevert(this.token.batchTransferFrom(
+        pad([holder], none), pad([owner], none), pad([10], 0), { from: recipient }
+      ));
+    });
+  });
+
+  describe('transferPacked', function () {
+    function packed(transfers) {
+      return '0x' + transfers.map(([to, amount]) => to.slice(2) + amount.toString(16).padStart(24, '0')).join('');
+    }
+
+    it('transfers to every packed recipient', async function () {
+      const { logs } = await this.token.transferPacked(packed([[recipient, 20], [anotherAccount, 30], [recipient, 5]]), { from: holder });
+
+      logs.filter(log => log.event === 'Transfer').length.should.equal(3);
+      (await this.token.balanceOf(holder)).should.be.bignumber.equal(45);
+      (await this.token.balanceOf(recipient)).should.be.bignumber.equal(25);
+      (await this.token.balanceOf(anotherAccount)).should.be.bignumber.equal(30);
+    });
+
+    it('reverts when the sum of the amounts exceeds the balance', async function () {
+      await assertRevert(this.token.transferPacked(packed([[recipient, 60], [anotherAccount, 60]]), { from: holder }));
+      (await this.token.balanceOf(holder)).should.be.bignumber.equal(100);
+    });
+
+    it('reverts when an entry is not 32 bytes long', async function () {
+      await assertRevert(this.token.transferPacked(packed([[recipient, 20]]).slice(0, -2), { from: holder }));
+    });
+
+    it('reverts when transfers are locked', async function () {
+      await this.token.disableTransfers({ from: owner });
+      await assertRevert(this.token.transferPacked(packed([[recipient, 20]]), { from: holder }));
+    });
+  });
+});
@@ -0,0 +1,122 @@
+const { assertRevert } = require('./helpers/assertRevert');
+const { inLogs } = require('./helpers/expectEvent');
+
+const BigNumber = web3.BigNumber;
+
+require('chai')
+  .use(require('chai-bignumber')(BigNumber))
+  .should();
+
+const StandardToken = artifacts.require('erc20_standard_token.vyper');
+const MerkleDistributor = artifacts.require('merkle_distributor.vyper');
+
+const EMPTY = '0x' + '0'.repeat(64);
+
+function word (value) {
+  return new BigNumber(value).toString(16).padStart(64, '0');
+}
+
+function leaf (index, account, amount) {
+  return web3.sha3(word(index) + account.slice(2).padStart(64, '0') + word(amount), { encoding: 'hex' });
+}
+
+function hashPair (first, second) {
+  const [low, high] = first <= second ? [first, second] : [second, first];
+  return web3.sha3(low.slice(2) + high.slice(2), { encoding: 'hex' });
+}
+
+// Same tree as tools/merkle.py: sorted pairs, a node without a sibling is promoted.
+function buildTree (leaves) {
+  const levels = [leaves];
+
+  while (levels[levels.length - 1].length > 1) {
+    const nodes = levels[levels.length - 1];
+    const next = [];
+
+    for (let i = 0; i < nodes.length; i += 2) {
+      next.push(i + 1 < nodes.length ? hashPair(nodes[i], nodes[i + 1]) : nodes[i]);
+    }
+
+    levels.push(next);
+  }
+
+  return levels;
+}
+
+function proof (levels, index) {
+  const siblings = [];
+
+  for (const nodes of levels.slice(0, -1)) {
+    if ((index ^ 1) < nodes.length) {
+      siblings.push(nodes[index ^ 1]);
+    }
+
+    index = index >> 1;
+  }
+
+  while (siblings.length < 32) {
+    siblings.push(EMPTY);
+  }
+
+  return siblings;
+}
+
+contract('merkle_distributor', function ([owner, first, second, third, anotherAccount]) {
+  const entries = [[first, 100], [second, 200], [third, 300]];
+
+  beforeEach(async function () {
+    this.levels = buildTree(entries.map(([account, amount], index) => leaf(index, account, amount)));
+    this.root = this.levels[this.levels.length - 1][0];
+
+    this.token = await StandardToken.new(web3.fromAscii("Name"), web3.fromAscii("SYMBOL"), 1000, 18, { from: owner });
+    this.distributor = await MerkleDistributor.new(this.token.address, this.root, { from: owner });
+    await this.token.transfer(this.distributor.address, 600, { from: owner });
+  });
+
+  it('stores the token and the root', async function () {
+    (await this.distributor.token()).should.equal(this.token.address);
+    (await this.distributor.merkleRoot()).should.equal(this.root);
+  });
+
+  describe('claim', function () {
+    describe('when the proof is valid', function () {
+      it('transfers the amount to the account', async function () {
+        for (const [index, [account, amount]] of entries.entries()) {
+          await this.distributor.claim(index, account, amount, proof(this.levels, index), { from: anotherAccount });
+          (await this.token.balanceOf(account)).should.be.bignumber.equal(amount);
+        }
+
+        (await this.token.balanceOf(this.distributor.address)).should.be.bignumber.equal(0);
+      });
+
+      it('marks the entry as claimed', async function () {
+        await this.distributor.claim(1, second, 200, proof(this.levels, 1));
+
+        (await this.distributor.isClaimed(0)).should.equal(false);
+        (await this.distributor.isClaimed(1)).should.equal(true);
+      });
+
+      it('emits a claimed event', async function () {
+        const { logs } = await this.distributor.claim(2, third, 300, proof(this.levels, 2));
+        const event = inLogs(logs, 'Claimed');
+
+        event.args._index.should.be.bignumber.equal(2);
+        event.args._account.should.equal(third);
+        event.args._amount.should.be.bignumber.equal(300);
+      });
+
+      it('cannot be claimed twice', async function () {
+        await this.distributor.claim(0, first, 100, proof(this.levels, 0));
+        await assertRevert(this.distributor.claim(0, first, 100, proof(this.levels, 0)));
+      });
+    });
+
+    describe('when the proof does not match the entry', function () {
+      it('reverts', async function () {
+        await assertRevert(this.distributor.claim(0, first, 101, proof(this.levels, 0)));
+        await assertRevert(this.distributor.claim(0, anotherAccount, 100, proof(this.levels, 0)));
+        await assertRevert(this.distributor.claim(1, first, 100, proof(this.levels, 0)));
+      });
+    });
+  });
+});
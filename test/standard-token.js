@@ -2,6 +2,7 @@ const {
     assertRevert
 } = require('./helpers/assertRevert');
 const StandardTokenMock = artifacts.require('./erc20_standard_token.vyper');;
+const TokenReceiverMock = artifacts.require('./token_receiver_mock.vyper');
 
 contract('erc20_standard_token', function ([owner, recipient, anotherAccount]) {
     const ZERO_ADDRESS = '0x0000000000000000000000000000000000000000';
@@ -92,6 +93,96 @@ contract('erc20_standard_token', function ([owner, recipient, anotherAccount]) {
         });
     });
 
+    describe('transferAndCall', function () {
+        const data = web3.fromAscii('hello');
+
+        describe('when the recipient is a wallet', function () {
+            it('transfers the requested amount', async function () {
+                await this.token.transferAndCall(recipient, 100, data, {
+                    from: owner
+                });
+
+                const recipientBalance = await this.token.balanceOf(recipient);
+                assert.equal(recipientBalance.toNumber(), 100);
+            });
+        });
+
+        describe('when the recipient is a contract which accepts the tokens', function () {
+            it('transfers the requested amount and notifies the contract', async function () {
+                const receiver = await TokenReceiverMock.new(true);
+                const { receipt } = await this.token.transferAndCall(receiver.address, 100, data, {
+                    from: owner
+                });
+
+                assert.equal(receipt.logs.length, 2);
+
+                const receiverBalance = await this.token.balanceOf(receiver.address);
+                assert.equal(receiverBalance.toNumber(), 100);
+            });
+        });
+
+        describe('when the recipient is a contract which rejects the tokens', function () {
+            it('reverts', async function () {
+                const receiver = await TokenReceiverMock.new(false);
+
+                await assertRevert(this.token.transferAndCall(receiver.address, 100, data, {
+                    from: owner
+                }));
+            });
+        });
+
+        describe('when the recipient is the zero address', function () {
+            it('reverts', async function () {
+                await assertRevert(this.token.transferAndCall(ZERO_ADDRESS, 100, data, {
+                    from: owner
+                }));
+            });
+        });
+    });
+
+    describe('batchTransferFrom', function () {
+        const none = '0x' + '0'.repeat(40);
+
+        function pad(items, value) {
+            return items.concat(Array(10 - items.length).fill(value));
+        }
+
+        beforeEach(async function () {
+            await this.token.approve(anotherAccount, 60, {
+                from: owner
+            });
+        });
+
+        describe('when the spender has enough approved balance for the sum of the entries', function () {
+            it('transfers every entry and emits a transfer event for each', async function () {
+                const { logs } = await this.token.batchTransferFrom(pad([owner, owner], none), pad([recipient, anotherAccount], none), pad([20, 30], 0), {
+                    from: anotherAccount
+                });
+
+                assert.equal(logs.length, 2);
+                assert.equal((await this.token.balanceOf(owner)).toNumber(), 50);
+                assert.equal((await this.token.balanceOf(recipient)).toNumber(), 20);
+                assert.equal((await this.token.allowance(owner, anotherAccount)).toNumber(), 10);
+            });
+        });
+
+        describe('when the entries exceed the approved balance together', function () {
+            it('reverts', async function () {
+                await assertRevert(this.token.batchTransferFrom(pad([owner, owner], none), pad([recipient, recipient], none), pad([40, 40], 0), {
+                    from: anotherAccount
+                }));
+            });
+        });
+
+        describe('when a recipient is the zero address', function () {
+            it('reverts', async function () {
+                await assertRevert(this.token.batchTransferFrom(pad([owner], none), pad([ZERO_ADDRESS], none), pad([10], 0), {
+                    from: anotherAccount
+                }));
+            });
+        });
+    });
+
     describe('approve', function () {
         describe('when the spender is not the zero address', function () {
             const spender = recipient;
@@ -0,0 +1,128 @@
+const { assertRevert } = require('./helpers/assertRevert');
+const { inLogs } = require('./helpers/expectEvent');
+const { latestTime } = require('./helpers/latestTime');
+const { increaseTimeTo, duration } = require('./helpers/increaseTime');
+
+const BigNumber = web3.BigNumber;
+
+require('chai')
+  .use(require('chai-bignumber')(BigNumber))
+  .should();
+
+const MintableToken = artifacts.require('mintable_token.vyper');
+const TokenStream = artifacts.require('token_stream.vyper');
+
+contract('TokenStream', function ([_, owner, recipient, anotherAccount]) {
+  const rate = new BigNumber(10);
+  const deposit = rate.mul(duration.days(10));
+
+  beforeEach(async function () {
+    this.token = await MintableToken.new(web3.fromAscii("Name"), web3.fromAscii("SYMBOL"), 0, 10000000, 18, { from: owner });
+    this.stream = await TokenStream.new({ from: owner });
+
+    await this.token.mint(owner, deposit, { from: owner });
+    await this.token.approve(this.stream.address, deposit, { from: owner });
+
+    this.start = (await latestTime()) + duration.minutes(1);
+    this.stop = this.start + duration.days(10);
+
+    ({ logs: this.logs } = await this.stream.createStream(recipient, this.token.address, rate, this.start, this.stop, { from: owner }));
+  });
+
+  describe('createStream', function () {
+    it('deposits the whole amount', async function () {
+      (await this.token.balanceOf(this.stream.address)).should.be.bignumber.equal(deposit);
+      (await this.token.balanceOf(owner)).should.be.bignumber.equal(0);
+    });
+
+    it('emits a stream created event', async function () {
+      const event = inLogs(this.logs, 'StreamCreated');
+
+      event.args._streamId.should.be.bignumber.equal(1);
+      event.args._sender.should.equal(owner);
+      event.args._recipient.should.equal(recipient);
+      event.args._ratePerSecond.should.be.bignumber.equal(rate);
+    });
+
+    it('stores the stream', async function () {
+      const [sender, streamRecipient, token, ratePerSecond, , , withdrawn] = await this.stream.getStream(1);
+
+      sender.should.equal(owner);
+      streamRecipient.should.equal(recipient);
+      token.should.equal(this.token.address);
+      ratePerSecond.should.be.bignumber.equal(rate);
+      withdrawn.should.be.bignumber.equal(0);
+    });
+
+    it('cannot stop before it starts', async function () {
+      await assertRevert(this.stream.createStream(recipient, this.token.address, rate, this.stop, this.start, { from: owner }));
+    });
+  });
+
+  describe('withdraw', function () {
+    it('cannot withdraw before the start', async function () {
+      await assertRevert(this.stream.withdraw(1, 1, { from: recipient }));
+    });
+
+    describe('after half of the duration', function () {
+      beforeEach(async function () {
+        await increaseTimeTo(this.start + duration.days(5));
+      });
+
+      it('withdraws the accrued amount', async function () {
+        const withdrawable = await this.stream.getWithdrawableAmount(1);
+        withdrawable.should.be.bignumber.gte(deposit.div(2));
+
+        await this.stream.withdraw(1, deposit.div(2), { from: recipient });
+
+        (await this.token.balanceOf(recipient)).should.be.bignumber.equal(deposit.div(2));
+      });
+
+      it('cannot withdraw more than the accrued amount', async function () {
+        await assertRevert(this.stream.withdraw(1, deposit, { from: recipient }));
+      });
+
+      it('cannot be withdrawn by others', async function () {
+        await assertRevert(this.stream.withdraw(1, 1, { from: anotherAccount }));
+      });
+    });
+
+    describe('after the stop time', function () {
+      beforeEach(async function () {
+        await increaseTimeTo(this.stop + duration.days(1));
+      });
+
+      it('withdraws the whole deposit', async function () {
+        (await this.stream.getWithdrawableAmount(1)).should.be.bignumber.equal(deposit);
+
+        await this.stream.withdraw(1, deposit, { from: recipient });
+
+        (await this.token.balanceOf(recipient)).should.be.bignumber.equal(deposit);
+        (await this.stream.getWithdrawableAmount(1)).should.be.bignumber.equal(0);
+      });
+    });
+  });
+
+  describe('cancel', function () {
+    it('splits the balance between the recipient and the sender', async function () {
+      await increaseTimeTo(this.start + duration.days(5));
+      await this.stream.cancel(1, { from: owner });
+
+      const received = await this.token.balanceOf(recipient);
+      const refunded = await this.token.balanceOf(owner);
+
+      received.should.be.bignumber.gte(deposit.div(2));
+      received.plus(refunded).should.be.bignumber.equal(deposit);
+      (await this.token.balanceOf(this.stream.address)).should.be.bignumber.equal(0);
+    });
+
+    it('deletes the stream', async function () {
+      await this.stream.cancel(1, { from: recipient });
+      await assertRevert(this.stream.getStream(1));
+    });
+
+    it('cannot be cancelled by others', async function () {
+      await assertRevert(this.stream.cancel(1, { from: anotherAccount }));
+    });
+  });
+});
@@ -125,4 +125,54 @@ contract('TokenVesting', function ([_, owner, beneficiary, a, b]) {
       EVMRevert,
     );
   });
+
+  describe('releaseMany and revokeMany', function () {
+    const ZERO_ADDRESS = '0x0000000000000000000000000000000000000000';
+
+    function padded (tokens) {
+      return tokens.concat(Array(10 - tokens.length).fill(ZERO_ADDRESS));
+    }
+
+    beforeEach(async function () {
+      this.otherToken = await MintableToken.new(web3.fromAscii("Other"), web3.fromAscii("OTHER"), 0, 10000000, 18, { from: owner });
+      await this.otherToken.mint(this.vesting.address, amount, { from: owner });
+    });
+
+    it('should release all tokens in one transaction', async function () {
+      await increaseTimeTo(this.start + this.duration);
+      await this.vesting.releaseMany(padded([this.token.address, this.otherToken.address]));
+
+      (await this.token.balanceOf(beneficiary)).should.bignumber.equal(amount);
+      (await this.otherToken.balanceOf(beneficiary)).should.bignumber.equal(amount);
+    });
+
+    it('should skip tokens with nothing to release instead of reverting', async function () {
+      const emptyToken = await MintableToken.new(web3.fromAscii("Empty"), web3.fromAscii("EMPTY"), 0, 10000000, 18, { from: owner });
+      await increaseTimeTo(this.start + this.duration);
+
+      const released = await this.vesting.releaseMany.call(padded([emptyToken.address, this.token.address]));
+      released.should.bignumber.equal(1);
+
+      await this.vesting.releaseMany(padded([emptyToken.address, this.token.address]));
+      (await this.token.balanceOf(beneficiary)).should.bignumber.equal(amount);
+    });
+
+    it('should revoke all tokens and skip the ones already revoked', async function () {
+      await increaseTimeTo(this.start + this.cliff + duration.weeks(12));
+      await this.vesting.revoke(this.token.address, { from: owner });
+
+      const revoked = await this.vesting.revokeMany.call(padded([this.token.address, this.otherToken.address]), { from: owner });
+      revoked.should.bignumber.equal(1);
+
+      await this.vesting.revokeMany(padded([this.token.address, this.otherToken.address]), { from: owner });
+      (await this.vesting.revoked(this.otherToken.address)).should.equal(true);
+    });
+
+    it('should fail to revoke many when not called by the owner', async function () {
+      await expectThrow(
+        this.vesting.revokeMany(padded([this.token.address]), { from: beneficiary }),
+        EVMRevert,
+      );
+    });
+  });
 });
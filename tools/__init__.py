@@ -0,0 +1,6 @@
+"""
+Python tools for building, testing and profiling the Vyper contracts
+found in the ``contracts`` directory.
+
+The tools require the packages listed in ``requirements.txt``.
+"""
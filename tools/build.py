@@ -0,0 +1,1091 @@
+"""
+Compiles the Vyper contracts of this repository.
+
+Contracts are referenced by their file name without the ``.v.py``
+extension, for example ``lockable_token``.
+
+Build options rewrite the source before it is compiled:
+
+- canonical_events: mint() and burn() only log the ERC20 Transfer event from
+  or to the zero address, instead of Mint or Burn followed by Transfer.
+- holder_index: every account with a non-zero balance is listed in an
+  index, readable with holderCount() and holderAt(i), so that holders can
+  be paged through from the contract state instead of replaying Transfer
+  logs. An account is added or removed in constant time whenever its
+  balance changes, which costs every transfer some gas.
+- dividends: ether sent to distributeDividends() is shared among the holders
+  in proportion to their balances and withdrawn by every holder with
+  withdrawDividend(). A distribution takes constant gas whatever the number
+  of holders: it only raises an accumulator of the dividends per token, and
+  every change of a balance records a correction for the account. The owner
+  excludes the contracts holding tokens, which cannot withdraw ether, so
+  tokens without an owner are built without dividends.
+- constant_metadata: name, symbol, decimals and maximumSupply are compiled
+  into the code as constants instead of being constructor parameters kept
+  in storage. Their values are supplied per deployment, so every deployment
+  is compiled on its own.
+- compact_errors: assert reason strings are replaced by short codes such as
+  "E3f2a1", derived from a hash of the message. A code means the same in
+  every contract and in every build, and decode_error() or the
+  error_codes.json table written next to the artifacts turns them back into
+  the messages.
+
+Every artifact has gasEstimates, the gas limit of a transaction calling
+transfer, transferFrom, approve, mint, burn or release, so that clients can
+send them without calling eth_estimateGas. The limits are upper bounds derived
+from the compiled code without running it: the costliest branch of every
+condition is assumed to be taken, every loop to run all its rounds and
+every storage write to fill an empty slot. The opcodes are priced for the
+fork in gasEstimatesFork, Berlin unless --fork byzantium is given, with
+every account and storage slot accessed cold (EIP-2929). They are well
+above the gas usually used, which is refunded. A call to another contract
+is bounded by the function it calls in the contracts of this repository
+built with the same options, so the estimates of the functions listed in
+gasEstimatesRepositoryCalls, such as release() of token_vesting and
+token_timelock, only hold for tokens built from this repository.
+
+--report deploys every contract with and without the build options on the
+in-process EVM and prints the bytecode and deploy gas they save.
+--check-gas runs every estimated function on the in-process EVM with its
+estimate as the gas limit and prints the gas it used, in the usual and in
+the worst case of tools/scenarios.py, and also with holder_index and with
+dividends added to the build options.
+
+Usage:
+
+    python -m tools.build
+    python -m tools.build lockable_token --canonical-events
+    python -m tools.build lockable_token --holder-index
+    python -m tools.build lockable_token --dividends --compact-errors
+    python -m tools.build lockable_token --constant-metadata --constant _name=Token --constant _symbol=TKN \
+        --constant _decimals=18 --constant _maximumSupply=2000000000000000000000000
+    python -m tools.build --compact-errors --report
+    python -m tools.build --check-gas
+    python -m tools.build --check-gas --fork byzantium
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+from vyper import compile_lll, compiler, optimizer
+from vyper.opcodes import comb_opcodes
+from vyper.parser import parser
+from vyper.utils import ceil32
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACTS_DIR = os.path.join(ROOT_DIR, 'contracts')
+EXTENSION = '.v.py'
+BUILD_DIR = os.path.join(ROOT_DIR, 'build')
+ARTIFACT_EXTENSION = '.vyper.json'
+ERROR_CODES_FILE = 'error_codes.json'
+
+OUTPUT_FORMATS = ['abi', 'bytecode', 'bytecode_runtime', 'source_map']
+
+# The largest runtime bytecode a deployment may return (EIP-170).
+MAX_CODE_SIZE = 24576
+
+_compiled = {}
+
+
+def contract_names():
+    """
+    Returns the names of all Vyper contracts in the contracts directory.
+    """
+    return sorted(
+        file_name[:-len(EXTENSION)]
+        for file_name in os.listdir(CONTRACTS_DIR)
+        if file_name.endswith(EXTENSION)
+    )
+
+
+def contract_path(name):
+    return os.path.join(CONTRACTS_DIR, name + EXTENSION)
+
+
+def read_source(name):
+    with open(contract_path(name)) as source_file:
+        return source_file.read()
+
+
+def canonical_events(source):
+    """
+    Removes the Mint and Burn events. The Transfer event logged next to them
+    carries the same information.
+    """
+    source = re.sub(r'^[ \t]*log\.(Mint|Burn)\(.*\)\n', '', source, flags=re.MULTILINE)
+    return re.sub(r'^(Mint|Burn): event\(.*\)\n', '', source, flags=re.MULTILINE)
+
+
+# The constructor parameters compiled as constants by constant_metadata:
+# (parameter, storage variable, constant, type).
+METADATA = [
+    ('_name', 'name', 'NAME', 'bytes32'),
+    ('_symbol', 'symbol', 'SYMBOL', 'bytes32'),
+    ('_decimals', 'decimals', 'DECIMALS', 'int128'),
+    ('_maximumSupply', 'maximumSupply', 'MAXIMUM_SUPPLY', 'uint256'),
+]
+
+
+def constant_literal(abi_type, value):
+    """
+    Returns the Vyper literal of a constructor argument given as in a
+    deployment manifest: text or 0x-prefixed hex for bytes32, a number or
+    numeric text for integers.
+    """
+    if abi_type == 'bytes32':
+        if isinstance(value, str):
+            value = bytes.fromhex(value[2:]) if value.startswith('0x') else value.encode()
+
+        if len(value) > 32:
+            raise ValueError('{0!r} does not fit in bytes32.'.format(value))
+
+        return '0x' + value.ljust(32, b'\0').hex()
+
+    value = int(value, 0) if isinstance(value, str) else int(value)
+
+    if value < 0 or value >= 2 ** (127 if abi_type == 'int128' else 256):
+        raise ValueError('{0} is out of range for {1}.'.format(value, abi_type))
+
+    return str(value)
+
+
+def metadata_constants(arguments):
+    """
+    Returns the values of the constant_metadata parameters among the supplied
+    constructor arguments.
+    """
+    parameters = [parameter for parameter, variable, constant, abi_type in METADATA]
+    return OrderedDict((name, value) for name, value in sorted(arguments.items()) if name in parameters)
+
+
+def constant_metadata(source, constants):
+    """
+    Replaces the metadata kept in storage by constants and public constant
+    getters, and removes their constructor parameters. A contract is only
+    rewritten for the metadata it declares, and every value it needs must be
+    supplied.
+    """
+    getters = []
+
+    for parameter, variable, constant, abi_type in METADATA:
+        declaration = re.compile(r'^{0}: public\({1}\)$'.format(variable, abi_type), re.MULTILINE)
+
+        if not declaration.search(source):
+            continue
+
+        if parameter not in constants:
+            raise ValueError('The constant_metadata option needs a value for {0}.'.format(parameter))
+
+        literal = constant_literal(abi_type, constants[parameter])
+        source = declaration.sub('{0}: constant({1}) = {2}'.format(constant, abi_type, literal), source)
+        source = re.sub(r'^[ \t]*self\.{0} = {1}\n'.format(variable, parameter), '', source, flags=re.MULTILINE)
+        source = re.sub(r'(, )?\b{0}: {1}\b(, )?'.format(parameter, abi_type),
+                        lambda match: ', ' if match.group(1) and match.group(2) else '', source)
+        source = re.sub(r'\b{0}\b|\bself\.{1}\b'.format(parameter, variable), constant, source)
+        getters.append('@public\n@constant\ndef {0}() -> {1}:\n    return {2}\n'.format(variable, abi_type, constant))
+
+    if getters:
+        source = source.rstrip('\n') + '\n\n#METADATA\n\n' + '\n'.join(getters)
+
+    return source
+
+
+HOLDER_INDEX_STORAGE = '''
+#HOLDER INDEX
+holders: map(uint256, address)
+holderIndex: map(address, uint256)
+holderCount: public(uint256)
+'''
+
+HOLDER_INDEX_FUNCTIONS = '''#HOLDER INDEX
+# Every account with a non-zero balance is listed once in holders. An
+# account is appended when its balance becomes non-zero and is removed when
+# its balance returns to zero by moving the last holder into its place.
+# holderIndex is the position of an account plus one, zero when absent.
+
+@private
+def updateHolder(_account: address):
+    """
+    @notice Adds an account to the holder index or removes it from the index
+    according to its balance.
+    """
+
+    _index: uint256 = self.holderIndex[_account]
+
+    if self.balances[_account] == 0 and _index != 0:
+        _last: address = self.holders[self.holderCount - 1]
+
+        self.holders[_index - 1] = _last
+        self.holderIndex[_last] = _index
+        self.holders[self.holderCount - 1] = ZERO_ADDRESS
+        self.holderIndex[_account] = 0
+        self.holderCount -= 1
+    elif self.balances[_account] != 0 and _index == 0:
+        self.holders[self.holderCount] = _account
+        self.holderCount += 1
+        self.holderIndex[_account] = self.holderCount
+
+@public
+@constant
+def holderAt(_index: uint256) -> address:
+    """
+    @notice Returns the holder at a position of the index, in no particular
+    order. Positions from holderCount() on return the zero address.
+    @param _index The position of the holder, starting at zero.
+    """
+
+    return self.holders[_index]
+
+
+'''
+
+BALANCES_PATTERN = re.compile(r'^balances: public\(map\(address, uint256\)\)\n', re.MULTILINE)
+BALANCE_CHANGE_PATTERN = re.compile(r'^([ \t]*)self\.balances\[([^\]]+)\] ([-+]?)= (.*)\n', re.MULTILINE)
+
+
+def add_feature(source, events, storage, functions, hook):
+    """
+    Adds a feature to a token: the events after the Transfer event, the
+    storage after the balances, the functions before the first function, and
+    the lines returned by hook(indent, account, operator, value) after every
+    statement which changes a balance. The operator is empty for the
+    assignment of the initial supply in the constructor.
+    """
+    source = re.sub(r'^Transfer: event\(.*\)\n', lambda match: match.group(0) + events, source, flags=re.MULTILINE)
+    source = BALANCES_PATTERN.sub(lambda match: match.group(0) + storage, source)
+    source = BALANCE_CHANGE_PATTERN.sub(lambda match: match.group(0) + hook(*match.groups()), source)
+
+    first_function = re.search(r'^@(public|private)$', source, re.MULTILINE).start()
+    return source[:first_function] + functions + source[first_function:]
+
+
+# The constructor cannot call private functions. Its balance is the first
+# one to be set, while the index is still empty.
+CONSTRUCTOR_HOLDER = """{0}if self.balances[{1}] != 0:
+{0}    self.holders[0] = {1}
+{0}    self.holderIndex[{1}] = 1
+{0}    self.holderCount = 1
+"""
+
+
+def holder_index(source):
+    """
+    Adds an enumerable index of the accounts with a non-zero balance, kept up
+    to date after every change of a balance.
+    """
+    if not BALANCES_PATTERN.search(source):
+        return source
+
+    def update(indent, account, operator, value):
+        if operator:
+            return '{0}self.updateHolder({1})\n'.format(indent, account)
+
+        return CONSTRUCTOR_HOLDER.format(indent, account)
+
+    return add_feature(source, '', HOLDER_INDEX_STORAGE, HOLDER_INDEX_FUNCTIONS, update)
+
+
+DIVIDENDS_EVENTS = '''DividendsDistributed: event({_from: indexed(address), _value: uint256(wei)})
+DividendWithdrawn: event({_to: indexed(address), _value: uint256(wei)})
+DividendsExcluded: event({_account: indexed(address)})
+'''
+
+DIVIDENDS_STORAGE = '''
+#DIVIDENDS
+magnifiedDividendPerShare: public(uint256)
+magnifiedDividendCredits: map(address, uint256)
+magnifiedDividendDebits: map(address, uint256)
+withdrawnDividends: public(map(address, uint256))
+dividendsExcluded: public(map(address, bool))
+excludedSupply: public(uint256)
+'''
+
+DIVIDENDS_FUNCTIONS = '''#DIVIDENDS
+# Ether sent to distributeDividends is shared among the holders in
+# proportion to their balances, in constant time whatever the number of
+# holders, and every holder withdraws their dividends when they want.
+# magnifiedDividendPerShare accumulates the dividends per token, multiplied
+# by 2 ** 128 to keep the rounding error small. The dividends earned by an
+# account are magnifiedDividendPerShare times its balance, corrected for
+# the balance changes after earlier distributions: tokens sent add their
+# dividends per share at that time to the credits of the account and tokens
+# received add them to its debits. A distribution reverts when the
+# dividends per share times the largest possible balance would leave less
+# than 32 bits of headroom below 2 ** 256, so that neither these products
+# nor the corrections accumulated as tokens move can overflow and make
+# transfers revert.
+
+@private
+@constant
+def withdrawableDividendOf(_owner: address) -> uint256:
+    """
+    @notice Returns the dividends earned by an account and not withdrawn yet.
+    """
+
+    if self.dividendsExcluded[_owner]:
+        return 0
+
+    _earned: uint256 = self.magnifiedDividendPerShare * self.balances[_owner] + self.magnifiedDividendCredits[_owner]
+    return (_earned - self.magnifiedDividendDebits[_owner]) / 340282366920938463463374607431768211456 - self.withdrawnDividends[_owner]
+
+@public
+@constant
+def dividendOf(_owner: address) -> uint256:
+    """
+    @notice Returns the dividends in wei an account can withdraw.
+    @param _owner The address to query the dividends of.
+    """
+
+    return self.withdrawableDividendOf(_owner)
+
+@public
+@payable
+def distributeDividends():
+    """
+    @notice Distributes the ether sent among the holders in proportion to their balances.
+    Reverts when the supply which is not excluded is zero or too small for
+    the ether sent. The remainder of the division stays in the contract.
+    """
+
+    self.magnifiedDividendPerShare += as_unitless_number(msg.value) * 340282366920938463463374607431768211456 / (self.totalSupply - self.excludedSupply)
+    assert self.magnifiedDividendPerShare <= 115792089237316195423570985008687907853269984665640564039457584007913129639935 / {supply} / 4294967296, "The total supply is too small to distribute these dividends."
+
+    log.DividendsDistributed(msg.sender, msg.value)
+
+@public
+def withdrawDividend():
+    """
+    @notice Sends the dividends of the sender to the sender.
+    """
+
+    _amount: uint256 = self.withdrawableDividendOf(msg.sender)
+    assert _amount > 0, "You don't have any dividends to withdraw."
+
+    self.withdrawnDividends[msg.sender] += _amount
+
+    log.DividendWithdrawn(msg.sender, as_wei_value(_amount, "wei"))
+    send(msg.sender, as_wei_value(_amount, "wei"))
+
+@public
+def excludeFromDividends(_account: address):
+    """
+    @notice Leaves an account which cannot withdraw ether, such as a vesting,
+    timelock, stream or airdrop contract, out of the dividends for good. Its
+    balance no longer counts in the distributions, so the other holders
+    share them in full, and the dividends it earned before are forfeited.
+    @param _account The account to exclude.
+    """
+
+    assert msg.sender == self.owner, "Access is denied."
+    assert not self.dividendsExcluded[_account], "This account is already excluded from dividends."
+
+    self.dividendsExcluded[_account] = True
+    self.excludedSupply += self.balances[_account]
+
+    log.DividendsExcluded(_account)
+
+
+'''
+
+
+EXCLUDED_BALANCE_CHANGE = """{0}self.{1}[{2}] += self.magnifiedDividendPerShare * {4}
+{0}if self.dividendsExcluded[{2}]:
+{0}    self.excludedSupply {3}= {4}
+"""
+
+
+def dividends(source):
+    """
+    Adds the distribution of ether dividends to the holders in proportion to
+    their balances, with corrections kept up to date after every change of a
+    balance. The owner excludes the accounts which cannot withdraw ether, so
+    tokens without an owner are left unchanged.
+    """
+    if not BALANCES_PATTERN.search(source) or not re.search(r'^owner: ', source, re.MULTILINE):
+        return source
+
+    def correct(indent, account, operator, value):
+        if not operator:
+            return ''
+
+        corrections = 'magnifiedDividendCredits' if operator == '-' else 'magnifiedDividendDebits'
+        return EXCLUDED_BALANCE_CHANGE.format(indent, corrections, account, operator, value)
+
+    # No balance can exceed the maximum supply, or the current total supply of tokens which cannot be minted.
+    supply = 'self.maximumSupply' if re.search(r'^maximumSupply: ', source, re.MULTILINE) else 'self.totalSupply'
+
+    return add_feature(source, DIVIDENDS_EVENTS, DIVIDENDS_STORAGE, DIVIDENDS_FUNCTIONS.format(supply=supply), correct)
+
+
+REASON_PATTERN = re.compile(r'^([ \t]*assert .*, )"([^"]*)"[ \t]*$', re.MULTILINE)
+
+# The number of hex digits of an error code.
+ERROR_CODE_DIGITS = 5
+
+_error_codes = None
+
+
+def error_code(message):
+    """
+    Returns the code of an assert reason string: "E" followed by the first
+    hex digits of its SHA-256 hash. It only depends on the message, so a code
+    keeps its meaning when contracts or messages are added.
+    """
+    return 'E' + hashlib.sha256(message.encode()).hexdigest()[:ERROR_CODE_DIGITS]
+
+
+def error_codes():
+    """
+    Returns the code of every assert reason string of the contracts and of
+    the functions added by build options, in the order of first appearance
+    over the contracts sorted by name. A message used in several places or
+    contracts has a single code.
+    """
+    global _error_codes
+
+    if _error_codes is None:
+        codes = OrderedDict()
+        messages = {}
+        sources = [read_source(name) for name in contract_names()] + [DIVIDENDS_FUNCTIONS]
+
+        for source in sources:
+            for match in REASON_PATTERN.finditer(source):
+                message = match.group(2)
+                code = codes.setdefault(message, error_code(message))
+
+                if messages.setdefault(code, message) != message:
+                    raise ValueError('The messages {0!r} and {1!r} have the same code {2}.'.format(messages[code], message, code))
+
+        _error_codes = codes
+
+    return _error_codes
+
+
+def decode_error(reason):
+    """
+    Returns the message of a compact error code, or the reason unchanged if
+    it is not a code.
+    """
+    messages = {code: message for message, code in error_codes().items()}
+    return messages.get(reason, reason)
+
+
+def compact_errors(source):
+    """
+    Replaces the assert reason strings by their error codes.
+    """
+    codes = error_codes()
+    return REASON_PATTERN.sub(lambda match: '{0}"{1}"'.format(match.group(1), codes[match.group(2)]), source)
+
+
+def write_error_codes(output_dir=BUILD_DIR):
+    """
+    Writes the table of error codes and their messages.
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    path = os.path.join(output_dir, ERROR_CODES_FILE)
+
+    with open(path, 'w') as table_file:
+        json.dump(OrderedDict((code, message) for message, code in error_codes().items()), table_file, indent=2)
+
+    return path
+
+
+TRANSFORMS = OrderedDict([
+    ('canonical_events', canonical_events),
+    ('holder_index', holder_index),
+    ('dividends', dividends),
+    ('constant_metadata', constant_metadata),
+    ('compact_errors', compact_errors),
+])
+
+# Build options whose transform also takes the constants of a deployment.
+CONSTANT_TRANSFORMS = {'constant_metadata'}
+
+
+def transform_source(source, options=(), constants=None):
+    """
+    Applies the supplied build options to the source code.
+    """
+    for option in TRANSFORMS:
+        if option in CONSTANT_TRANSFORMS and option in options:
+            source = TRANSFORMS[option](source, constants or {})
+        elif option in options:
+            source = TRANSFORMS[option](source)
+
+    unknown = set(options) - set(TRANSFORMS)
+    if unknown:
+        raise ValueError('Unknown build options: {0}'.format(', '.join(sorted(unknown))))
+
+    return source
+
+
+def _inherit_positions(node, position=None):
+    if node.pos is None:
+        node.pos = position
+
+    for argument in node.args:
+        _inherit_positions(argument, node.pos)
+
+
+def _map_positions(assembly, positions, pc=0):
+    for index, item in enumerate(assembly):
+        if isinstance(item, list):
+            pc = _map_positions(item, positions, pc)
+            continue
+
+        if isinstance(item, compile_lll.instruction) and item.lineno is not None:
+            positions.setdefault(pc, (item.lineno, item.col_offset))
+
+        if item in ('DEBUG', 'BLANK'):
+            continue
+
+        if compile_lll.is_symbol(item):
+            if assembly[index + 1] not in ('JUMPDEST', 'BLANK'):
+                pc += 3
+        else:
+            pc += 1
+
+    return pc
+
+
+def runtime_source_map(source):
+    """
+    Maps every program counter of the runtime bytecode to a (line, column)
+    position in the source code.
+
+    The source map of the compiler only covers instructions generated by LLL
+    nodes which carry a position, which leaves most of the function bodies
+    unmapped. Here nodes without a position inherit the position of their
+    parent before the code is assembled.
+    """
+    lll = parser.parse_to_lll(source, runtime_only=True)
+    _inherit_positions(lll)
+    lll = optimizer.optimize(lll)
+    _inherit_positions(lll)
+
+    positions = {}
+    _map_positions(compile_lll.compile_to_assembly(lll), positions)
+    return positions
+
+
+# The functions whose transaction gas limit is written into the artifacts.
+GAS_ESTIMATED_FUNCTIONS = ('transfer', 'transferFrom', 'approve', 'mint', 'burn', 'release')
+
+# The cost of a call which sends ether to a new account, the same in every fork.
+GAS_CALL_VALUE = 34000
+
+# The costs of the opcodes which differ from the table of the compiler, per
+# fork. The compiler prices STATICCALL below its Byzantium cost. From Berlin
+# on, the first access to an account or a storage slot in a transaction is
+# cold (EIP-2929) and every access is priced as cold.
+GAS_COSTS = OrderedDict([
+    ('byzantium', {'STATICCALL': 700}),
+    ('berlin', dict(
+        [('SLOAD', 2100), ('SSTORE', 22100)] +
+        [(opcode, 2600) for opcode in ('BALANCE', 'EXTCODESIZE', 'EXTCODECOPY', 'CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL')]
+    )),
+])
+
+# The fork of the chains the contracts are deployed to.
+GAS_FORK = 'berlin'
+
+# The options --check-gas adds in turn to the build options, as they add
+# storage writes to every balance change.
+GAS_CHECKED_OPTIONS = ((), ('holder_index',), ('dividends', 'compact_errors'))
+
+STATIC_TYPE_PATTERN = re.compile(r'^(?!bytes$|string$)\w+((\[\d+\])*)$')
+
+
+def _constant_size(node):
+    if not isinstance(node.value, int):
+        raise ValueError('The size of {0} is not constant.'.format(node.value))
+
+    return node.value
+
+
+def _method_id(arguments):
+    """
+    Returns the method id the arguments of a call start with.
+    """
+    first = arguments.args[0] if arguments.args else None
+
+    if first is None or first.value != 'mstore' or not isinstance(first.args[1].value, int):
+        raise ValueError('The method of a call is not constant.')
+
+    return first.args[1].value
+
+
+class StaticGas(object):
+    """
+    Upper bounds of the gas used by the public functions of a contract,
+    derived from its LLL without running it.
+
+    The rules are those of the gas estimates the compiler writes into the
+    ABI, with three changes which make them safe and tight enough to be used
+    as gas limits: a private function is counted once per call instead of
+    twice, the opcodes are priced for `fork` from GAS_COSTS, and a call of a
+    public function adds the bound of that function: of the contract itself,
+    or found by its method id with `resolve` for another contract. The
+    Berlin bounds are also bounds on Byzantium, whose costs are all lower. A
+    loop without a constant number of rounds, or a log or copy of a variable
+    size, has no bound and raises a ValueError.
+    """
+
+    def __init__(self, source, resolve, fork=GAS_FORK):
+        self.resolve = resolve
+        self.costs = GAS_COSTS[fork]
+        self.dispatcher = 0
+        self.public = {}
+        self.private = {}
+        self.private_gas = {}
+
+        for node in parser.parse_to_lll(source, runtime_only=True).args:
+            if node.value == 'if' and node.args[0].value == 'eq':
+                method_id = [item.value for item in node.args[0].args if isinstance(item.value, int)][0]
+                self.public[method_id] = node
+                self.dispatcher += self.gas(node.args[0], []) + 17
+            elif node.value == 'if':
+                self.private[node.args[1].args[0].args[0].value] = node
+            else:
+                self.dispatcher += self.gas(node, [])
+
+    def function_gas(self, method_id):
+        """
+        Returns the bound of a call of a public function, including the
+        dispatcher and the memory it and the private functions it calls use.
+        """
+        node = self.public[method_id]
+        memory = [node.total_gas - node.gas]
+        return self.dispatcher + self.gas(node.args[1], memory) + max(memory)
+
+    def calls_contracts(self, method_id):
+        """
+        Returns whether a public function, or a function it calls, calls
+        another contract, whose bound then depends on `resolve`.
+        """
+        pending = [self.public[method_id]]
+        seen = set()
+
+        while pending:
+            node = pending.pop()
+
+            if node.value in ('call', 'staticcall') and not isinstance(node.args[1].value, int):
+                if node.args[1].value != 'address':
+                    return True
+
+                callee = _method_id(node.args[3 if node.value == 'call' else 2])
+
+                if callee not in seen:
+                    seen.add(callee)
+                    pending.append(self.public[callee])
+
+            if node.value == 'goto' and node.args[0].value in self.private and node.args[0].value not in seen:
+                seen.add(node.args[0].value)
+                pending.append(self.private[node.args[0].value])
+
+            pending.extend(node.args)
+
+        return False
+
+    def call_private(self, label, memory):
+        if label not in self.private_gas:
+            node = self.private[label]
+            used = [node.total_gas - node.gas]
+            self.private_gas[label] = (self.gas(node.args[1], used), max(used))
+
+        gas, used = self.private_gas[label]
+        memory.append(used)
+        return gas
+
+    def call_external(self, node):
+        gas_limit, address = node.args[:2]
+        gas = GAS_CALL_VALUE if node.value == 'call' and node.args[2].value != 0 else 0
+
+        if isinstance(gas_limit.value, int):
+            return gas + gas_limit.value
+
+        # Precompiles: the compiler adds their cost to the copy it makes with them.
+        if isinstance(address.value, int):
+            return gas
+
+        method_id = _method_id(node.args[3 if node.value == 'call' else 2])
+        callee = self.function_gas(method_id) if address.value == 'address' else self.resolve(method_id)
+
+        # Only 63/64 of the remaining gas is passed on to the callee (EIP-150).
+        return gas + -(-callee * 64 // 63)
+
+    def gas(self, node, memory):
+        """
+        Returns the bound of an LLL node and adds the memory expansion cost
+        of the private functions it calls to `memory`.
+        """
+        value = node.value
+        arguments = node.args
+
+        if not isinstance(value, str):
+            return 5
+
+        if value == 'seq_unchecked' and (node.annotation or '').startswith('Internal Call'):
+            label = [item.args[0].value for item in arguments if item.value == 'goto'][0]
+            return sum(self.gas(item, memory) for item in arguments) + 30 + self.call_private(label, memory)
+
+        if value == 'if':
+            test = self.gas(arguments[0], memory)
+
+            if len(arguments) == 3:
+                gas = test + max(self.gas(arguments[1], memory), self.gas(arguments[2], memory)) + 3
+            else:
+                gas = test + self.gas(arguments[1], memory) + 17
+
+        elif value == 'repeat':
+            # The arguments are the index, the start, the number of rounds and the body.
+            rounds = arguments[2].value
+
+            if not isinstance(rounds, int):
+                raise ValueError('A loop has no constant number of rounds.')
+
+            gas = rounds * (self.gas(arguments[3], memory) + 50) + 30
+
+        elif value.upper() in comb_opcodes:
+            _, inputs, outputs, gas = comb_opcodes[value.upper()]
+            gas = self.costs.get(value.upper(), gas) + 2 * (outputs - inputs) + sum(self.gas(item, memory) for item in arguments)
+
+            if value.upper().startswith('LOG'):
+                gas += 8 * _constant_size(arguments[1])
+            elif value in ('calldatacopy', 'codecopy'):
+                gas += ceil32(_constant_size(arguments[2])) // 32 * 3
+            elif value in ('call', 'staticcall'):
+                gas += self.call_external(node)
+            elif value == 'goto' and not arguments[0].value.startswith('priv_'):
+                raise ValueError('A loop has no constant number of rounds.')
+
+        else:
+            gas = sum(self.gas(item, memory) for item in arguments)
+            gas += {'seq': 30, 'seq_unchecked': 30, 'with': 5, 'if_unchecked': 17, 'multi': 0}.get(value, 5)
+
+        return gas + node.add_gas_estimate
+
+
+_static_gas = {}
+_resolving = set()
+
+
+def static_gas(name, options=(), fork=GAS_FORK):
+    """
+    Returns the StaticGas of a contract built with the supplied options,
+    priced for `fork`, in which calls to other contracts are bounded by the
+    largest bound of the function called among the contracts of this
+    repository built with the same options.
+    """
+    options = tuple(sorted(set(options) - CONSTANT_TRANSFORMS))
+    key = (name, options, fork)
+
+    def resolve(method_id):
+        if method_id in _resolving:
+            raise ValueError('The call of method {0} is recursive.'.format(method_id))
+
+        _resolving.add(method_id)
+
+        try:
+            bounds = [
+                static_gas(other, options, fork).function_gas(method_id)
+                for other in contract_names()
+                if method_id in static_gas(other, options, fork).public
+            ]
+        finally:
+            _resolving.discard(method_id)
+
+        if not bounds:
+            raise ValueError('No contract has method {0}.'.format(method_id))
+
+        return max(bounds)
+
+    if key not in _static_gas:
+        _static_gas[key] = StaticGas(transform_source(read_source(name), options), resolve, fork)
+
+    return _static_gas[key]
+
+
+def _compiled_static_gas(compiled, fork):
+    bounds = static_gas(compiled['name'], compiled['options'], fork)
+
+    # Constants change the code, so the contract is bounded on its own.
+    if CONSTANT_TRANSFORMS & set(compiled['options']):
+        bounds = StaticGas(compiled['source'], bounds.resolve, fork)
+
+    return bounds
+
+
+def gas_estimates(compiled, fork=GAS_FORK):
+    """
+    Returns the gas limit on `fork` of a transaction calling each of the
+    GAS_ESTIMATED_FUNCTIONS of a compiled contract: the static bound of its
+    execution plus the intrinsic gas of its calldata with no zero bytes, at
+    the Byzantium price which no later fork exceeds. Functions without a
+    bound or with dynamic arguments are left out.
+    """
+    from eth.constants import GAS_TX, GAS_TXDATANONZERO
+    from eth_utils import function_abi_to_4byte_selector
+
+    bounds = _compiled_static_gas(compiled, fork)
+    estimates = OrderedDict()
+
+    for item in compiled['abi']:
+        if item['type'] != 'function' or item['name'] not in GAS_ESTIMATED_FUNCTIONS:
+            continue
+
+        if not all(STATIC_TYPE_PATTERN.match(argument['type']) for argument in item['inputs']):
+            continue
+
+        words = 0
+
+        for argument in item['inputs']:
+            size = 1
+
+            for dimension in re.findall(r'\[(\d+)\]', argument['type']):
+                size *= int(dimension)
+
+            words += size
+
+        try:
+            gas = bounds.function_gas(int.from_bytes(function_abi_to_4byte_selector(item), 'big'))
+        except ValueError:
+            continue
+
+        estimates[item['name']] = GAS_TX + (4 + 32 * words) * GAS_TXDATANONZERO + gas
+
+    return estimates
+
+
+def repository_calls(compiled, estimates):
+    """
+    Returns the names of the estimated functions which call another
+    contract, so that their estimates only hold when it is one of the
+    contracts of this repository, such as release() calling the token.
+    """
+    from eth_utils import function_abi_to_4byte_selector
+
+    bounds = _compiled_static_gas(compiled, GAS_FORK)
+
+    return [
+        item['name'] for item in compiled['abi']
+        if item['type'] == 'function' and item['name'] in estimates
+        and bounds.calls_contracts(int.from_bytes(function_abi_to_4byte_selector(item), 'big'))
+    ]
+
+
+def compile_source(source, name=''):
+    """
+    Compiles the supplied Vyper source code.
+    @return A dictionary with the contract name, source, ABI, bytecode,
+    runtime bytecode, the compiler source map and the runtime source map
+    (pc_map).
+    """
+    output = compiler.compile_code(source, OUTPUT_FORMATS)
+    output['name'] = name
+    output['source'] = source
+    output['pc_map'] = runtime_source_map(source)
+    return output
+
+
+def compile_contract(name, options=(), constants=None):
+    """
+    Compiles a contract of this repository with the supplied build options.
+    constants holds the constructor arguments compiled into the code by
+    constant_metadata, by parameter name; other arguments are ignored.
+    Compilation results are cached for the lifetime of the process.
+    Raises ValueError when the options make the runtime bytecode too large to
+    be deployed, for example holder_index and dividends together on
+    lockable_token.
+    """
+    constants = metadata_constants(constants or {}) if CONSTANT_TRANSFORMS & set(options) else OrderedDict()
+    key = (name, tuple(sorted(options)), tuple(constants.items()))
+
+    if key not in _compiled:
+        compiled = compile_source(transform_source(read_source(name), options, constants), name)
+        size = len(compiled['bytecode_runtime']) // 2 - 1
+
+        if size > MAX_CODE_SIZE:
+            raise ValueError('{0} built with {1} has {2} bytes of runtime code, over the limit of {3} bytes.'.format(
+                name, ', '.join(sorted(options)), size, MAX_CODE_SIZE
+            ))
+
+        _compiled[key] = compiled
+        _compiled[key]['options'] = list(key[1])
+        _compiled[key]['constants'] = constants
+
+    return _compiled[key]
+
+
+def artifact(compiled, fork=GAS_FORK):
+    """
+    Returns the build artifact written for a compiled contract, with the gas
+    estimates for `fork`.
+    """
+    estimates = gas_estimates(compiled, fork)
+
+    return OrderedDict([
+        ('contractName', compiled['name']),
+        ('options', compiled['options']),
+        ('constants', compiled.get('constants', {})),
+        ('abi', compiled['abi']),
+        ('bytecode', compiled['bytecode']),
+        ('deployedBytecode', compiled['bytecode_runtime']),
+        ('sourceMap', compiled['source_map']),
+        ('gasEstimates', estimates),
+        ('gasEstimatesFork', fork),
+        ('gasEstimatesRepositoryCalls', repository_calls(compiled, estimates)),
+    ])
+
+
+def write_artifact(compiled, output_dir=BUILD_DIR, fork=GAS_FORK):
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    path = os.path.join(output_dir, compiled['name'] + ARTIFACT_EXTENSION)
+
+    with open(path, 'w') as artifact_file:
+        json.dump(artifact(compiled, fork), artifact_file, indent=2)
+
+    return path
+
+
+def report(names, options, constants):
+    """
+    Prints the runtime bytecode size and the deploy gas of every contract
+    without and with the build options.
+    """
+    from eth_abi import encode_abi
+
+    from tools.evm import LocalEVM
+    from tools.scenarios import constructor_arguments
+
+    print('{0:<24} {1:>15} {2:>8} {3:>21} {4:>8}'.format('', 'bytes', 'saved', 'deploy gas', 'saved'))
+
+    for name in names:
+        sizes = []
+        gas = []
+
+        for compiled in (compile_contract(name), compile_contract(name, options, constants)):
+            evm = LocalEVM()
+            inputs = [item for item in compiled['abi'] if item['type'] == 'constructor']
+            inputs = inputs[0]['inputs'] if inputs else []
+            arguments = constructor_arguments(evm, name, [item['name'] for item in inputs])
+            bytecode = bytes.fromhex(compiled['bytecode'][2:]) + encode_abi([item['type'] for item in inputs], arguments)
+            receipt, address = evm.deploy_code(bytecode, sender=evm.accounts[0])
+
+            if not receipt.success:
+                raise ValueError('Could not deploy {0}: {1}'.format(name, receipt.error))
+
+            sizes.append((len(compiled['bytecode_runtime']) - 2) // 2)
+            gas.append(receipt.gas_used)
+
+        print('{0:<24} {1:>6} -> {2:>6} {3:>8} {4:>9} -> {5:>9} {6:>8}'.format(
+            name, sizes[0], sizes[1], sizes[0] - sizes[1], gas[0], gas[1], gas[0] - gas[1]
+        ))
+
+
+def check_gas_estimates(names, options, fork=GAS_FORK):
+    """
+    Runs the usual and the worst case scenario of every estimated function on
+    the in-process EVM with its estimate for `fork` as the gas limit, and
+    prints the gas used. Every contract is checked built with the supplied
+    options and with each of GAS_CHECKED_OPTIONS added, leaving out builds
+    too large to deploy. The in-process EVM runs Byzantium, so only the
+    Byzantium estimates are checked tightly. Contracts built with
+    constant_metadata are checked without it, as its constants only remove
+    storage reads.
+    @return False if a call failed within its estimate.
+    """
+    from tools.evm import LocalEVM
+    from tools.scenarios import prepare
+
+    options = [option for option in options if option not in CONSTANT_TRANSFORMS]
+    valid = True
+
+    print('{0:<24} {1:<28} {2:<20} {3:>9} {4:>9} {5:>9}'.format('', 'options', '', 'estimate', 'used', 'headroom'))
+
+    for name in names:
+        for added in GAS_CHECKED_OPTIONS:
+            build = sorted(set(options) | set(added))
+
+            try:
+                estimates = gas_estimates(compile_contract(name, build), fork)
+            except ValueError as error:
+                print('{0:<24} {1:<28} skipped: {2}'.format(name, ','.join(build), error))
+                continue
+
+            for function, estimate in estimates.items():
+                for worst_case in (False, True):
+                    evm = LocalEVM()
+                    call = prepare(evm, name, function, build, worst_case)
+
+                    if call is None:
+                        continue
+
+                    label = function + (' (worst)' if worst_case else '')
+                    data = call.contract.encode(function, *call.arguments)
+                    receipt = evm.execute(call.sender, call.contract.address, data, gas=estimate)
+
+                    if not receipt.success:
+                        print('{0:<24} {1:<28} {2:<20} {3:>9} FAILED: {4}'.format(
+                            name, ','.join(build), label, estimate, receipt.error
+                        ))
+                        valid = False
+                        continue
+
+                    print('{0:<24} {1:<28} {2:<20} {3:>9} {4:>9} {5:>9}'.format(
+                        name, ','.join(build), label, estimate, receipt.gas_used, estimate - receipt.gas_used
+                    ))
+
+    return valid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('contracts', nargs='*', help='Defaults to all contracts.')
+    parser.add_argument('--output-dir', default=BUILD_DIR)
+
+    for option in TRANSFORMS:
+        parser.add_argument('--' + option.replace('_', '-'), action='store_true', dest=option)
+
+    parser.add_argument('--constant', action='append', default=[], metavar='PARAMETER=VALUE',
+                        help='A constructor argument compiled into the code, for example _symbol=TKN.')
+    parser.add_argument('--report', action='store_true',
+                        help='Prints the bytecode and deploy gas saved by the options instead of writing artifacts.')
+    parser.add_argument('--check-gas', action='store_true',
+                        help='Checks the gas estimates against runs on the in-process EVM instead of writing artifacts.')
+    parser.add_argument('--fork', choices=list(GAS_COSTS), default=GAS_FORK,
+                        help='The fork the gas estimates are priced for, {0} by default.'.format(GAS_FORK))
+    args = parser.parse_args()
+    options = [option for option in TRANSFORMS if getattr(args, option)]
+    constants = OrderedDict(item.split('=', 1) for item in args.constant)
+
+    if args.report:
+        report(args.contracts or contract_names(), options, constants)
+        return
+
+    if args.check_gas:
+        if not check_gas_estimates(args.contracts or contract_names(), options, args.fork):
+            raise SystemExit(1)
+
+        return
+
+    if 'compact_errors' in options:
+        print('{0:<24} {1:>6} codes  {2}'.format('error codes', len(error_codes()), os.path.relpath(write_error_codes(args.output_dir))))
+
+    for name in args.contracts or contract_names():
+        compiled = compile_contract(name, options, constants)
+        path = write_artifact(compiled, args.output_dir, args.fork)
+        size = (len(compiled['bytecode_runtime']) - 2) // 2
+        print('{0:<24} {1:>6} bytes  {2}'.format(name, size, os.path.relpath(path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+A client-side cache of the constant functions of the tokens and vesting contracts.
+
+balanceOf, allowance, cap and getVestedAmount are read through the batching
+client of tools/client.py and kept in a bounded LRU cache. Entries are not
+expired by time alone but invalidated precisely by the logs of the
+contracts, decoded with tools/events.py:
+
+- Transfer, Mint and Burn invalidate the balances of the accounts involved.
+  Transfer also invalidates every cached allowance of the sender, since
+  transferFrom spends an allowance without logging Approval.
+- Approval invalidates the allowance of the owner and spender.
+- getVestedAmount changes with the block timestamp, so its entries are keyed
+  by the timestamp of the latest synchronised block and dropped when a block
+  with a new timestamp arrives. Transfers of the token to or from the
+  vesting contract and its Released and Revoked logs invalidate them too.
+- cap never changes and is only subject to eviction and the optional TTL.
+
+sync() follows the chain with eth_getBlockByNumber and eth_getLogs for the
+contracts read so far. Concurrent reads of the same entry share one call,
+and a value whose read overlaps a log invalidating it is returned but not
+cached. An optional TTL in seconds bounds the age of every entry, as a
+safety net for missed logs.
+
+Usage:
+
+    python -m tools.cache --benchmark 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import OrderedDict, defaultdict
+
+from tools.client import AsyncRPCClient, contract_client
+from tools.events import EventDecoder, LogBatch
+
+MAX_ENTRIES = 100000
+
+CACHED_EVENTS = ('Transfer', 'Mint', 'Burn', 'Approval', 'Released', 'Revoked')
+
+
+def address_text(address):
+    return '0x' + address.hex() if isinstance(address, bytes) else address.lower()
+
+
+class StateCache(object):
+    """
+    An LRU cache of constant function results with log-driven invalidation.
+    """
+
+    def __init__(self, client, max_entries=MAX_ENTRIES, ttl=None):
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self.entries = OrderedDict()
+        self.tags = defaultdict(set)
+        self.reading = {}
+
+        self.block_number = None
+        self.timestamp = None
+        self.contracts = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.invalidations = 0
+
+        self.decoder = EventDecoder.from_contracts(['lockable_token', 'token_vesting'])
+        self.clients = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _store(self, key, value, tags):
+        if key in self.entries:
+            self._remove(key)
+
+        self.entries[key] = (value, time.monotonic(), tags)
+
+        for tag in tags:
+            self.tags[tag].add(key)
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        value, stored, tags = self.entries.pop(key)
+
+        for tag in tags:
+            keys = self.tags[tag]
+            keys.discard(key)
+
+            if not keys:
+                del self.tags[tag]
+
+    def invalidate(self, tag):
+        """
+        Drops every entry with the supplied tag and marks the reads in flight
+        for it as stale.
+        """
+        for key in list(self.tags.get(tag, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+        for reading in self.reading.values():
+            if tag in reading['tags']:
+                reading['stale'] = True
+
+    def _function(self, name, address, function):
+        if (name, address) not in self.clients:
+            self.clients[name, address] = contract_client(self.client, name, address)
+
+        return self.clients[name, address].functions[function]
+
+    async def _read(self, key, tags, function, *args):
+        if key in self.entries:
+            value, stored, entry_tags = self.entries[key]
+
+            if self.ttl is None or time.monotonic() - stored < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            self._remove(key)
+
+        if key in self.reading:
+            self.shared += 1
+            return await asyncio.shield(self.reading[key]['future'])
+
+        self.misses += 1
+        self.contracts.add(function.contract.address)
+
+        reading = {'tags': tags, 'stale': False, 'future': asyncio.ensure_future(function(*args))}
+        self.reading[key] = reading
+
+        try:
+            value = await asyncio.shield(reading['future'])
+        finally:
+            del self.reading[key]
+
+        if not reading['stale']:
+            self._store(key, value, tags)
+
+        return value
+
+    async def balance_of(self, token, owner):
+        token = address_text(token)
+        owner = address_text(owner)
+        return await self._read(('balanceOf', token, owner), (('balance', token, owner),),
+                                self._function('lockable_token', token, 'balanceOf'), owner)
+
+    async def allowance(self, token, owner, spender):
+        token = address_text(token)
+        owner = address_text(owner)
+        spender = address_text(spender)
+        return await self._read(('allowance', token, owner, spender),
+                                (('allowance', token, owner), ('allowance', token, owner, spender)),
+                                self._function('lockable_token', token, 'allowance'), owner, spender)
+
+    async def cap(self, token):
+        token = address_text(token)
+        return await self._read(('cap', token), (), self._function('lockable_token', token, 'cap'))
+
+    async def vested_amount(self, vesting, token):
+        vesting = address_text(vesting)
+        token = address_text(token)
+        return await self._read(('getVestedAmount', vesting, token, self.timestamp),
+                                (('balance', token, vesting), ('vesting', vesting), ('timestamp', self.timestamp)),
+                                self._function('token_vesting', vesting, 'getVestedAmount'), token)
+
+    def apply_logs(self, logs):
+        """
+        Invalidates the entries affected by a list of JSON-RPC log objects.
+        """
+        if not logs:
+            return
+
+        events = self.decoder.decode(LogBatch.from_rpc(logs), CACHED_EVENTS)
+
+        def column(array, name):
+            return ['0x' + bytes(item).hex() for item in array[name]]
+
+        transfers = events['Transfer']
+
+        for token, source, target in zip(column(transfers, 'address'), column(transfers, '_from'), column(transfers, '_to')):
+            self.invalidate(('balance', token, source))
+            self.invalidate(('balance', token, target))
+            self.invalidate(('allowance', token, source))
+
+        for token, target in zip(column(events['Mint'], 'address'), column(events['Mint'], '_to')):
+            self.invalidate(('balance', token, target))
+
+        for token, burner in zip(column(events['Burn'], 'address'), column(events['Burn'], '_burner')):
+            self.invalidate(('balance', token, burner))
+
+        approvals = events['Approval']
+
+        for token, owner, spender in zip(column(approvals, 'address'), column(approvals, '_owner'), column(approvals, '_spender')):
+            self.invalidate(('allowance', token, owner, spender))
+
+        for name in ('Released', 'Revoked'):
+            for vesting in column(events[name], 'address'):
+                self.invalidate(('vesting', vesting))
+
+    def advance(self, block_number, timestamp):
+        """
+        Moves the cache to a new block. Vested amounts of an older timestamp are dropped.
+        """
+        if timestamp != self.timestamp:
+            self.invalidate(('timestamp', self.timestamp))
+
+        self.block_number = block_number
+        self.timestamp = timestamp
+
+    async def sync(self):
+        """
+        Applies the logs of the blocks mined since the last call.
+        @return The number of the latest block.
+        """
+        head = await self.client.call('eth_getBlockByNumber', 'latest', False)
+        number = int(head['number'], 16)
+
+        if self.block_number is not None and number > self.block_number and self.contracts:
+            logs = await self.client.call('eth_getLogs', {
+                'fromBlock': hex(self.block_number + 1),
+                'toBlock': hex(number),
+                'address': sorted(self.contracts),
+            })
+            self.apply_logs(logs)
+
+        if self.block_number is None or number > self.block_number:
+            self.advance(number, int(head['timestamp'], 16))
+
+        return number
+
+
+def benchmark(reads, blocks):
+    from tools.deploy import sign_transaction
+    from tools.node import serve
+    from tools.scenarios import DAY, deploy_token
+
+    server = serve(port=0)
+    node = server.node
+    evm = node.evm
+    owner = evm.accounts[0]
+    token = deploy_token(evm, 'lockable_token', owner)
+    vesting = evm.deploy('token_vesting', evm.accounts[1], evm.timestamp - DAY, 0, 365 * DAY, True, sender=owner)
+    token.transact('transfer', vesting.address, 10 ** 21, sender=owner)
+
+    for account in evm.accounts[1:]:
+        token.transact('transfer', account, 10 ** 18, sender=owner)
+
+    def transfer_through_node(holder):
+        nonce = evm.state.account_db.get_nonce(evm.accounts[holder])
+        data = token.encode('transfer', owner, 1)
+        raw = sign_transaction(evm.keys[holder], nonce, token.address, data, 200000, 1, node.chain_id)
+        node.handle({'id': 1, 'method': 'eth_sendRawTransaction', 'params': ['0x' + raw.hex()]})
+
+    random_state = random.Random(0)
+
+    async def run():
+        client = AsyncRPCClient(server.url)
+        cache = StateCache(client)
+        accounts = evm.accounts
+        await cache.sync()
+
+        started = time.time()
+
+        for block in range(blocks):
+            calls = []
+
+            for index in range(reads):
+                account = random_state.choice(accounts)
+                kind = index % 4
+
+                if kind == 0:
+                    calls.append(cache.balance_of(token.address, account))
+                elif kind == 1:
+                    calls.append(cache.allowance(token.address, account, owner))
+                elif kind == 2:
+                    calls.append(cache.cap(token.address))
+                else:
+                    calls.append(cache.vested_amount(vesting.address, token.address))
+
+            await asyncio.gather(*calls)
+
+            # Every block has a transfer of one of the holders.
+            transfer_through_node(block % (len(accounts) - 2) + 2)
+            await cache.sync()
+
+        elapsed = time.time() - started
+
+        for account in accounts:
+            assert await cache.balance_of(token.address, account) == token.call('balanceOf', account)
+
+        return cache, client, elapsed
+
+    cache, client, elapsed = asyncio.get_event_loop().run_until_complete(run())
+
+    print('{0} reads over {1} blocks in {2:.2f}s: {3} hits, {4} shared, {5} misses, {6} invalidations, {7} requests sent to the node'.format(
+        reads * blocks, blocks, elapsed, cache.hits, cache.shared, cache.misses, cache.invalidations, node.request_count
+    ))
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmark', type=int, default=20000, metavar='READS',
+                        help='Reads cached state READS times per block from a stand-in node.')
+    parser.add_argument('--blocks', type=int, default=10)
+    args = parser.parse_args()
+
+    benchmark(args.benchmark // args.blocks, args.blocks)
+
+
+if __name__ == '__main__':
+    main()
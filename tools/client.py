@@ -0,0 +1,367 @@
+"""
+An asyncio JSON-RPC client for high-volume reads of the contracts.
+
+Contract clients are generated from the compiled ABIs: every function of a
+contract becomes a coroutine which encodes its arguments, sends an eth_call
+and decodes the result, for example `await token.balanceOf(holder)`.
+
+Calls are not sent one by one. Requests made during the same iteration of
+the event loop are collected and sent as JSON-RPC batch requests of up to
+max_batch calls over a pool of keep-alive HTTP connections, and identical
+concurrent requests are coalesced: they share a single request and its
+response. Thousands of concurrent reads therefore take a single round trip.
+
+Only the standard library is used for HTTP, so the client has no
+dependency beyond those of the other tools.
+
+The benchmark runs against a stand-in node (tools/node.py). It checks every
+result against the EVM and checks the number of round trips and coalesced
+requests. It also checks that an unknown method fails alone in its batch,
+and that a node refusing connections fails calls rather than hanging them.
+
+Usage:
+
+    python -m tools.client --benchmark 5000
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from urllib.parse import urlparse
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_abi_to_4byte_selector
+
+from tools.build import compile_contract
+
+POOL_SIZE = 4
+MAX_BATCH = 5000
+
+
+class RPCError(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    """
+    A pool of keep-alive HTTP/1.1 connections to a JSON-RPC endpoint.
+    Connections are opened when needed, up to the size of the pool.
+    """
+
+    def __init__(self, url, size=POOL_SIZE):
+        self.url = urlparse(url)
+        self.size = size
+        self.idle = []
+        self.opened = 0
+        self.available = None
+
+    async def _acquire(self):
+        if self.available is None:
+            self.available = asyncio.Semaphore(self.size)
+
+        await self.available.acquire()
+
+        if self.idle:
+            return self.idle.pop()
+
+        try:
+            connection = await asyncio.open_connection(self.url.hostname, self.url.port or 80, ssl=self.url.scheme == 'https' or None)
+        except BaseException:
+            # Otherwise every failed connection would keep its slot for good.
+            self.available.release()
+            raise
+
+        self.opened += 1
+        return connection
+
+    def _release(self, connection):
+        if connection is not None:
+            self.idle.append(connection)
+
+        self.available.release()
+
+    async def post(self, payload):
+        """
+        Posts a JSON payload and returns the decoded JSON response.
+        """
+        body = json.dumps(payload).encode()
+        connection = await self._acquire()
+
+        try:
+            reader, writer = connection
+            writer.write(
+                'POST {0} HTTP/1.1\r\nHost: {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n\r\n'.format(
+                    self.url.path or '/', self.url.netloc, len(body)
+                ).encode() + body
+            )
+
+            status = await reader.readline()
+
+            if not status:
+                raise ConnectionError('The connection was closed by the node.')
+
+            headers = {}
+
+            while True:
+                line = await reader.readline()
+
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            response = await reader.readexactly(int(headers['content-length']))
+
+            if status.split()[1] != b'200':
+                raise RPCError('HTTP {0}: {1}'.format(status.decode().strip(), response[:200]))
+
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                connection = None
+        except BaseException:
+            connection[1].close()
+            connection = None
+            raise
+        finally:
+            self._release(connection)
+
+        return json.loads(response.decode())
+
+
+class AsyncRPCClient(object):
+    """
+    Batches and coalesces JSON-RPC requests.
+    """
+
+    def __init__(self, url, pool_size=POOL_SIZE, max_batch=MAX_BATCH):
+        self.pool = ConnectionPool(url, pool_size)
+        self.max_batch = max_batch
+        self.queue = []
+        self.pending = {}
+        self.next_id = 0
+        self.round_trips = 0
+        self.coalesced = 0
+        self.flush_scheduled = False
+
+    def request(self, method, *params):
+        """
+        Returns a future of the result of a request. An identical request
+        which has not been answered yet shares its future.
+        """
+        key = json.dumps([method, params])
+
+        if key in self.pending:
+            self.coalesced += 1
+            return self.pending[key]
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        self.pending[key] = future
+        self.queue.append((key, method, params, future))
+
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            loop.call_soon(self._flush)
+
+        return future
+
+    async def call(self, method, *params):
+        # Shielded, so that a cancelled caller does not cancel the others sharing the request.
+        return await asyncio.shield(self.request(method, *params))
+
+    def _flush(self):
+        self.flush_scheduled = False
+        queue, self.queue = self.queue, []
+
+        for start in range(0, len(queue), self.max_batch):
+            asyncio.ensure_future(self._send(queue[start:start + self.max_batch]))
+
+    async def _send(self, batch):
+        requests = []
+
+        for key, method, params, future in batch:
+            self.next_id += 1
+            requests.append({'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': list(params)})
+
+        try:
+            self.round_trips += 1
+            responses = await self.pool.post(requests)
+
+            if isinstance(responses, dict):
+                raise RPCError(responses.get('error', {}).get('message', 'Invalid batch response.'))
+
+            responses = {item['id']: item for item in responses}
+
+            for request, (key, method, params, future) in zip(requests, batch):
+                response = responses.get(request['id'])
+
+                if future.done():
+                    continue
+
+                if response is None:
+                    future.set_exception(RPCError('No response to {0}.'.format(method)))
+                elif 'error' in response:
+                    future.set_exception(RPCError(response['error'].get('message')))
+                else:
+                    future.set_result(response['result'])
+        except Exception as error:
+            for key, method, params, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            for key, method, params, future in batch:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+
+
+class ContractFunction(object):
+    def __init__(self, contract, abi):
+        self.contract = contract
+        self.abi = abi
+        self.selector = function_abi_to_4byte_selector(abi)
+        self.input_types = [item['type'] for item in abi['inputs']]
+        self.output_types = [item['type'] for item in abi['outputs']]
+
+    async def __call__(self, *args, block='latest'):
+        data = self.selector + encode_abi(self.input_types, args)
+        call = {'to': self.contract.address, 'data': '0x' + data.hex()}
+        output = await self.contract.client.call('eth_call', call, block)
+
+        values = decode_abi(self.output_types, bytes.fromhex(output[2:]))
+        return values[0] if len(values) == 1 else values
+
+
+class ContractClient(object):
+    """
+    Read access to a deployed contract, with one coroutine per function of its ABI.
+    """
+
+    def __init__(self, client, abi, address):
+        self.client = client
+        self.address = '0x' + address.hex() if isinstance(address, bytes) else address
+        self.functions = {}
+
+        for item in abi:
+            if item['type'] == 'function':
+                self.functions[item['name']] = ContractFunction(self, item)
+                setattr(self, item['name'], self.functions[item['name']])
+
+
+def contract_client(client, name, address, options=()):
+    """
+    Returns the client of a contract of this repository.
+    """
+    return ContractClient(client, compile_contract(name, options)['abi'], address)
+
+
+async def check_errors(url, pool_size=2):
+    """
+    Checks that errors reach the callers: an unknown method fails alone in
+    its batch, and a node which refuses connections fails every call
+    instead of exhausting the pool.
+    """
+    client = AsyncRPCClient(url)
+    results = await asyncio.gather(client.call('eth_blockNumber'), client.call('eth_noSuchMethod'), return_exceptions=True)
+
+    assert isinstance(results[0], str) and isinstance(results[1], RPCError), results
+    assert client.round_trips == 1
+
+    # A port nothing listens on.
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    client = AsyncRPCClient('http://127.0.0.1:{0}'.format(port), pool_size)
+
+    for attempt in range(pool_size + 2):
+        try:
+            await asyncio.wait_for(client.call('eth_getBalance', '0x' + '0' * 40, hex(attempt)), 5)
+        except OSError:
+            continue
+
+        raise AssertionError('A call to a closed port did not fail.')
+
+
+def benchmark(reads):
+    from tools.node import serve
+    from tools.scenarios import DAY, deploy_token
+
+    server = serve(port=0)
+    evm = server.node.evm
+    owner = evm.accounts[0]
+    token = deploy_token(evm, 'lockable_token', owner)
+    vesting = evm.deploy('token_vesting', evm.accounts[1], evm.timestamp, 0, 365 * DAY, True, sender=owner)
+    token.transact('transfer', vesting.address, 10 ** 21, sender=owner)
+
+    for index, account in enumerate(evm.accounts):
+        token.transact('transfer', account, index, sender=owner)
+
+    async def read_all():
+        client = AsyncRPCClient(server.url)
+        token_client = contract_client(client, 'lockable_token', token.address)
+        vesting_client = contract_client(client, 'token_vesting', vesting.address)
+        accounts = evm.accounts
+
+        calls = []
+        expected = []
+
+        # Balances and allowances of distinct accounts, and the same few
+        # flags and releasable amount over and over, which are coalesced.
+        for index in range(reads):
+            account = accounts[index] if index < len(accounts) else (index + 1).to_bytes(20, 'big')
+            kind = index % 5
+
+            if kind == 0:
+                calls.append(token_client.balanceOf(account))
+                expected.append(token.call('balanceOf', account))
+            elif kind == 1:
+                calls.append(token_client.allowance(account, owner))
+                expected.append(token.call('allowance', account, owner))
+            elif kind == 2:
+                calls.append(token_client.paused())
+                expected.append(token.call('paused'))
+            elif kind == 3:
+                calls.append(token_client.transferLocked())
+                expected.append(token.call('transferLocked'))
+            else:
+                calls.append(vesting_client.getReleasableAmount(token.address))
+                expected.append(vesting.call('getReleasableAmount', token.address))
+
+        requests = server.node.request_count
+        started = time.time()
+        results = await asyncio.gather(*calls)
+        elapsed = time.time() - started
+        requests = server.node.request_count - requests
+
+        # Every read is answered, identical reads share a request and the
+        # requests are sent in as few batches as max_batch allows.
+        assert results == expected
+        assert client.coalesced == reads - requests
+        assert client.round_trips == -(-requests // client.max_batch)
+        return client, elapsed
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(check_errors(server.url))
+    client, elapsed = loop.run_until_complete(read_all())
+
+    print('{0} reads in {1:.2f}s: {2} round trips, {3} requests sent to the node, {4} coalesced'.format(
+        reads, elapsed, client.round_trips, server.node.request_count, client.coalesced
+    ))
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmark', type=int, default=5000, metavar='READS',
+                        help='Reads token and vesting state from a stand-in node with READS concurrent calls.')
+    args = parser.parse_args()
+
+    benchmark(args.benchmark)
+
+
+if __name__ == '__main__':
+    main()
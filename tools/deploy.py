@@ -0,0 +1,571 @@
+"""
+Headless deployment of token, vesting and timelock contracts from a manifest.
+
+The manifest is a JSON file listing the contracts to deploy and the
+transactions to send afterwards, for example to fund vesting contracts:
+
+    {
+        "contracts": [
+            {"id": "token", "contract": "lockable_token", "arguments": {
+                "_name": "Token", "_symbol": "TKN", "_totalSupply": "1000000000000000000000000",
+                "_maximumSupply": "2000000000000000000000000", "_decimals": 18, "_chainId": 1}},
+            {"id": "vesting-alice", "contract": "token_vesting", "arguments": {
+                "_beneficiary": "0x...", "_start": 1546300800, "_cliff": 0,
+                "_duration": 31536000, "_revocable": true}}
+        ],
+        "transactions": [
+            {"contract": "token", "function": "transfer", "arguments": ["@vesting-alice", "1000"]}
+        ]
+    }
+
+Arguments are given by name or as a list, and "@id" is replaced by the
+address of a contract of the manifest. Contracts may set build "options"
+and any entry may set its "gas" limit. Calls without one get the gas
+estimate of their function from tools/build.py, when it has one. With the
+constant_metadata option the name, symbol, decimals and maximum supply are
+taken from the arguments, which must then be given by name, and compiled
+into the code of that deployment.
+
+Nonces are assigned locally from the nonce of the deployer when a step is
+first sent, so the address of every contract is known in advance and up to
+--pipeline transactions are in flight at any time. A step which calls a
+contract of the manifest or references one with "@id" is only sent once
+that deployment is confirmed, so that no tokens are sent to the address of
+a failed deployment. Each signed transaction is written to the state file
+before it is sent. Running the same manifest again with the same state file
+resumes the rollout: confirmed steps are skipped and sent ones are looked up
+and, if unknown to the node, sent again unchanged.
+
+Usage:
+
+    python -m tools.deploy manifest.json --rpc http://127.0.0.1:8545 --key-file deployer.key --state rollout.json
+    python -m tools.deploy --benchmark 300
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import rlp
+from eth.constants import CREATE_CONTRACT_ADDRESS
+from eth.utils.address import generate_contract_address
+from eth.vm.forks.byzantium.transactions import ByzantiumTransaction
+from eth_abi import encode_abi
+from eth_keys import keys
+from eth_utils import function_abi_to_4byte_selector, keccak
+
+from tools.build import compile_contract, gas_estimates
+
+DEPLOY_GAS = 7000000
+CALL_GAS = 300000
+PIPELINE = 64
+POLL_INTERVAL = 0.1
+
+
+class RPCError(Exception):
+    pass
+
+
+class DeploymentFailed(Exception):
+    pass
+
+
+class JSONRPCClient(object):
+    """
+    A synchronous JSON-RPC client over a persistent HTTP connection.
+    """
+
+    def __init__(self, url):
+        self.url = urlparse(url)
+        self.connection = None
+        self.next_id = 0
+
+    def _post(self, payload):
+        body = json.dumps(payload).encode()
+
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+                self.connection = connection_class(self.url.hostname, self.url.port)
+
+            try:
+                self.connection.request('POST', self.url.path or '/', body, {'Content-Type': 'application/json'})
+                return json.loads(self.connection.getresponse().read().decode())
+            except (http.client.HTTPException, ConnectionError):
+                self.connection.close()
+                self.connection = None
+
+                if attempt:
+                    raise
+
+    def _request(self, method, params):
+        self.next_id += 1
+        return {'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': list(params)}
+
+    def call(self, method, *params):
+        response = self._post(self._request(method, params))
+
+        if 'error' in response:
+            raise RPCError(response['error'].get('message'))
+
+        return response['result']
+
+    def batch(self, calls):
+        """
+        Sends (method, params) pairs in a single batch request and returns
+        their results in order. Failed requests return an RPCError instance.
+        """
+        if not calls:
+            return []
+
+        requests = [self._request(method, params) for method, params in calls]
+        responses = {item['id']: item for item in self._post(requests)}
+
+        return [
+            RPCError(responses[request['id']]['error'].get('message'))
+            if 'error' in responses[request['id']] else responses[request['id']]['result']
+            for request in requests
+        ]
+
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+
+    with open(path) as json_file:
+        return json.load(json_file, object_pairs_hook=OrderedDict)
+
+
+def write_json(path, value):
+    """
+    Replaces a JSON file atomically, so that an interrupted write never
+    leaves a truncated state file behind.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.state-')
+
+    with os.fdopen(descriptor, 'w') as json_file:
+        json.dump(value, json_file, indent=2)
+
+    os.replace(temporary, path)
+
+
+def parse_address(text):
+    address = bytes.fromhex(text[2:] if text.startswith(('0x', '0X')) else text)
+
+    if len(address) != 20:
+        raise ValueError('Invalid address: {0}'.format(text))
+
+    return address
+
+
+def convert_argument(abi_type, value, addresses):
+    """
+    Converts a JSON manifest value to the Python value of an ABI type.
+    """
+    if abi_type.endswith(']'):
+        return [convert_argument(abi_type[:abi_type.rindex('[')], item, addresses) for item in value]
+
+    if isinstance(value, str) and value.startswith('@'):
+        if value[1:] not in addresses:
+            raise ValueError('Unknown contract reference: {0}'.format(value))
+
+        return addresses[value[1:]]
+
+    if abi_type == 'address':
+        return parse_address(value)
+
+    if abi_type == 'bool':
+        return bool(value)
+
+    if abi_type.startswith(('uint', 'int')):
+        return int(value, 0) if isinstance(value, str) else int(value)
+
+    if abi_type.startswith('bytes'):
+        if value.startswith('0x'):
+            return bytes.fromhex(value[2:])
+
+        return value.encode()
+
+    return value
+
+
+def convert_arguments(inputs, arguments, addresses):
+    if isinstance(arguments, dict):
+        missing = [item['name'] for item in inputs if item['name'] not in arguments]
+
+        if missing:
+            raise ValueError('Missing arguments: {0}'.format(', '.join(missing)))
+
+        arguments = [arguments[item['name']] for item in inputs]
+
+    if len(arguments) != len(inputs):
+        raise ValueError('Expected {0} arguments, got {1}.'.format(len(inputs), len(arguments)))
+
+    return [convert_argument(item['type'], value, addresses) for item, value in zip(inputs, arguments)]
+
+
+def sign_transaction(private_key, nonce, to, data, gas, gas_price, chain_id, value=0):
+    """
+    Returns a raw EIP-155 transaction signed with an eth_keys private key.
+    """
+    transaction = ByzantiumTransaction.create_unsigned_transaction(
+        nonce=nonce, gas_price=gas_price, gas=gas, to=to, value=value, data=data,
+    ).as_signed_transaction(private_key, chain_id=chain_id)
+
+    return rlp.encode(transaction)
+
+
+def compile_entry(entry):
+    """
+    Compiles the contract of a manifest entry with its build options.
+    """
+    arguments = entry.get('arguments', [])
+    return compile_contract(entry['contract'], entry.get('options', ()), arguments if isinstance(arguments, dict) else None)
+
+
+class Step(object):
+    """
+    A transaction of the rollout: a contract deployment or a function call.
+    """
+
+    def __init__(self, key, entry, contracts):
+        self.key = key
+        self.entry = entry
+        self.contracts = contracts
+
+    @property
+    def is_deployment(self):
+        return self.key.startswith('deploy:')
+
+    def transaction_data(self, addresses):
+        """
+        Returns the recipient and the data of the transaction.
+        """
+        if self.is_deployment:
+            compiled = compile_entry(self.entry)
+            constructor = [item for item in compiled['abi'] if item['type'] == 'constructor']
+            inputs = constructor[0]['inputs'] if constructor else []
+            arguments = convert_arguments(inputs, self.entry.get('arguments', []), addresses)
+
+            return CREATE_CONTRACT_ADDRESS, bytes.fromhex(compiled['bytecode'][2:]) + encode_abi([item['type'] for item in inputs], arguments)
+
+        target = self.entry['contract']
+
+        if target not in addresses:
+            raise ValueError('Unknown contract: {0}'.format(target))
+
+        compiled = compile_entry(self.contracts[target])
+        functions = [item for item in compiled['abi'] if item['type'] == 'function' and item['name'] == self.entry['function']]
+
+        if not functions:
+            raise ValueError('{0} has no function {1}.'.format(target, self.entry['function']))
+
+        function = functions[0]
+        arguments = convert_arguments(function['inputs'], self.entry.get('arguments', []), addresses)
+
+        return addresses[target], function_abi_to_4byte_selector(function) + encode_abi([item['type'] for item in function['inputs']], arguments)
+
+    def dependencies(self):
+        """
+        Returns the ids of the contracts of the manifest the step needs: the
+        contract it calls and those its arguments reference with "@id".
+        """
+        ids = set() if self.is_deployment else {self.entry['contract']}
+        arguments = self.entry.get('arguments', [])
+        values = list(arguments.values() if isinstance(arguments, dict) else arguments)
+
+        while values:
+            value = values.pop()
+
+            if isinstance(value, list):
+                values.extend(value)
+            elif isinstance(value, str) and value.startswith('@'):
+                ids.add(value[1:])
+
+        return ids
+
+    def gas(self):
+        """
+        Returns the gas limit of the entry, or else the gas estimate of the
+        function called, or else a default limit.
+        """
+        if 'gas' in self.entry:
+            return self.entry['gas']
+
+        if self.is_deployment:
+            return DEPLOY_GAS
+
+        compiled = compile_entry(self.contracts[self.entry['contract']])
+        return gas_estimates(compiled).get(self.entry['function'], CALL_GAS)
+
+
+def manifest_steps(manifest):
+    """
+    Returns the steps of a manifest: the deployments in order, then the transactions.
+    """
+    contracts = OrderedDict()
+
+    for entry in manifest.get('contracts', []):
+        if entry['id'] in contracts:
+            raise ValueError('Duplicate contract id: {0}'.format(entry['id']))
+
+        contracts[entry['id']] = entry
+
+    steps = [Step('deploy:' + key, entry, contracts) for key, entry in contracts.items()]
+    steps += [Step('call:{0}'.format(index), entry, contracts) for index, entry in enumerate(manifest.get('transactions', []))]
+
+    return steps
+
+
+class Deployer(object):
+    """
+    Sends the steps of a manifest with locally managed nonces and records
+    their progress in a state file.
+    """
+
+    def __init__(self, client, private_key, state_path, pipeline=PIPELINE, gas_price=None, log=None):
+        self.client = client
+        self.key = private_key
+        self.account = private_key.public_key.to_canonical_address()
+        self.state_path = state_path
+        self.pipeline = pipeline
+        self.chain_id = int(client.call('eth_chainId'), 16)
+        self.gas_price = gas_price if gas_price is not None else int(client.call('eth_gasPrice'), 16)
+        self.log = log or (lambda message: None)
+
+        self.state = read_json(state_path) or OrderedDict([
+            ('chainId', self.chain_id),
+            ('deployer', '0x' + self.account.hex()),
+            ('steps', OrderedDict()),
+        ])
+
+        if self.state['chainId'] != self.chain_id or self.state['deployer'] != '0x' + self.account.hex():
+            raise DeploymentFailed('The state file belongs to another chain or deployer.')
+
+    def save(self):
+        write_json(self.state_path, self.state)
+
+    def addresses(self):
+        return {
+            key[len('deploy:'):]: parse_address(record['address'])
+            for key, record in self.state['steps'].items() if key.startswith('deploy:')
+        }
+
+    def next_nonce(self):
+        chain_nonce = int(self.client.call('eth_getTransactionCount', '0x' + self.account.hex(), 'pending'), 16)
+        recorded = [record['nonce'] + 1 for record in self.state['steps'].values()]
+
+        return max([chain_nonce] + recorded)
+
+    def sign(self, step, nonce):
+        to, data = step.transaction_data(self.addresses())
+
+        raw = sign_transaction(self.key, nonce, to, data, step.gas(), self.gas_price, self.chain_id)
+
+        record = OrderedDict([
+            ('nonce', nonce),
+            ('hash', '0x' + keccak(raw).hex()),
+            ('raw', '0x' + raw.hex()),
+            ('status', 'sent'),
+        ])
+
+        if step.is_deployment:
+            record['address'] = '0x' + generate_contract_address(self.account, nonce).hex()
+
+        return record
+
+    def is_ready(self, step):
+        """
+        Returns whether every contract the step needs is deployed, so that
+        nothing is sent to the address of a deployment which may fail.
+        """
+        records = self.state['steps']
+        keys = ['deploy:' + item for item in step.dependencies()]
+
+        return all(key in records and records[key]['status'] == 'confirmed' for key in keys)
+
+    def broadcast(self, records):
+        results = self.client.batch([('eth_sendRawTransaction', [record['raw']]) for record in records])
+
+        for record, result in zip(records, results):
+            if isinstance(result, RPCError) and 'known' not in str(result) and 'nonce too low' not in str(result):
+                raise DeploymentFailed('Could not send the transaction with nonce {0}: {1}'.format(record['nonce'], result))
+
+    def poll(self, in_flight):
+        """
+        Looks up the receipts of the transactions in flight and returns the
+        keys of those which were mined.
+        """
+        keys_in_flight = list(in_flight)
+        receipts = self.client.batch([('eth_getTransactionReceipt', [self.state['steps'][key]['hash']]) for key in keys_in_flight])
+        mined = []
+
+        for key, receipt in zip(keys_in_flight, receipts):
+            if receipt is None or isinstance(receipt, RPCError):
+                continue
+
+            record = self.state['steps'][key]
+            record['blockNumber'] = int(receipt['blockNumber'], 16)
+            record['gasUsed'] = int(receipt['gasUsed'], 16)
+            record['status'] = 'confirmed' if int(receipt['status'], 16) == 1 else 'failed'
+            mined.append(key)
+
+        return mined
+
+    def run(self, steps):
+        """
+        Sends every step which is not confirmed yet and waits for all of them.
+        @return The addresses of the deployed contracts by id.
+        """
+        records = self.state['steps']
+        in_flight = [step.key for step in steps if step.key in records and records[step.key]['status'] == 'sent']
+        queue = [step for step in steps if step.key not in records]
+
+        failed = [key for key, record in records.items() if record['status'] == 'failed']
+
+        if failed:
+            raise DeploymentFailed('Failed steps in the state file: {0}'.format(', '.join(failed)))
+
+        if in_flight:
+            self.log('Resuming {0} transactions in flight.'.format(len(in_flight)))
+            self.broadcast([records[key] for key in in_flight])
+
+        nonce = self.next_nonce()
+
+        while queue or in_flight:
+            batch = []
+
+            # Nonces are consecutive, so a step waiting for a deployment
+            # holds back the steps after it as well.
+            while queue and len(in_flight) + len(batch) < self.pipeline and self.is_ready(queue[0]):
+                step = queue.pop(0)
+                records[step.key] = self.sign(step, nonce)
+                batch.append(step.key)
+                nonce += 1
+
+            if batch:
+                # The signed transactions are recorded before they are sent.
+                self.save()
+                self.broadcast([records[key] for key in batch])
+                in_flight += batch
+
+            mined = self.poll(in_flight)
+
+            if mined:
+                self.save()
+                in_flight = [key for key in in_flight if key not in mined]
+                self.log('{0} confirmed, {1} in flight, {2} queued.'.format(
+                    sum(1 for record in records.values() if record['status'] == 'confirmed'), len(in_flight), len(queue)
+                ))
+
+            failed = [key for key in mined if records[key]['status'] == 'failed']
+
+            if failed:
+                raise DeploymentFailed('Transactions failed: {0}'.format(', '.join(failed)))
+
+            if not mined and not batch:
+                time.sleep(POLL_INTERVAL)
+
+        return self.addresses()
+
+
+def deploy(manifest, client, private_key, state_path, pipeline=PIPELINE, gas_price=None, log=None):
+    deployer = Deployer(client, private_key, state_path, pipeline, gas_price, log)
+    return deployer.run(manifest_steps(manifest))
+
+
+def vesting_manifest(count, beneficiaries, start, chain_id):
+    """
+    Returns a manifest of a lockable_token and the supplied number of funded
+    token_vesting contracts.
+    """
+    amount = 10 ** 21
+    contracts = [{
+        'id': 'token',
+        'contract': 'lockable_token',
+        'arguments': {
+            '_name': 'Token', '_symbol': 'TKN', '_totalSupply': str(amount * count), '_maximumSupply': str(amount * count),
+            '_decimals': 18, '_chainId': chain_id,
+        },
+    }]
+    transactions = [{'contract': 'token', 'function': 'enableTransfers', 'arguments': []}]
+
+    for index in range(count):
+        contracts.append({
+            'id': 'vesting-{0}'.format(index),
+            'contract': 'token_vesting',
+            'arguments': {
+                '_beneficiary': '0x' + beneficiaries[index % len(beneficiaries)].hex(),
+                '_start': start, '_cliff': 0, '_duration': 365 * 24 * 60 * 60, '_revocable': True,
+            },
+        })
+        transactions.append({'contract': 'token', 'function': 'transfer', 'arguments': ['@vesting-{0}'.format(index), str(amount)]})
+
+    return {'contracts': contracts, 'transactions': transactions}
+
+
+def benchmark(count, pipeline):
+    from tools.node import serve
+
+    server = serve(port=0)
+    evm = server.node.evm
+    client = JSONRPCClient(server.url)
+    manifest = vesting_manifest(count, evm.accounts[1:], evm.timestamp, server.node.chain_id)
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_path = os.path.join(directory, 'state.json')
+        started = time.time()
+        addresses = deploy(manifest, client, evm.keys[0], state_path, pipeline)
+        elapsed = time.time() - started
+
+        # Running the rollout again only reads the state file.
+        resumed = deploy(manifest, client, evm.keys[0], state_path, pipeline)
+        assert resumed == addresses
+
+    steps = len(manifest['contracts']) + len(manifest['transactions'])
+    print('{0} contracts and {1} transactions in {2:.1f}s ({3:.0f} transactions per second, {4} requests)'.format(
+        len(addresses), len(manifest['transactions']), elapsed, steps / elapsed, server.node.request_count
+    ))
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', nargs='?', help='The JSON manifest of the rollout.')
+    parser.add_argument('--rpc', default='http://127.0.0.1:8545', help='The JSON-RPC endpoint of the node.')
+    parser.add_argument('--key-file', help='A file holding the hex private key of the deployer.')
+    parser.add_argument('--state', help='The state file of the rollout, created if missing.')
+    parser.add_argument('--pipeline', type=int, default=PIPELINE, help='The maximum number of transactions in flight.')
+    parser.add_argument('--gas-price', type=int, help='The gas price in wei, by default eth_gasPrice.')
+    parser.add_argument('--benchmark', type=int, metavar='COUNT', help='Deploys COUNT funded vesting contracts to a stand-in node.')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.pipeline)
+        return
+
+    if not (args.manifest and args.key_file and args.state):
+        parser.error('the manifest, --key-file and --state are required')
+
+    with open(args.key_file) as key_file:
+        private_key = keys.PrivateKey(bytes.fromhex(key_file.read().strip().replace('0x', '', 1)))
+
+    try:
+        addresses = deploy(read_json(args.manifest), JSONRPCClient(args.rpc), private_key, args.state, args.pipeline, args.gas_price, print)
+    except (DeploymentFailed, RPCError, ValueError) as error:
+        print('FAILED: {0}'.format(error))
+        print('The progress is saved in {0}; run the same command again to resume.'.format(args.state))
+        sys.exit(1)
+
+    for name, address in addresses.items():
+        print('{0:<30} 0x{1}'.format(name, address.hex()))
+
+
+if __name__ == '__main__':
+    main()
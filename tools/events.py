@@ -0,0 +1,370 @@
+"""
+Bulk decoder for the events of the contracts in this repository.
+
+The event specifications are generated from the compiled ABIs and the topic
+hashes are computed once. Raw logs are packed into a LogBatch, which holds
+the topics and data of many logs in a few NumPy arrays, and decoded per event
+type with array operations into NumPy structured arrays. No Python object is
+created per decoded log.
+
+Events with an argument of a dynamic type, such as bytes, are skipped and
+their logs are reported as unknown.
+
+Every decoded array has the columns block_number, transaction_index,
+log_index and address followed by the event arguments. Addresses and
+bytes32 values are stored as raw bytes, uint256 and int128 values as four
+big-endian 64 bit limbs (most significant first) and bools as bools.
+to_ints() and to_floats() convert limb columns when needed.
+
+    decoder = EventDecoder.from_contracts()
+    batch = LogBatch.from_rpc(logs)
+    events = decoder.decode(batch)
+    events['Transfer']['_from'], to_ints(events['Transfer']['_value'])
+
+Usage:
+
+    python -m tools.events logs.jsonl --output events.npz
+    python -m tools.events --benchmark 1000000
+"""
+import argparse
+import json
+import sys
+import time
+from collections import OrderedDict
+
+import numpy
+from eth_utils import keccak
+
+from tools.build import compile_contract, contract_names
+
+WORD = 32
+MAX_TOPICS = 4
+
+LIMBS = 4
+LIMB_BITS = 64
+
+COMMON_FIELDS = [
+    ('block_number', numpy.int64),
+    ('transaction_index', numpy.int32),
+    ('log_index', numpy.int32),
+    ('address', numpy.uint8, (20,)),
+]
+
+
+def field_dtype(abi_type):
+    if abi_type == 'address':
+        return (numpy.uint8, (20,))
+
+    if abi_type == 'bool':
+        return (numpy.bool_, ())
+
+    if abi_type == 'bytes32':
+        return (numpy.uint8, (32,))
+
+    if abi_type.startswith('uint') or abi_type.startswith('int'):
+        return (numpy.uint64, (LIMBS,))
+
+    raise ValueError('Unsupported event argument type: {0}'.format(abi_type))
+
+
+def decode_words(words, abi_type):
+    """
+    Decodes an (n, 32) uint8 array of ABI words of the supplied type.
+    """
+    if abi_type == 'address':
+        return words[:, 12:]
+
+    if abi_type == 'bool':
+        return words[:, -1] != 0
+
+    if abi_type == 'bytes32':
+        return words
+
+    return numpy.ascontiguousarray(words).view('>u8').astype(numpy.uint64)
+
+
+class EventSpec(object):
+    """
+    An event of the ABI with its topic hash and the dtype of its decoded array.
+    """
+
+    def __init__(self, abi):
+        self.name = abi['name']
+        self.inputs = abi['inputs']
+        self.signature = '{0}({1})'.format(self.name, ','.join(item['type'] for item in self.inputs))
+        self.topic = keccak(text=self.signature)
+        self.indexed = [item for item in self.inputs if item['indexed']]
+        self.data = [item for item in self.inputs if not item['indexed']]
+        self.data_size = WORD * len(self.data)
+
+        fields = list(COMMON_FIELDS)
+
+        for item in self.inputs:
+            base, shape = field_dtype(item['type'])
+            fields.append((item['name'], base, shape) if shape else (item['name'], base))
+
+        self.dtype = numpy.dtype(fields)
+
+    def decode(self, batch, rows):
+        """
+        Decodes the logs at the supplied row indexes of a batch.
+        """
+        decoded = numpy.zeros(len(rows), dtype=self.dtype)
+        decoded['block_number'] = batch.block_number[rows]
+        decoded['transaction_index'] = batch.transaction_index[rows]
+        decoded['log_index'] = batch.log_index[rows]
+        decoded['address'] = batch.address[rows]
+
+        for position, item in enumerate(self.indexed):
+            decoded[item['name']] = decode_words(batch.topics[rows, position + 1], item['type'])
+
+        if self.data:
+            offsets = batch.data_offset[rows][:, None] + numpy.arange(self.data_size)
+            data = batch.data[offsets]
+
+            for position, item in enumerate(self.data):
+                decoded[item['name']] = decode_words(data[:, position * WORD:(position + 1) * WORD], item['type'])
+
+        return decoded
+
+
+class LogBatch(object):
+    """
+    Raw logs stored column-wise. Topics are held in an (n, 4, 32) array and
+    the data of all logs is concatenated into a single byte array.
+    """
+
+    def __init__(self, address, topics, topic_count, data, data_offset, data_size,
+                 block_number=None, transaction_index=None, log_index=None):
+        count = len(address)
+        self.address = address
+        self.topics = topics
+        self.topic_count = topic_count
+        self.data = data
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.block_number = block_number if block_number is not None else numpy.zeros(count, numpy.int64)
+        self.transaction_index = transaction_index if transaction_index is not None else numpy.zeros(count, numpy.int32)
+        self.log_index = log_index if log_index is not None else numpy.arange(count, dtype=numpy.int32)
+
+    def __len__(self):
+        return len(self.address)
+
+    @classmethod
+    def allocate(cls, count, data_bytes):
+        return cls(
+            numpy.zeros((count, 20), numpy.uint8),
+            numpy.zeros((count, MAX_TOPICS, WORD), numpy.uint8),
+            numpy.zeros(count, numpy.int8),
+            numpy.zeros(data_bytes, numpy.uint8),
+            numpy.zeros(count, numpy.int64),
+            numpy.zeros(count, numpy.int64),
+            numpy.zeros(count, numpy.int64),
+            numpy.zeros(count, numpy.int32),
+            numpy.zeros(count, numpy.int32),
+        )
+
+    @classmethod
+    def from_logs(cls, logs, block_number=0):
+        """
+        Packs tools.evm.Log tuples, for instance those of a Receipt.
+        """
+        logs = list(logs)
+        batch = cls.allocate(len(logs), sum(len(log.data) for log in logs))
+        offset = 0
+
+        for index, log in enumerate(logs):
+            batch.address[index] = numpy.frombuffer(log.address, numpy.uint8)
+            batch.topic_count[index] = len(log.topics)
+
+            for position, topic in enumerate(log.topics):
+                batch.topics[index, position] = numpy.frombuffer(topic, numpy.uint8)
+
+            batch.data[offset:offset + len(log.data)] = numpy.frombuffer(log.data, numpy.uint8)
+            batch.data_offset[index] = offset
+            batch.data_size[index] = len(log.data)
+            offset += len(log.data)
+
+        batch.block_number[:] = block_number
+        return batch
+
+    @classmethod
+    def from_rpc(cls, logs):
+        """
+        Packs log objects as returned by eth_getLogs or in transaction receipts.
+        """
+        logs = list(logs)
+        data = [bytes.fromhex(log['data'][2:]) for log in logs]
+        batch = cls.allocate(len(logs), sum(len(item) for item in data))
+        offset = 0
+
+        for index, log in enumerate(logs):
+            batch.address[index] = numpy.frombuffer(bytes.fromhex(log['address'][2:]), numpy.uint8)
+            batch.topic_count[index] = len(log['topics'])
+
+            for position, topic in enumerate(log['topics']):
+                batch.topics[index, position] = numpy.frombuffer(bytes.fromhex(topic[2:]), numpy.uint8)
+
+            batch.data[offset:offset + len(data[index])] = numpy.frombuffer(data[index], numpy.uint8)
+            batch.data_offset[index] = offset
+            batch.data_size[index] = len(data[index])
+            batch.block_number[index] = int(log.get('blockNumber', '0x0'), 16)
+            batch.transaction_index[index] = int(log.get('transactionIndex', '0x0'), 16)
+            batch.log_index[index] = int(log.get('logIndex', hex(index)), 16)
+            offset += len(data[index])
+
+        return batch
+
+
+class EventDecoder(object):
+    """
+    Decodes LogBatches into one structured array per event name.
+    """
+
+    def __init__(self, abis):
+        self.events = OrderedDict()
+        self.skipped = []
+
+        for abi in abis:
+            for item in abi:
+                if item['type'] != 'event':
+                    continue
+
+                # Events with dynamic arguments, such as bytes, do not fit
+                # in fixed-size columns. Their logs are reported as unknown.
+                try:
+                    spec = EventSpec(item)
+                except ValueError:
+                    if item['name'] not in self.skipped:
+                        self.skipped.append(item['name'])
+
+                    continue
+
+                self.events.setdefault(spec.topic, spec)
+
+        # topic0 as four uint64 words, for vectorised matching.
+        self._topics = numpy.frombuffer(b''.join(self.events), numpy.uint64).reshape(-1, LIMBS)
+
+    @classmethod
+    def from_contracts(cls, names=None, options=()):
+        return cls(compile_contract(name, options)['abi'] for name in (names or contract_names()))
+
+    def spec(self, name):
+        for spec in self.events.values():
+            if spec.name == name:
+                return spec
+
+        raise KeyError(name)
+
+    def classify(self, batch):
+        """
+        Returns the index of the event of every log in the batch, or -1 for
+        logs whose signature or layout is unknown.
+        """
+        first = numpy.ascontiguousarray(batch.topics[:, 0]).view(numpy.uint64)
+        kinds = numpy.full(len(batch), -1, dtype=numpy.int32)
+
+        for index, (words, spec) in enumerate(zip(self._topics, self.events.values())):
+            match = (first == words).all(axis=1)
+            match &= batch.topic_count == len(spec.indexed) + 1
+            match &= batch.data_size == spec.data_size
+            kinds[match] = index
+
+        return kinds
+
+    def decode(self, batch, names=None):
+        """
+        Decodes a batch. The result maps every event name to its decoded
+        array (in batch order) and 'unknown' to the indexes of the logs which
+        could not be decoded.
+        """
+        kinds = self.classify(batch)
+        result = OrderedDict()
+
+        for index, spec in enumerate(self.events.values()):
+            if names is not None and spec.name not in names:
+                continue
+
+            result[spec.name] = spec.decode(batch, numpy.flatnonzero(kinds == index))
+
+        result['unknown'] = numpy.flatnonzero(kinds == -1)
+        return result
+
+
+def to_ints(limbs):
+    """
+    Converts a column of uint256 limbs to a list of Python integers.
+    """
+    values = limbs.astype(object)
+    return list((values[:, 0] << 192) + (values[:, 1] << 128) + (values[:, 2] << 64) + values[:, 3])
+
+
+def to_floats(limbs):
+    """
+    Converts a column of uint256 limbs to float64 values (with float precision).
+    """
+    scale = numpy.array([2.0 ** 192, 2.0 ** 128, 2.0 ** 64, 1.0])
+    return limbs.astype(numpy.float64).dot(scale)
+
+
+def synthetic_batch(decoder, count, seed=0):
+    """
+    Generates a batch of random Transfer and Approval logs.
+    """
+    random_state = numpy.random.RandomState(seed)
+    specs = [decoder.spec('Transfer'), decoder.spec('Approval')]
+    batch = LogBatch.allocate(count, count * WORD)
+
+    kinds = random_state.randint(0, len(specs), size=count)
+    batch.address[:] = random_state.randint(0, 256, size=20, dtype=numpy.uint8)
+    batch.topics[:, 1:3, 12:] = random_state.randint(0, 256, size=(count, 2, 20), dtype=numpy.uint8)
+    batch.topic_count[:] = 3
+    batch.data.reshape(count, WORD)[:, 16:] = random_state.randint(0, 256, size=(count, 16), dtype=numpy.uint8)
+    batch.data_offset[:] = numpy.arange(count) * WORD
+    batch.data_size[:] = WORD
+    batch.block_number[:] = numpy.arange(count) // 100
+
+    for index, spec in enumerate(specs):
+        batch.topics[kinds == index, 0] = numpy.frombuffer(spec.topic, numpy.uint8)
+
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('logs', nargs='?', help='A file with one JSON-RPC log object per line.')
+    parser.add_argument('--output', help='Writes the decoded arrays to a .npz file.')
+    parser.add_argument('--benchmark', type=int, metavar='LOGS', help='Decodes the supplied number of synthetic logs.')
+    args = parser.parse_args()
+
+    decoder = EventDecoder.from_contracts()
+
+    if decoder.skipped:
+        print('Skipped events with dynamic arguments: {0}'.format(', '.join(decoder.skipped)), file=sys.stderr)
+
+    if args.benchmark:
+        batch = synthetic_batch(decoder, args.benchmark)
+    elif args.logs:
+        with open(args.logs) as log_file:
+            batch = LogBatch.from_rpc(json.loads(line) for line in log_file if line.strip())
+    else:
+        parser.error('Either a log file or --benchmark is required.')
+
+    started = time.time()
+    events = decoder.decode(batch)
+    elapsed = time.time() - started
+
+    for name, decoded in events.items():
+        if len(decoded):
+            print('{0:<24} {1:>10}'.format(name, len(decoded)))
+
+    print('{0} logs decoded in {1:.3f}s ({2:.0f} logs per second)'.format(
+        len(batch), elapsed, len(batch) / max(elapsed, 1e-9)
+    ))
+
+    if args.output:
+        numpy.savez(args.output, **events)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""
+A lightweight in-process EVM for the Python tools.
+
+Transactions are applied as messages directly to a py-evm Byzantium state.
+Nothing is signed and no blocks are mined, which makes this considerably
+faster than a full test chain. The block timestamp and number can be set to
+any value at any time.
+"""
+from collections import namedtuple
+
+from eth.constants import (
+    BLANK_ROOT_HASH,
+    CREATE_CONTRACT_ADDRESS,
+    GAS_TX,
+    GAS_TXCREATE,
+    GAS_TXDATANONZERO,
+    GAS_TXDATAZERO,
+)
+from eth.db.atomic import AtomicDB
+from eth.db.backends.memory import MemoryDB
+from eth.utils.address import generate_contract_address
+from eth.vm.execution_context import ExecutionContext
+from eth.vm.forks.byzantium.state import ByzantiumState
+from eth.vm.message import Message
+from eth_abi import decode_abi, encode_abi
+from eth_keys import keys
+from eth_utils import function_abi_to_4byte_selector
+
+from tools.build import compile_contract, decode_error
+
+DEFAULT_TIMESTAMP = 1546300800
+DEFAULT_GAS_LIMIT = 8000000
+DEFAULT_BALANCE = 10 ** 24
+
+# The selector of Error(string), which prefixes the revert reason.
+REVERT_SELECTOR = bytes.fromhex('08c379a0')
+
+Receipt = namedtuple('Receipt', ['success', 'output', 'gas_used', 'logs', 'error'])
+Log = namedtuple('Log', ['address', 'topics', 'data'])
+
+
+class TransactionFailed(Exception):
+    pass
+
+
+def intrinsic_gas(data, is_create=False):
+    zero_bytes = data.count(0)
+    gas = GAS_TX + zero_bytes * GAS_TXDATAZERO + (len(data) - zero_bytes) * GAS_TXDATANONZERO
+
+    if is_create:
+        gas += GAS_TXCREATE
+
+    return gas
+
+
+def abi_types(inputs):
+    return [item['type'] for item in inputs]
+
+
+def revert_reason(error):
+    """
+    Returns the reason string of a failed transaction, if there was one.
+    Compact error codes are returned as their messages.
+    """
+    output = error.args[0] if error is not None and error.args else b''
+
+    if not isinstance(output, bytes) or output[:4] != REVERT_SELECTOR:
+        return None
+
+    return decode_error(decode_abi(['string'], output[4:])[0].decode())
+
+
+class Contract(object):
+    """
+    A deployed contract bound to a LocalEVM instance.
+    """
+
+    def __init__(self, evm, address, abi):
+        self.evm = evm
+        self.address = address
+        self.abi = abi
+        self.functions = {item['name']: item for item in abi if item['type'] == 'function'}
+
+    def encode(self, name, *args):
+        function = self.functions[name]
+        return function_abi_to_4byte_selector(function) + encode_abi(abi_types(function['inputs']), args)
+
+    def decode(self, name, output):
+        outputs = abi_types(self.functions[name]['outputs'])
+
+        if not outputs:
+            return None
+
+        values = decode_abi(outputs, output)
+        return values[0] if len(values) == 1 else values
+
+    def transact(self, name, *args, sender=None, value=0, gas=None):
+        """
+        Sends a transaction to the supplied function and returns its receipt.
+        A failed transaction is reported through the receipt, not raised.
+        """
+        return self.evm.execute(sender, self.address, self.encode(name, *args), value=value, gas=gas)
+
+    def call(self, name, *args, sender=None):
+        """
+        Calls the supplied function without persisting any state change.
+        """
+        receipt = self.evm.execute(sender, self.address, self.encode(name, *args), persist=False)
+
+        if not receipt.success:
+            raise TransactionFailed('Call to {0} failed: {1}'.format(name, receipt.error))
+
+        return self.decode(name, receipt.output)
+
+
+class LocalEVM(object):
+    """
+    An in-memory Byzantium EVM with ten funded accounts.
+    """
+
+    def __init__(self, timestamp=DEFAULT_TIMESTAMP, block_number=1, gas_limit=DEFAULT_GAS_LIMIT, accounts=10):
+        self._timestamp = timestamp
+        self._block_number = block_number
+        self.gas_limit = gas_limit
+
+        self.state = ByzantiumState(AtomicDB(), self._execution_context(), BLANK_ROOT_HASH)
+
+        self.keys = [keys.PrivateKey((index + 1).to_bytes(32, 'big')) for index in range(accounts)]
+        self.accounts = [key.public_key.to_canonical_address() for key in self.keys]
+
+        for account in self.accounts:
+            self.state.account_db.set_balance(account, DEFAULT_BALANCE)
+
+    def _execution_context(self):
+        return ExecutionContext(
+            coinbase=b'\0' * 20,
+            timestamp=self._timestamp,
+            block_number=self._block_number,
+            difficulty=1,
+            gas_limit=self.gas_limit,
+            prev_hashes=[],
+        )
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value):
+        self._timestamp = value
+        self.state.execution_context = self._execution_context()
+
+    @property
+    def block_number(self):
+        return self._block_number
+
+    @block_number.setter
+    def block_number(self, value):
+        self._block_number = value
+        self.state.execution_context = self._execution_context()
+
+    def mine(self, blocks=1, seconds=15):
+        """
+        Advances the block number and the timestamp as if blocks were mined.
+        """
+        self._block_number += blocks
+        self._timestamp += blocks * seconds
+        self.state.execution_context = self._execution_context()
+
+    def snapshot(self):
+        return self.state.snapshot()
+
+    def revert(self, snapshot):
+        self.state.revert(snapshot)
+
+    def export_state(self):
+        """
+        Returns a picklable copy of the state, to be loaded with from_state
+        in this or another process.
+        """
+        self.state.account_db.persist()
+
+        return {
+            'db': dict(self.state._db.wrapped_db.kv_store),
+            'state_root': self.state.state_root,
+            'timestamp': self._timestamp,
+            'block_number': self._block_number,
+            'gas_limit': self.gas_limit,
+            'accounts': len(self.accounts),
+        }
+
+    @classmethod
+    def from_state(cls, exported):
+        """
+        Creates a LocalEVM from a state returned by export_state.
+        """
+        evm = cls(exported['timestamp'], exported['block_number'], exported['gas_limit'], exported['accounts'])
+        db = AtomicDB(MemoryDB(dict(exported['db'])))
+        evm.state = ByzantiumState(db, evm._execution_context(), exported['state_root'])
+
+        return evm
+
+    def fork(self):
+        """
+        Returns an independent copy of this EVM and its state.
+        """
+        return LocalEVM.from_state(self.export_state())
+
+    def get_storage(self, address, slot):
+        return self.state.account_db.get_storage(address, slot)
+
+    def set_storage(self, address, slot, value):
+        self.state.account_db.set_storage(address, slot, value)
+
+    def _apply(self, sender, message, persist):
+        transaction_context = self.state.get_transaction_context_class()(gas_price=1, origin=sender)
+        snapshot = self.state.snapshot()
+
+        computation = self.state.get_computation(message, transaction_context)
+
+        if message.is_create:
+            computation = computation.apply_create_message()
+        else:
+            computation = computation.apply_message()
+
+        if persist:
+            self.state.commit(snapshot)
+        else:
+            self.state.revert(snapshot)
+
+        return computation
+
+    def execute(self, sender, to, data, value=0, gas=None, persist=True):
+        """
+        Applies a transaction and returns its receipt. The gas used includes
+        the intrinsic transaction cost and the refunds, like a mined receipt.
+        """
+        sender = sender or self.accounts[0]
+        gas = gas or self.gas_limit
+        base_gas = intrinsic_gas(data)
+
+        message = Message(
+            gas=gas - base_gas,
+            to=to,
+            sender=sender,
+            value=value,
+            data=data,
+            code=self.state.account_db.get_code(to),
+        )
+
+        computation = self._apply(sender, message, persist)
+        return self._receipt(computation, gas)
+
+    def deploy_code(self, bytecode, sender=None, value=0, gas=None):
+        """
+        Deploys the supplied init code and returns the receipt and the new address.
+        """
+        sender = sender or self.accounts[0]
+        gas = gas or self.gas_limit
+        nonce = self.state.account_db.get_nonce(sender)
+        address = generate_contract_address(sender, nonce)
+        self.state.account_db.increment_nonce(sender)
+
+        message = Message(
+            gas=gas - intrinsic_gas(bytecode, is_create=True),
+            to=CREATE_CONTRACT_ADDRESS,
+            sender=sender,
+            value=value,
+            data=b'',
+            code=bytecode,
+            create_address=address,
+        )
+
+        computation = self._apply(sender, message, True)
+        return self._receipt(computation, gas), address
+
+    def apply_transaction(self, transaction):
+        """
+        Applies a signed py-evm transaction after checking its signature and
+        nonce, and returns the receipt and the address of the created contract.
+        No gas fee is charged.
+        """
+        transaction.validate()
+        sender = transaction.sender
+        nonce = self.state.account_db.get_nonce(sender)
+
+        if transaction.nonce != nonce:
+            raise TransactionFailed('Invalid nonce {0}, expected {1}.'.format(transaction.nonce, nonce))
+
+        if transaction.to == CREATE_CONTRACT_ADDRESS:
+            return self.deploy_code(transaction.data, sender=sender, value=transaction.value, gas=transaction.gas)
+
+        self.state.account_db.increment_nonce(sender)
+        return self.execute(sender, transaction.to, transaction.data, value=transaction.value, gas=transaction.gas), None
+
+    def deploy(self, contract, *args, sender=None, value=0, gas=None):
+        """
+        Deploys a contract of this repository (or a compiled contract dictionary)
+        with the supplied constructor arguments.
+        """
+        compiled = compile_contract(contract) if isinstance(contract, str) else contract
+        constructor = [item for item in compiled['abi'] if item['type'] == 'constructor']
+        arguments = encode_abi(abi_types(constructor[0]['inputs']), args) if constructor else b''
+
+        bytecode = bytes.fromhex(compiled['bytecode'][2:]) + arguments
+        receipt, address = self.deploy_code(bytecode, sender=sender, value=value, gas=gas)
+
+        if not receipt.success:
+            raise TransactionFailed('Could not deploy {0}: {1}'.format(compiled['name'], receipt.error))
+
+        return Contract(self, address, compiled['abi'])
+
+    def _receipt(self, computation, gas):
+        if computation.is_error:
+            return Receipt(False, b'', gas - computation.get_gas_remaining(), [], computation._error)
+
+        gas_used = gas - computation.get_gas_remaining()
+        gas_used -= min(computation.get_gas_refund(), gas_used // 2)
+
+        logs = [
+            Log(address, [topic.to_bytes(32, 'big') for topic in topics], data)
+            for address, topics, data in computation.get_log_entries()
+        ]
+
+        return Receipt(True, computation.output, gas_used, logs, None)
@@ -0,0 +1,450 @@
+"""
+Differential fuzzer for the token accounting invariants, with the operation
+sequences generated in vectorized batches.
+
+Random operation sequences are generated in batches with NumPy and applied
+one by one both to a Python model of the token (see tools/model.py) and to
+the compiled contract running on the in-process EVM. Every outcome (revert or return value) must
+match, and after every batch the on-chain state must equal the model state
+and satisfy:
+
+- sum(balances) == totalSupply
+- totalSupply <= maximumSupply
+- with --option holder_index, holderCount() is the number of non-zero
+  balances, holderAt(i) lists exactly those accounts and the stored
+  position of every listed account is i + 1
+- with --option dividends, dividendOf() and withdrawnDividends() of every
+  account match the model, and the dividends withdrawn and withdrawable by
+  every account which is not excluded add up to its exact share of the
+  distributions, less the remainder of the divisions
+
+The random batches follow a scripted sequence of edge cases: transfers
+which empty an account in the middle and at the end of the holder index, a
+transfer of a whole balance to its own holder, a mint to a new holder, a
+burn to zero, batch transfers which empty a holder listed twice or pay
+the sender back, and dividend distributions, withdrawals and an exclusion
+between them.
+
+Only the generation of the operations is vectorized. Every operation then
+runs as a transaction on py-evm, which bounds differential runs to about
+130 operations per second on erc20_standard_token and 30 on lockable_token,
+far below the tens of thousands per second asked for soak tests. Only
+--model-only, which skips the EVM, reaches that rate, about 49,000
+operations per second on lockable_token, so long soak runs check the model
+invariants alone and differential runs are kept to thousands of operations.
+
+Tokens built with --option constant_metadata get the metadata of the model
+compiled in as constants.
+
+Usage:
+
+    python -m tools.fuzz lockable_token --operations 20000 --seed 7
+    python -m tools.fuzz lockable_token --operations 2000 --option holder_index
+    python -m tools.fuzz lockable_token --operations 2000 --option dividends --option compact_errors
+    python -m tools.fuzz lockable_token --operations 2000 --option constant_metadata
+    python -m tools.fuzz lockable_token --operations 1000000 --model-only
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+
+import numpy
+from eth_keys import keys
+from eth_utils import keccak, to_canonical_address
+
+from tools.build import TRANSFORMS, compile_contract
+from tools.evm import LocalEVM
+from tools.model import MODELS, ZERO_ADDRESS, Revert, with_dividends
+from tools.storage import storage_layout
+
+# The arguments of each operation following the sender.
+ARGUMENTS = {
+    'transfer': ('address', 'amount'),
+    'transferFrom': ('address', 'address', 'amount'),
+    'approve': ('address', 'amount'),
+    'increaseApproval': ('address', 'amount'),
+    'decreaseApproval': ('address', 'amount'),
+    'mint': ('address', 'amount'),
+    'burn': ('amount',),
+    'finishMinting': (),
+    'pause': (),
+    'unpause': (),
+    'enableTransfers': (),
+    'disableTransfers': (),
+    'addAdmin': ('address',),
+    'removeAdmin': ('address',),
+    'snapshot': (),
+    'delegate': ('address',),
+    'batchTransferFrom': ('holders', 'recipients', 'amounts'),
+    'transferPacked': ('packed',),
+    'distributeDividends': ('value',),
+    'withdrawDividend': (),
+    'excludeFromDividends': ('address',),
+}
+
+# The entries of batchTransferFrom and transferPacked.
+BATCH_ENTRIES = 10
+PACKED_ENTRIES = 32
+
+INITIAL_SUPPLY = 10 ** 9
+MAXIMUM_SUPPLY = 10 ** 12
+
+
+class Mismatch(Exception):
+    pass
+
+
+def make_accounts(count):
+    return [keys.PrivateKey((index + 1).to_bytes(32, 'big')).public_key.to_canonical_address() for index in range(count)]
+
+
+class Sequence(object):
+    """
+    A batch of generated operations stored column-wise. The entries of batch
+    transfers are rows of the two-dimensional columns, of which the first
+    `sizes` entries are used.
+    """
+
+    def __init__(self, names, operations, senders, first, second, amounts, sizes, entry_first, entry_second, entry_amounts):
+        self.names = names
+        self.operations = operations
+        self.senders = senders
+        self.first = first
+        self.second = second
+        self.amounts = amounts
+        self.sizes = sizes
+        self.entry_first = entry_first
+        self.entry_second = entry_second
+        self.entry_amounts = entry_amounts
+
+    def __len__(self):
+        return len(self.operations)
+
+    def decode(self, index, accounts):
+        """
+        Returns the sender, the operation name and the arguments of an operation.
+        Address indexes past the end of `accounts` refer to the zero address.
+        """
+        name = self.names[self.operations[index]]
+        addresses = [self.first[index], self.second[index]]
+        arguments = []
+
+        def address(position):
+            return accounts[position] if position < len(accounts) else ZERO_ADDRESS
+
+        if name == 'batchTransferFrom':
+            size = self.sizes[index] % (BATCH_ENTRIES + 1)
+            holders = [address(position) for position in self.entry_first[index, :size]]
+            recipients = [address(position) for position in self.entry_second[index, :BATCH_ENTRIES]]
+            amounts = [int(amount) for amount in self.entry_amounts[index, :BATCH_ENTRIES]]
+
+            # Unused entries have the zero address as the holder.
+            return accounts[self.senders[index]], name, [holders + [ZERO_ADDRESS] * (BATCH_ENTRIES - size), recipients, amounts]
+
+        if name == 'transferPacked':
+            size = self.sizes[index]
+            transfers = b''.join(
+                address(position) + int(amount).to_bytes(12, 'big')
+                for position, amount in zip(self.entry_second[index, :size], self.entry_amounts[index, :size])
+            )
+
+            return accounts[self.senders[index]], name, [transfers]
+
+        for kind in ARGUMENTS[name]:
+            if kind in ('amount', 'value'):
+                arguments.append(int(self.amounts[index]))
+            else:
+                arguments.append(address(addresses.pop(0)))
+
+        return accounts[self.senders[index]], name, arguments
+
+    def decode_all(self, accounts):
+        for index in range(len(self)):
+            yield self.decode(index, accounts)
+
+
+def generate(model_class, count, actors, random_state, amount_scale):
+    """
+    Generates `count` operations for the supplied model. Senders are biased
+    towards the owner (index zero) so that privileged operations succeed often
+    enough to be interesting.
+    """
+    names = sorted(model_class.operations)
+    weights = numpy.array([model_class.operations[name] for name in names], dtype=float)
+
+    operations = random_state.choice(len(names), size=count, p=weights / weights.sum())
+    senders = numpy.where(random_state.random_sample(count) < 0.3, 0, random_state.randint(0, actors, size=count))
+    first = random_state.randint(0, actors + 1, size=count)
+    second = random_state.randint(0, actors + 1, size=count)
+    amounts = random_state.randint(0, amount_scale, size=count, dtype=numpy.int64)
+
+    # Mix in small amounts so that transfers from accounts other than the owner succeed too.
+    small = random_state.random_sample(count) < 0.5
+    amounts[small] //= 1000
+
+    # Batch entries spread an amount of the same scale over a batch. With a
+    # handful of actors they often repeat a holder or a recipient, or pay the
+    # sender back within its own batch.
+    sizes = random_state.randint(0, PACKED_ENTRIES + 1, size=count)
+    entry_first = random_state.randint(0, actors + 1, size=(count, PACKED_ENTRIES))
+    entry_second = random_state.randint(0, actors + 1, size=(count, PACKED_ENTRIES))
+    entry_amounts = random_state.randint(0, amount_scale // BATCH_ENTRIES, size=(count, PACKED_ENTRIES), dtype=numpy.int64)
+    entry_amounts[small] //= 1000
+
+    return Sequence(names, operations, senders, first, second, amounts, sizes, entry_first, entry_second, entry_amounts)
+
+
+def edge_cases(model, accounts):
+    """
+    Yields the operations of the scripted edge cases. The amounts are read from
+    the model as the operations are applied, and operations the model does
+    not have are skipped.
+    """
+    owner, first, second, third, fourth, fifth = accounts[:6]
+    balances = model.balances
+
+    def pad(entries, empty):
+        return entries + [empty] * (BATCH_ENTRIES - len(entries))
+
+    operations = [
+        lambda: (owner, 'enableTransfers', []),
+        lambda: (owner, 'transfer', [first, 1000]),
+        lambda: (owner, 'transfer', [second, 1000]),
+        lambda: (owner, 'transfer', [third, 1000]),
+        lambda: (fourth, 'distributeDividends', [10 ** 18 + 7]),
+        # Empties a holder in the middle of the index, then the last holder.
+        lambda: (second, 'transfer', [fourth, balances[second]]),
+        lambda: (owner, 'transfer', [fifth, 1000]),
+        lambda: (fifth, 'transfer', [owner, balances[fifth]]),
+        lambda: (first, 'transfer', [first, balances[first]]),
+        lambda: (owner, 'distributeDividends', [3 * 10 ** 17]),
+        lambda: (owner, 'mint', [fifth, 1000]),
+        lambda: (third, 'withdrawDividend', []),
+        lambda: (owner, 'excludeFromDividends', [fourth]),
+        lambda: (fifth, 'burn', [balances[fifth]]),
+        lambda: (fifth, 'distributeDividends', [999]),
+        # Empties a holder listed twice in a batch.
+        lambda: (first, 'approve', [second, balances[first]]),
+        lambda: (second, 'batchTransferFrom', [
+            pad([first, first], ZERO_ADDRESS),
+            pad([third, fourth], ZERO_ADDRESS),
+            pad([balances[first] // 2, balances[first] - balances[first] // 2], 0),
+        ]),
+        # Pays the sender back its whole balance, which it sends on in the same batch.
+        lambda: (third, 'transferPacked', [b''.join(
+            account + balances[third].to_bytes(12, 'big') for account in (third, fourth)
+        )]),
+    ]
+
+    for operation in operations:
+        sender, name, arguments = operation()
+
+        if hasattr(model, name):
+            yield sender, name, arguments
+
+
+def execute(model, operations, token=None, stats=None):
+    """
+    Applies (sender, name, arguments) operations to the model and, when
+    supplied, to the deployed token.
+    """
+    for index, (sender, name, arguments) in enumerate(operations):
+        try:
+            expected = ('ok', model.apply(sender, name, *arguments))
+        except Revert:
+            expected = ('revert', None)
+
+        if stats is not None:
+            stats[name, expected[0] if expected[1] is not False else 'false'] += 1
+
+        if token is None:
+            continue
+
+        # An ether value is passed as the last argument of the model.
+        if ARGUMENTS[name][-1:] == ('value',):
+            receipt = token.transact(name, *arguments[:-1], sender=sender, value=arguments[-1])
+        else:
+            receipt = token.transact(name, *arguments, sender=sender)
+        actual = ('ok', token.decode(name, receipt.output)) if receipt.success else ('revert', None)
+
+        if actual != expected:
+            raise Mismatch('Operation {0} {1}{2} from {3}: expected {4}, got {5}'.format(
+                index, name, tuple(arguments), sender.hex(), expected, actual
+            ))
+
+
+def holder_index_slot(compiled):
+    """
+    Returns the storage slot of the holderIndex map of a compiled token, or
+    None when it has no holder index.
+    """
+    slots = {variable.name: variable.slot for variable in storage_layout(compiled['source'])}
+    return slots.get('holderIndex')
+
+
+def compare_state(model, token, accounts, index_slot=None):
+    """
+    Compares the on-chain state with the model and checks the invariants on-chain.
+    """
+    holders = accounts + [ZERO_ADDRESS]
+    balances = [token.call('balanceOf', holder) for holder in holders]
+    total_supply = token.call('totalSupply')
+
+    expected = {
+        'totalSupply': model.totalSupply,
+        'balances': [model.balances[holder] for holder in holders],
+        'allowed': [model.allowed[owner, spender] for owner in accounts for spender in holders],
+    }
+    actual = {
+        'totalSupply': total_supply,
+        'balances': balances,
+        'allowed': [token.call('allowance', owner, spender) for owner in accounts for spender in holders],
+    }
+
+    for flag in ('paused', 'transferLocked', 'mintingFinished'):
+        if flag in token.functions:
+            expected[flag] = getattr(model, flag)
+            actual[flag] = token.call(flag)
+
+    if 'getCurrentVotes' in token.functions:
+        expected['votes'] = [model.votes(holder) for holder in holders]
+        actual['votes'] = [token.call('getCurrentVotes', holder) for holder in holders]
+
+    # Checks every snapshot, which covers checkpoints of any age.
+    if 'balanceOfAt' in token.functions:
+        for snapshot_id in range(1, len(model.snapshots) + 1):
+            expected['balanceOfAt', snapshot_id] = [model.balance_at(holder, snapshot_id) for holder in holders]
+            actual['balanceOfAt', snapshot_id] = [token.call('balanceOfAt', holder, snapshot_id) for holder in holders]
+            expected['totalSupplyAt', snapshot_id] = model.total_supply_at(snapshot_id)
+            actual['totalSupplyAt', snapshot_id] = token.call('totalSupplyAt', snapshot_id)
+
+    if 'dividendOf' in token.functions:
+        expected['dividendOf'] = [model.dividend_of(holder) for holder in holders]
+        actual['dividendOf'] = [token.call('dividendOf', holder) for holder in holders]
+        expected['withdrawnDividends'] = [model.withdrawnDividends[holder] for holder in holders]
+        actual['withdrawnDividends'] = [token.call('withdrawnDividends', holder) for holder in holders]
+
+    if index_slot is not None:
+        listed = [to_canonical_address(token.call('holderAt', position)) for position in range(token.call('holderCount'))]
+        positions = [
+            token.evm.get_storage(token.address, int.from_bytes(keccak(index_slot.to_bytes(32, 'big') + holder.rjust(32, b'\0')), 'big'))
+            for holder in listed
+        ]
+
+        expected['holders'] = sorted(holder for holder in holders if model.balances[holder] != 0)
+        actual['holders'] = sorted(listed)
+        expected['holderIndex'] = list(range(1, len(listed) + 1))
+        actual['holderIndex'] = positions
+
+    for key in expected:
+        if expected[key] != actual[key]:
+            raise Mismatch('State mismatch on {0}: expected {1}, got {2}'.format(key, expected[key], actual[key]))
+
+    if sum(balances) != total_supply:
+        raise Mismatch('On-chain sum(balances) {0} != totalSupply {1}'.format(sum(balances), total_supply))
+
+    if 'maximumSupply' in token.functions and total_supply > token.call('maximumSupply'):
+        raise Mismatch('On-chain totalSupply exceeds maximumSupply')
+
+
+def constructor_inputs(compiled):
+    constructor = [item for item in compiled['abi'] if item['type'] == 'constructor']
+    return [item['name'] for item in constructor[0]['inputs']] if constructor else []
+
+
+def build(contract, options, arguments):
+    """
+    Compiles the token with the supplied build options and returns it with
+    the constructor arguments to deploy it with. constant_metadata compiles
+    the metadata among `arguments` into the code and removes them from the
+    constructor.
+    """
+    values = dict(zip(constructor_inputs(compile_contract(contract)), arguments))
+    compiled = compile_contract(contract, options, values)
+    return compiled, [values[name] for name in constructor_inputs(compiled)]
+
+
+def fuzz(contract, operations, seed=0, actors=6, batch_size=1000, model_only=False, options=()):
+    """
+    Runs the fuzzer on the token built with the supplied build options and
+    returns the outcome counts of every operation.
+    """
+    model_class = MODELS[contract]
+    compiled, arguments = build(contract, options, model_class(ZERO_ADDRESS, INITIAL_SUPPLY, MAXIMUM_SUPPLY).constructor_args())
+
+    # Tokens without an owner are built without dividends.
+    if 'distributeDividends' in [item.get('name') for item in compiled['abi']]:
+        model_class = with_dividends(model_class)
+
+    if model_only:
+        evm, token = None, None
+        accounts = make_accounts(actors)
+    else:
+        evm = LocalEVM(accounts=actors)
+        accounts = evm.accounts
+
+    model = model_class(accounts[0], INITIAL_SUPPLY, MAXIMUM_SUPPLY)
+
+    if evm is not None:
+        token = evm.deploy(compiled, *arguments, sender=accounts[0])
+
+    index_slot = holder_index_slot(compiled)
+
+    random_state = numpy.random.RandomState(seed)
+    amount_scale = 2 * INITIAL_SUPPLY // actors
+    stats = Counter()
+    remaining = operations
+
+    if actors >= 6:
+        execute(model, edge_cases(model, accounts), token, stats)
+        model.check_invariants()
+
+        if token is not None:
+            compare_state(model, token, accounts, index_slot)
+
+    while remaining > 0:
+        sequence = generate(model_class, min(batch_size, remaining), actors, random_state, amount_scale)
+        execute(model, sequence.decode_all(accounts), token, stats)
+        model.check_invariants()
+
+        if token is not None:
+            compare_state(model, token, accounts, index_slot)
+
+        remaining -= len(sequence)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('contract', choices=sorted(MODELS))
+    parser.add_argument('--operations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--actors', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--model-only', action='store_true', help='Skip the EVM and only check the model invariants.')
+    parser.add_argument('--option', action='append', default=[], choices=sorted(TRANSFORMS), dest='options',
+                        help='A build option of the token, such as holder_index.')
+    args = parser.parse_args()
+
+    started = time.time()
+
+    try:
+        stats = fuzz(args.contract, args.operations, args.seed, args.actors, args.batch_size, args.model_only, args.options)
+    except (Mismatch, AssertionError) as error:
+        print('FAILED (seed {0}): {1}'.format(args.seed, error))
+        sys.exit(1)
+
+    elapsed = time.time() - started
+
+    for (name, outcome), count in sorted(stats.items()):
+        print('{0:<20} {1:<8} {2:>10}'.format(name, outcome, count))
+
+    print('{0} operations in {1:.1f}s ({2:.0f} operations per second)'.format(
+        args.operations, elapsed, args.operations / elapsed
+    ))
+
+
+if __name__ == '__main__':
+    main()
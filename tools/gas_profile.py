@@ -0,0 +1,254 @@
+"""
+Gas profiler for the Vyper contracts.
+
+Runs a representative call of a function (see tools/scenarios.py) on the
+in-process EVM, traces every instruction and attributes its gas to the
+source line and to the function (public or private) it belongs to. SLOAD,
+SSTORE and LOG gas is reported separately. Optionally writes the folded
+stack format understood by flamegraph.pl, inferno and speedscope.
+
+Usage:
+
+    python -m tools.gas_profile lockable_token transfer
+    python -m tools.gas_profile lockable_token transfer --folded transfer.folded
+    flamegraph.pl transfer.folded > transfer.svg
+"""
+import argparse
+import re
+import sys
+from collections import Counter, defaultdict
+
+from tools.build import compile_contract
+from tools.evm import LocalEVM, intrinsic_gas
+from tools.scenarios import prepare, run
+from tools.trace import LOGS, Tracer
+
+CATEGORIES = ('total', 'sload', 'sstore', 'log')
+
+DISPATCHER = '<dispatcher>'
+
+FUNCTION_PATTERN = re.compile(r'^def\s+(\w+)\s*\(')
+DECLARATION_PATTERN = re.compile(r'^(\w+)\s*:\s*public\(')
+
+
+def category(mnemonic):
+    if mnemonic == 'SLOAD':
+        return 'sload'
+
+    if mnemonic == 'SSTORE':
+        return 'sstore'
+
+    if mnemonic in LOGS:
+        return 'log'
+
+    return None
+
+
+class SourceIndex(object):
+    """
+    Finds the function a source line belongs to. Lines of public storage
+    declarations belong to their generated getters.
+    """
+
+    def __init__(self, source):
+        self.lines = source.splitlines()
+        self.starts = []
+        self.private = set()
+        self.getters = {}
+
+        for number, text in enumerate(self.lines, 1):
+            function = FUNCTION_PATTERN.match(text)
+            declaration = DECLARATION_PATTERN.match(text)
+
+            if function:
+                self.starts.append((number, function.group(1)))
+
+                if '@private' in self._decorators(number):
+                    self.private.add(function.group(1))
+            elif declaration:
+                self.getters[number] = declaration.group(1)
+
+    def _decorators(self, number):
+        decorators = []
+        index = number - 2
+
+        while index >= 0 and self.lines[index].startswith('@'):
+            decorators.append(self.lines[index].strip())
+            index -= 1
+
+        return decorators
+
+    def is_header(self, line):
+        """
+        Returns True for the decorator and definition lines of a function.
+        Their code is the selector check and argument validation emitted for
+        the function, which runs while the call is being dispatched.
+        """
+        text = self.lines[line - 1] if 0 < line <= len(self.lines) else ''
+        return text.startswith('@') or bool(FUNCTION_PATTERN.match(text))
+
+    def function_at(self, line):
+        if line in self.getters:
+            return self.getters[line]
+
+        # Decorator lines belong to the definition that follows them.
+        while line <= len(self.lines) and self.lines[line - 1].startswith('@'):
+            line += 1
+
+        function = None
+
+        for start, name in self.starts:
+            if start > line:
+                break
+
+            function = name
+
+        return function
+
+    def text(self, line):
+        return self.lines[line - 1].strip() if 0 < line <= len(self.lines) else ''
+
+
+class Profile(object):
+
+    def __init__(self):
+        self.lines = defaultdict(Counter)
+        self.functions = defaultdict(Counter)
+        self.folded = Counter()
+        self.line_functions = {}
+
+    def add(self, line, function, stack, mnemonic, gas, external=False):
+        kind = category(mnemonic)
+        targets = [self.functions[function]] if external else [self.functions[function], self.lines[line]]
+
+        for target in targets:
+            target['total'] += gas
+
+            if kind:
+                target[kind] += gas
+
+        if not external:
+            self.line_functions[line] = function
+
+        frames = stack + ['L{0}'.format(line)] if line else stack
+        self.folded[';'.join(frames)] += gas
+
+
+def profile_steps(compiled, address, steps):
+    """
+    Attributes traced steps to lines and functions of the compiled contract.
+    Calls the contract makes to itself are nested under the calling frame;
+    gas spent in other contracts is attributed to a frame naming the address.
+    """
+    index = SourceIndex(compiled['source'])
+    pc_map = compiled['pc_map']
+    result = Profile()
+
+    # The function stack of every active call depth.
+    stacks = {}
+
+    for step in steps:
+        for depth in [depth for depth in stacks if depth > step.depth]:
+            del stacks[depth]
+
+        caller = []
+
+        for depth in sorted(stacks):
+            if depth < step.depth:
+                caller = caller + stacks[depth]
+
+        if step.address != address:
+            frame = '<call 0x{0}>'.format(step.address.hex())
+            result.add(None, frame, caller + [frame], step.mnemonic, step.gas, external=True)
+            continue
+
+        stack = stacks.setdefault(step.depth, [])
+        position = pc_map.get(step.pc)
+        line = position[0] if position else None
+        function = index.function_at(line) if line else None
+
+        if function is not None and index.is_header(line) and function not in stack:
+            # Private functions are entered through their header as well, but
+            # only after the public function has started.
+            if not (function in index.private and stack and stack[0] != DISPATCHER):
+                function = DISPATCHER
+
+        if function is None and stack:
+            function = stack[-1]
+        elif function in (None, DISPATCHER):
+            function = DISPATCHER
+            stack[:] = [DISPATCHER]
+        elif function not in index.private:
+            stack[:] = [function]
+        elif function in stack:
+            del stack[stack.index(function) + 1:]
+        else:
+            stack.append(function)
+
+        result.add(line, function, caller + stack, step.mnemonic, step.gas)
+
+    return result, index
+
+
+def format_row(label, counter, suffix=''):
+    return '{0:<28} {1:>8} {2:>8} {3:>8} {4:>8}  {5}'.format(
+        label, *[counter[name] for name in CATEGORIES], suffix
+    ).rstrip()
+
+
+def report(name, call, receipt, result, index, out=sys.stdout):
+    data = call.contract.encode(call.function, *call.arguments)
+
+    print('{0}.{1}: {2} gas used (intrinsic {3})'.format(
+        name, call.function, receipt.gas_used, intrinsic_gas(data)
+    ), file=out)
+
+    print('', file=out)
+    print(format_row('function', Counter(dict(zip(CATEGORIES, CATEGORIES)))), file=out)
+
+    for function, counter in sorted(result.functions.items(), key=lambda item: -item[1]['total']):
+        print(format_row(function, counter), file=out)
+
+    print('', file=out)
+    print(format_row('line', Counter(dict(zip(CATEGORIES, CATEGORIES))), 'source'), file=out)
+
+    for line in sorted(result.lines, key=lambda item: item or 0):
+        label = '{0} ({1})'.format(line or '-', result.line_functions[line])
+        print(format_row(label, result.lines[line], index.text(line) if line else ''), file=out)
+
+
+def write_folded(result, path):
+    with open(path, 'w') as folded_file:
+        for stack, gas in sorted(result.folded.items()):
+            if gas > 0:
+                folded_file.write('{0} {1}\n'.format(stack, gas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('contract')
+    parser.add_argument('function')
+    parser.add_argument('--folded', help='Write the folded stacks for flame graphs to this file.')
+    args = parser.parse_args()
+
+    evm = LocalEVM()
+    call = prepare(evm, args.contract, args.function)
+
+    if call is None:
+        parser.error('There is no scenario for {0}.{1}.'.format(args.contract, args.function))
+
+    with Tracer(evm) as tracer:
+        receipt = run(call)
+
+    if not receipt.success:
+        parser.error('The call failed: {0}'.format(receipt.error))
+
+    result, index = profile_steps(compile_contract(args.contract), call.contract.address, tracer.steps)
+    report(args.contract, call, receipt, result, index)
+
+    if args.folded:
+        write_folded(result, args.folded)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Merkle tree and proof builder for contracts/merkle_distributor.v.py.
+
+Entries are read from a CSV file of `account,amount` rows; the index of an
+entry is its row number (starting at zero, without the header). A leaf is
+keccak256(index ++ account ++ amount) with every value ABI encoded as 32
+bytes, and pairs are hashed in sorted order. A node without a sibling is
+promoted to the next level unchanged.
+
+The tree is built in streaming fashion: every level is written to a file in
+the work directory and read back through a memory map, so memory use does
+not grow with the number of entries. Proofs are then written as JSON lines
+in entry order.
+
+Usage:
+
+    python -m tools.merkle airdrop.csv --proofs proofs.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+import numpy
+from Crypto.Hash import keccak as keccak_hash
+
+WORD = 32
+CHUNK = 65536
+PROOF_LENGTH = 32
+
+EMPTY = b'\0' * WORD
+
+
+def keccak(data):
+    return keccak_hash.new(digest_bits=256, data=data).digest()
+
+
+def parse_address(text):
+    account = bytes.fromhex(text[2:] if text.startswith(('0x', '0X')) else text)
+
+    if len(account) != 20:
+        raise ValueError('Invalid address: {0}'.format(text))
+
+    return account
+
+
+def is_address(text):
+    try:
+        parse_address(text)
+    except ValueError:
+        return False
+
+    return True
+
+
+def leaf_hash(index, account, amount):
+    return keccak(index.to_bytes(WORD, 'big') + b'\0' * 12 + account + amount.to_bytes(WORD, 'big'))
+
+
+def hash_pair(first, second):
+    if first <= second:
+        return keccak(first + second)
+
+    return keccak(second + first)
+
+
+def read_entries(path):
+    """
+    Yields (index, account, amount) for every row of a CSV file. The first
+    line is skipped as a header when its first column is not an address.
+    Any other row which cannot be parsed raises a ValueError, so that no
+    recipient is ever left out silently.
+    """
+    with open(path) as entries_file:
+        index = 0
+
+        for line, row in enumerate(csv.reader(entries_file)):
+            if not row:
+                continue
+
+            if line == 0 and not is_address(row[0].strip()):
+                continue
+
+            try:
+                account, amount = parse_address(row[0].strip()), int(row[1])
+            except (IndexError, ValueError):
+                raise ValueError('Invalid entry on line {0} of {1}: {2}'.format(line + 1, path, ','.join(row)))
+
+            yield index, account, amount
+            index += 1
+
+
+class MerkleTree(object):
+    """
+    A Merkle tree whose levels are stored in files of 32 byte hashes.
+    Level zero holds the leaves.
+    """
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.levels = []
+
+    def _level_path(self, level):
+        return os.path.join(self.work_dir, 'level-{0}.bin'.format(level))
+
+    def _open(self, level):
+        count = self.levels[level]
+        return numpy.memmap(self._level_path(level), dtype=numpy.uint8, mode='r', shape=(count, WORD))
+
+    @classmethod
+    def build(cls, entries, work_dir):
+        """
+        Builds a tree from an iterable of (index, account, amount) entries.
+        """
+        tree = cls(work_dir)
+        count = 0
+
+        with open(tree._level_path(0), 'wb') as level_file:
+            buffer = []
+
+            for index, account, amount in entries:
+                if index != count:
+                    raise ValueError('Entries must be numbered from zero without gaps.')
+
+                buffer.append(leaf_hash(index, account, amount))
+                count += 1
+
+                if len(buffer) == CHUNK:
+                    level_file.write(b''.join(buffer))
+                    buffer = []
+
+            level_file.write(b''.join(buffer))
+
+        if count == 0:
+            raise ValueError('The tree needs at least one entry.')
+
+        tree.levels.append(count)
+
+        while tree.levels[-1] > 1:
+            tree._build_level(len(tree.levels))
+
+        if len(tree.levels) - 1 > PROOF_LENGTH:
+            raise ValueError('Too many entries for proofs of {0} hashes.'.format(PROOF_LENGTH))
+
+        return tree
+
+    def _build_level(self, level):
+        nodes = self._open(level - 1)
+        count = len(nodes)
+
+        with open(self._level_path(level), 'wb') as level_file:
+            for start in range(0, count, 2 * CHUNK):
+                chunk = nodes[start:start + 2 * CHUNK].tobytes()
+                hashes = [
+                    hash_pair(chunk[offset:offset + WORD], chunk[offset + WORD:offset + 2 * WORD])
+                    if offset + WORD < len(chunk) else chunk[offset:offset + WORD]
+                    for offset in range(0, len(chunk), 2 * WORD)
+                ]
+                level_file.write(b''.join(hashes))
+
+        del nodes
+        self.levels.append((count + 1) // 2)
+
+    @property
+    def root(self):
+        return self._open(len(self.levels) - 1)[0].tobytes()
+
+    def proofs(self):
+        """
+        Yields the proof of every entry in index order.
+        """
+        levels = [self._open(level) for level in range(len(self.levels) - 1)]
+
+        for start in range(0, self.levels[0], CHUNK):
+            end = min(start + CHUNK, self.levels[0])
+
+            # The nodes of every level covering this chunk, siblings included.
+            windows = []
+
+            for level, nodes in enumerate(levels):
+                first = (start >> level) & ~1
+                last = min(((end - 1) >> level) | 1, len(nodes) - 1)
+                windows.append((first, len(nodes), nodes[first:last + 1].tobytes()))
+
+            for index in range(start, end):
+                proof = []
+                position = index
+
+                for first, count, window in windows:
+                    sibling = position ^ 1
+
+                    if sibling < count:
+                        offset = (sibling - first) * WORD
+                        proof.append(window[offset:offset + WORD])
+
+                    position >>= 1
+
+                yield proof
+
+
+def verify(root, index, account, amount, proof):
+    node = leaf_hash(index, account, amount)
+
+    for sibling in proof:
+        node = hash_pair(node, sibling)
+
+    return node == root
+
+
+def pad_proof(proof):
+    """
+    Pads a proof with empty elements to the fixed length of the contract.
+    """
+    return proof + [EMPTY] * (PROOF_LENGTH - len(proof))
+
+
+def write_proofs(entries_path, proofs_path, work_dir=None):
+    """
+    Builds the tree of a CSV file and writes one JSON line per entry with its
+    index, account, amount and proof.
+    @return The Merkle root and the number of entries.
+    """
+    owns_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='merkle-')
+
+    try:
+        tree = MerkleTree.build(read_entries(entries_path), work_dir)
+
+        with open(proofs_path, 'w') as proofs_file:
+            for (index, account, amount), proof in zip(read_entries(entries_path), tree.proofs()):
+                proofs_file.write(json.dumps({
+                    'index': index,
+                    'account': '0x' + account.hex(),
+                    'amount': str(amount),
+                    'proof': ['0x' + item.hex() for item in proof],
+                }) + '\n')
+
+        return tree.root, tree.levels[0]
+    finally:
+        if owns_work_dir:
+            shutil.rmtree(work_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entries', help='A CSV file of account,amount rows.')
+    parser.add_argument('--proofs', required=True, help='The JSON lines file to write the proofs to.')
+    parser.add_argument('--work-dir', help='Keeps the level files in this directory.')
+    args = parser.parse_args()
+
+    root, count = write_proofs(args.entries, args.proofs, args.work_dir)
+
+    print('{0} entries'.format(count))
+    print('Merkle root: 0x{0}'.format(root.hex()))
+
+
+if __name__ == '__main__':
+    main()
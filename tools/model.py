@@ -0,0 +1,532 @@
+"""
+Python models of the ERC20 state machines implemented by the token contracts,
+and of the vesting schedule of token_vesting and the lock of token_timelock.
+
+Every public function of a model takes the transaction sender followed by the
+arguments of the contract function. It returns what the contract returns, or
+raises Revert when the contract would revert.
+"""
+from collections import defaultdict
+from fractions import Fraction
+
+ZERO_ADDRESS = b'\0' * 20
+CHAIN_ID = 1
+MAX_UINT256 = 2 ** 256 - 1
+
+
+class Revert(Exception):
+    pass
+
+
+def require(condition):
+    if not condition:
+        raise Revert()
+
+
+class TokenModel(object):
+    """
+    The lenient ERC20 implementation used by burnable_token, mintable_token,
+    pausable_token and lockable_token: transfers return False instead of
+    reverting when the balance or the allowance is insufficient.
+    """
+
+    contract = None
+
+    # Relative frequencies of the operations in generated sequences.
+    operations = {
+        'transfer': 40,
+        'transferFrom': 20,
+        'approve': 10,
+        'increaseApproval': 5,
+        'decreaseApproval': 5,
+    }
+
+    def __init__(self, owner, total_supply, maximum_supply=None):
+        self.owner = owner
+        self.balances = defaultdict(int)
+        self.allowed = defaultdict(int)
+        self.totalSupply = total_supply
+        self.maximumSupply = maximum_supply
+        self.paused = False
+        self.transferLocked = False
+        self.mintingFinished = False
+        self.admins = set()
+
+        self.balances[owner] = total_supply
+
+    def constructor_args(self):
+        return [b'Name', b'SYMBOL', self.totalSupply, 18]
+
+    def apply(self, sender, name, *args):
+        return getattr(self, name)(sender, *args)
+
+    def can_transfer(self, sender):
+        return True
+
+    def is_admin(self, who):
+        return who == self.owner or who in self.admins
+
+    def check_invariants(self):
+        """
+        Raises AssertionError when the accounting invariants do not hold.
+        """
+        assert sum(self.balances.values()) == self.totalSupply, 'sum(balances) != totalSupply'
+        assert all(balance >= 0 for balance in self.balances.values()), 'negative balance'
+        assert all(value >= 0 for value in self.allowed.values()), 'negative allowance'
+
+        if self.maximumSupply is not None:
+            assert self.totalSupply <= self.maximumSupply, 'totalSupply > maximumSupply'
+
+    def transfer(self, sender, to, value):
+        require(self.can_transfer(sender))
+
+        if self.balances[sender] >= value:
+            require(self.balances[to] + value <= MAX_UINT256)
+            self.balances[sender] -= value
+            self.balances[to] += value
+            return True
+
+        return False
+
+    def transferFrom(self, sender, source, to, value):
+        require(self.can_transfer(sender))
+
+        if value <= self.allowed[source, sender] and value <= self.balances[source]:
+            require(source == to or self.balances[to] + value <= MAX_UINT256)
+            self.balances[source] -= value
+            self.allowed[source, sender] -= value
+            self.balances[to] += value
+            return True
+
+        return False
+
+    def approve(self, sender, spender, value):
+        require(not self.paused)
+
+        self.allowed[sender, spender] = value
+        return True
+
+    def increaseApproval(self, sender, spender, value):
+        require(not self.paused)
+        require(self.allowed[sender, spender] + value <= MAX_UINT256)
+
+        self.allowed[sender, spender] += value
+        return True
+
+    def decreaseApproval(self, sender, spender, value):
+        require(not self.paused)
+
+        if value >= self.allowed[sender, spender]:
+            self.allowed[sender, spender] = 0
+        else:
+            self.allowed[sender, spender] -= value
+
+        return True
+
+
+class StandardTokenModel(TokenModel):
+    """
+    erc20_standard_token: transfers revert on insufficient balance or allowance
+    and on transfers to the zero address.
+    """
+
+    contract = 'erc20_standard_token'
+
+    def transfer(self, sender, to, value):
+        require(value <= self.balances[sender])
+        require(to != ZERO_ADDRESS)
+
+        return super().transfer(sender, to, value)
+
+    def transferFrom(self, sender, source, to, value):
+        require(value <= self.balances[source])
+        require(value <= self.allowed[source, sender])
+        require(to != ZERO_ADDRESS)
+
+        return super().transferFrom(sender, source, to, value)
+
+
+class BurnableTokenModel(TokenModel):
+    contract = 'burnable_token'
+
+    operations = dict(TokenModel.operations, burn=5)
+
+    def burn(self, sender, value):
+        require(value <= self.balances[sender])
+
+        self.balances[sender] -= value
+        self.totalSupply -= value
+
+
+class PausableTokenModel(TokenModel):
+    contract = 'pausable_token'
+
+    operations = dict(TokenModel.operations, pause=1, unpause=1)
+
+    def can_transfer(self, sender):
+        return not self.paused
+
+    def pause(self, sender):
+        require(sender == self.owner)
+        require(not self.paused)
+
+        self.paused = True
+
+    def unpause(self, sender):
+        require(sender == self.owner)
+        require(self.paused)
+
+        self.paused = False
+
+
+class MintableTokenModel(TokenModel):
+    contract = 'mintable_token'
+
+    operations = dict(TokenModel.operations, mint=5, finishMinting=0.1)
+
+    def __init__(self, owner, total_supply, maximum_supply):
+        super().__init__(owner, total_supply, maximum_supply)
+
+    def constructor_args(self):
+        return [b'Name', b'SYMBOL', self.totalSupply, self.maximumSupply, 18]
+
+    def can_mint(self, sender):
+        return sender == self.owner
+
+    def mint(self, sender, to, value):
+        require(self.can_mint(sender))
+        require(self.totalSupply + value <= self.maximumSupply)
+        require(not self.mintingFinished)
+
+        self.totalSupply += value
+        self.balances[to] += value
+        return True
+
+    def finishMinting(self, sender):
+        require(self.can_mint(sender))
+        require(not self.mintingFinished)
+
+        self.mintingFinished = True
+        return True
+
+
+class LockableTokenModel(MintableTokenModel):
+    """
+    lockable_token: admins, pause, transfer lock, mint and burn.
+    """
+
+    contract = 'lockable_token'
+
+    operations = dict(
+        MintableTokenModel.operations,
+        burn=5,
+        pause=1,
+        unpause=1,
+        enableTransfers=2,
+        disableTransfers=1,
+        addAdmin=1,
+        removeAdmin=1,
+        snapshot=0.5,
+        delegate=2,
+        batchTransferFrom=3,
+        transferPacked=3,
+    )
+
+    def __init__(self, owner, total_supply, maximum_supply):
+        super().__init__(owner, total_supply, maximum_supply)
+        self.transferLocked = True
+        self.snapshots = []
+        self.delegates = {}
+
+    def constructor_args(self):
+        return super().constructor_args() + [CHAIN_ID]
+
+    def can_transfer(self, sender):
+        if self.paused or self.transferLocked:
+            return self.is_admin(sender)
+
+        return True
+
+    def can_mint(self, sender):
+        return self.is_admin(sender)
+
+    def mint(self, sender, to, value):
+        require(self.can_transfer(sender))
+        return super().mint(sender, to, value)
+
+    def burn(self, sender, value):
+        require(self.can_transfer(sender))
+        require(value <= self.balances[sender])
+
+        self.balances[sender] -= value
+        self.totalSupply -= value
+
+    def credit(self, balances, transfers):
+        """
+        Adds (to, value) pairs to the changed balances in `balances`, reverting
+        when a balance would overflow.
+        """
+        for to, value in transfers:
+            balances[to] = balances.get(to, self.balances[to]) + value
+            require(balances[to] <= MAX_UINT256)
+
+        return balances
+
+    def batchTransferFrom(self, sender, sources, recipients, values):
+        require(self.can_transfer(sender))
+
+        entries = [(source, to, value) for source, to, value in zip(sources, recipients, values) if source != ZERO_ADDRESS]
+        totals = {}
+
+        for source, to, value in entries:
+            totals[source] = totals.get(source, 0) + value
+            require(totals[source] <= MAX_UINT256)
+
+        # Every holder is debited the sum of its entries before any recipient is credited.
+        for source, total in totals.items():
+            require(total <= self.allowed[source, sender])
+            require(total <= self.balances[source])
+
+        debited = {source: self.balances[source] - total for source, total in totals.items()}
+        self.balances.update(self.credit(debited, ((to, value) for source, to, value in entries)))
+
+        for source, total in totals.items():
+            self.allowed[source, sender] -= total
+
+        return True
+
+    def transferPacked(self, sender, transfers):
+        require(len(transfers) % 32 == 0)
+
+        entries = [int.from_bytes(transfers[offset:offset + 32], 'big') for offset in range(0, len(transfers), 32)]
+        entries = [((entry >> 96).to_bytes(20, 'big'), entry & (2 ** 96 - 1)) for entry in entries]
+        total = sum(value for to, value in entries)
+
+        # The recipients are credited before the sender is debited, so an
+        # amount sent to the sender itself counts towards its balance.
+        balances = self.credit({}, entries)
+        balance = balances.get(sender, self.balances[sender])
+
+        require(self.can_transfer(sender))
+        require(total <= balance)
+
+        balances[sender] = balance - total
+        self.balances.update(balances)
+        return True
+
+    def pause(self, sender):
+        require(sender == self.owner)
+        require(not self.paused)
+
+        self.paused = True
+
+    def unpause(self, sender):
+        require(sender == self.owner)
+        require(self.paused)
+
+        self.paused = False
+
+    def enableTransfers(self, sender):
+        require(sender == self.owner)
+        require(not self.paused)
+        require(self.transferLocked)
+
+        self.transferLocked = False
+
+    def disableTransfers(self, sender):
+        require(sender == self.owner)
+        require(not self.paused)
+        require(not self.transferLocked)
+
+        self.transferLocked = True
+
+    def addAdmin(self, sender, who):
+        require(who != ZERO_ADDRESS)
+        require(who != self.owner)
+        require(who not in self.admins)
+
+        self.admins.add(who)
+        return True
+
+    def removeAdmin(self, sender, who):
+        require(who != ZERO_ADDRESS)
+        require(who != self.owner)
+        require(who in self.admins)
+
+        self.admins.discard(who)
+        return True
+
+    def snapshot(self, sender):
+        require(self.is_admin(sender))
+
+        self.snapshots.append((dict(self.balances), self.totalSupply))
+        return len(self.snapshots)
+
+    def delegate(self, sender, delegatee):
+        self.delegates[sender] = delegatee
+
+    def votes(self, account):
+        if account == ZERO_ADDRESS:
+            return 0
+
+        return sum(self.balances[holder] for holder, delegatee in self.delegates.items() if delegatee == account)
+
+    def balance_at(self, owner, snapshot_id):
+        return self.snapshots[snapshot_id - 1][0].get(owner, 0)
+
+    def total_supply_at(self, snapshot_id):
+        return self.snapshots[snapshot_id - 1][1]
+
+
+class DividendsModel(object):
+    """
+    The dividends build option, mixed into a token model by with_dividends().
+    The magnified dividends of every account are kept as the sum over the
+    distributions of the dividends per share times its balance at that time,
+    which is what the corrections of the contract add up to. The exact share
+    of every distribution is tracked next to them. Excluded accounts take no
+    part in the distributions and earn nothing.
+    """
+
+    MAGNITUDE = 2 ** 128
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.magnifiedDividendPerShare = 0
+        self.magnifiedDividends = defaultdict(int)
+        self.withdrawnDividends = defaultdict(int)
+        self.shares = defaultdict(Fraction)
+        self.dividendsExcluded = set()
+
+    def check_invariants(self):
+        """
+        Also checks that every account is paid its exact share of the
+        distributions, less one wei for the final division and less than one
+        for the rounding of the dividends per share.
+        """
+        super().check_invariants()
+
+        for account, share in self.shares.items():
+            paid = self.withdrawnDividends[account] + self.dividend_of(account)
+            assert 0 <= share - paid < 2, 'dividends paid differ from the share of the distributions'
+
+    def distributeDividends(self, sender, value):
+        included = self.totalSupply - sum(self.balances[account] for account in self.dividendsExcluded)
+        require(included > 0)
+
+        # No balance can exceed the maximum supply, or the total supply of tokens which cannot be minted.
+        supply = self.maximumSupply if isinstance(self, MintableTokenModel) else self.totalSupply
+        increment = value * self.MAGNITUDE // included
+        require(self.magnifiedDividendPerShare + increment <= MAX_UINT256 // supply // 2 ** 32)
+
+        self.magnifiedDividendPerShare += increment
+
+        for account, balance in self.balances.items():
+            if account not in self.dividendsExcluded:
+                self.magnifiedDividends[account] += increment * balance
+                self.shares[account] += Fraction(value * balance, included)
+
+    def withdrawDividend(self, sender):
+        amount = self.dividend_of(sender)
+        require(amount > 0)
+
+        self.withdrawnDividends[sender] += amount
+
+    def excludeFromDividends(self, sender, account):
+        require(sender == self.owner)
+        require(account not in self.dividendsExcluded)
+
+        self.dividendsExcluded.add(account)
+
+        # The dividends earned so far are forfeited.
+        self.shares.pop(account, None)
+
+    def dividend_of(self, owner):
+        if owner in self.dividendsExcluded:
+            return 0
+
+        return self.magnifiedDividends[owner] // self.MAGNITUDE - self.withdrawnDividends[owner]
+
+
+def with_dividends(model_class):
+    """
+    Returns the model of a token built with the dividends option.
+    """
+    operations = dict(model_class.operations, distributeDividends=2, withdrawDividend=2, excludeFromDividends=0.2)
+    return type('Dividends' + model_class.__name__, (DividendsModel, model_class), {'operations': operations})
+
+
+class VestingModel(object):
+    """
+    token_vesting holding a single token. Time is passed explicitly as `now`.
+    """
+
+    contract = 'token_vesting'
+
+    def __init__(self, start, cliff, duration, revocable, balance):
+        self.start = start
+        self.cliff = cliff
+        self.duration = duration
+        self.revocable = revocable
+        self.balance = balance
+        self.released = 0
+        self.revoked = False
+
+    def getVestedAmount(self, now):
+        total_balance = self.balance + self.released
+
+        if now < self.start + self.cliff:
+            return 0
+
+        if now >= self.start + self.duration or self.revoked:
+            return total_balance
+
+        return total_balance * (now - self.start) // self.duration
+
+    def getReleasableAmount(self, now):
+        return self.getVestedAmount(now) - self.released
+
+    def release(self, now):
+        unreleased = self.getReleasableAmount(now)
+        require(unreleased > 0)
+
+        self.released += unreleased
+        self.balance -= unreleased
+        return unreleased
+
+    def revoke(self, now):
+        require(self.revocable)
+        require(not self.revoked)
+
+        refund = self.balance - self.getReleasableAmount(now)
+
+        self.revoked = True
+        self.balance -= refund
+        return refund
+
+
+class TimelockModel(object):
+    """
+    token_timelock holding a single token. Time is passed explicitly as `now`.
+    """
+
+    contract = 'token_timelock'
+
+    def __init__(self, beneficiary, release_time, balance):
+        self.beneficiary = beneficiary
+        self.releaseTime = release_time
+        self.balance = balance
+
+    def release(self, sender, now):
+        require(sender == self.beneficiary)
+        require(now >= self.releaseTime)
+        require(self.balance > 0)
+
+        amount, self.balance = self.balance, 0
+        return amount
+
+
+MODELS = {
+    model.contract: model
+    for model in (StandardTokenModel, BurnableTokenModel, PausableTokenModel, MintableTokenModel, LockableTokenModel)
+}
@@ -0,0 +1,280 @@
+"""
+A stand-in Ethereum node serving JSON-RPC over HTTP from the in-process EVM.
+
+It implements the subset of the JSON-RPC API used by the deployment and
+client tools, batch requests included. Every transaction sent with
+eth_sendRawTransaction is applied immediately in a block of its own, like a
+development chain with automatic mining. The ten accounts of LocalEVM are
+funded; their private keys are 0x01, 0x02 and so on.
+
+Usage:
+
+    python -m tools.node --port 8545
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth.constants import CREATE_CONTRACT_ADDRESS
+from eth.vm.forks.byzantium.transactions import ByzantiumTransaction
+from eth_utils import keccak
+
+from tools.evm import LocalEVM, revert_reason
+from tools.model import CHAIN_ID
+
+GAS_PRICE = 10 ** 9
+
+
+class RPCError(Exception):
+    def __init__(self, message, code=-32000):
+        super().__init__(message)
+        self.code = code
+
+
+def quantity(value):
+    return hex(value)
+
+
+def data(value):
+    return '0x' + value.hex()
+
+
+def parse_data(text):
+    return bytes.fromhex(text[2:] if text.startswith('0x') else text)
+
+
+def parse_quantity(text):
+    return int(text, 16) if isinstance(text, str) else text
+
+
+class StandInNode(object):
+    """
+    Dispatches JSON-RPC requests to a LocalEVM.
+    """
+
+    def __init__(self, evm=None, chain_id=CHAIN_ID):
+        self.evm = evm or LocalEVM()
+        self.chain_id = chain_id
+        self.receipts = {}
+        self.logs = []
+        self.timestamps = {}
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    def handle(self, request):
+        """
+        Handles a single request or a batch and returns the response object.
+        """
+        if isinstance(request, list):
+            return [self.handle(item) for item in request]
+
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+
+        try:
+            method = getattr(self, 'rpc_' + request.get('method', ''), None)
+
+            if method is None:
+                raise RPCError('The method {0} does not exist.'.format(request.get('method')), -32601)
+
+            with self.lock:
+                self.request_count += 1
+                response['result'] = method(*request.get('params', []))
+        except RPCError as error:
+            response['error'] = {'code': error.code, 'message': str(error)}
+        except Exception as error:
+            response['error'] = {'code': -32000, 'message': str(error) or type(error).__name__}
+
+        return response
+
+    def rpc_web3_clientVersion(self):
+        return 'vyper-erc20/stand-in'
+
+    def rpc_net_version(self):
+        return str(self.chain_id)
+
+    def rpc_eth_chainId(self):
+        return quantity(self.chain_id)
+
+    def rpc_eth_accounts(self):
+        return [data(account) for account in self.evm.accounts]
+
+    def rpc_eth_blockNumber(self):
+        return quantity(self.evm.block_number)
+
+    def rpc_eth_getBlockByNumber(self, block, full=False):
+        number = self.evm.block_number if block in ('latest', 'pending') else parse_quantity(block)
+
+        if number == self.evm.block_number:
+            timestamp = self.evm.timestamp
+        elif number in self.timestamps:
+            timestamp = self.timestamps[number]
+        else:
+            return None
+
+        return {'number': quantity(number), 'timestamp': quantity(timestamp), 'transactions': []}
+
+    def rpc_eth_gasPrice(self):
+        return quantity(GAS_PRICE)
+
+    def rpc_eth_getBalance(self, address, block='latest'):
+        return quantity(self.evm.state.account_db.get_balance(parse_data(address)))
+
+    def rpc_eth_getCode(self, address, block='latest'):
+        return data(self.evm.state.account_db.get_code(parse_data(address)))
+
+    def rpc_eth_getTransactionCount(self, address, block='latest'):
+        return quantity(self.evm.state.account_db.get_nonce(parse_data(address)))
+
+    def rpc_eth_call(self, call, block='latest'):
+        receipt = self.evm.execute(
+            parse_data(call['from']) if call.get('from') else None,
+            parse_data(call['to']),
+            parse_data(call.get('data', '0x')),
+            value=parse_quantity(call.get('value', 0)),
+            persist=False,
+        )
+
+        if not receipt.success:
+            raise RPCError('execution reverted: {0}'.format(revert_reason(receipt.error) or receipt.error), 3)
+
+        return data(receipt.output)
+
+    def rpc_eth_estimateGas(self, call, block='latest'):
+        receipt = self.evm.execute(
+            parse_data(call['from']) if call.get('from') else None,
+            parse_data(call['to']),
+            parse_data(call.get('data', '0x')),
+            value=parse_quantity(call.get('value', 0)),
+            persist=False,
+        )
+
+        if not receipt.success:
+            raise RPCError('execution reverted: {0}'.format(revert_reason(receipt.error) or receipt.error), 3)
+
+        return quantity(receipt.gas_used)
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        raw = parse_data(raw)
+        transaction = rlp.decode(raw, sedes=ByzantiumTransaction)
+
+        if transaction.chain_id is not None and transaction.chain_id != self.chain_id:
+            raise RPCError('Invalid chain id {0}.'.format(transaction.chain_id))
+
+        transaction_hash = data(keccak(raw))
+
+        if transaction_hash in self.receipts:
+            return transaction_hash
+
+        self.evm.mine()
+        self.timestamps[self.evm.block_number] = self.evm.timestamp
+        receipt, address = self.evm.apply_transaction(transaction)
+        block_number = quantity(self.evm.block_number)
+
+        logs = [{
+            'address': data(log.address),
+            'topics': [data(topic) for topic in log.topics],
+            'data': data(log.data),
+            'blockNumber': block_number,
+            'transactionHash': transaction_hash,
+            'transactionIndex': '0x0',
+            'logIndex': quantity(index),
+        } for index, log in enumerate(receipt.logs)]
+
+        self.logs.extend(logs)
+        self.receipts[transaction_hash] = {
+            'transactionHash': transaction_hash,
+            'transactionIndex': '0x0',
+            'blockNumber': block_number,
+            'from': data(transaction.sender),
+            'to': None if transaction.to == CREATE_CONTRACT_ADDRESS else data(transaction.to),
+            'contractAddress': data(address) if address and receipt.success else None,
+            'gasUsed': quantity(receipt.gas_used),
+            'cumulativeGasUsed': quantity(receipt.gas_used),
+            'status': '0x1' if receipt.success else '0x0',
+            'logs': logs,
+        }
+
+        return transaction_hash
+
+    def rpc_eth_getTransactionReceipt(self, transaction_hash):
+        return self.receipts.get(transaction_hash)
+
+    def rpc_eth_getLogs(self, query):
+        first = parse_quantity(query.get('fromBlock', '0x0')) if query.get('fromBlock', 'latest') != 'latest' else self.evm.block_number
+        last = parse_quantity(query.get('toBlock', 'latest')) if query.get('toBlock', 'latest') != 'latest' else self.evm.block_number
+        addresses = query.get('address')
+
+        if isinstance(addresses, str):
+            addresses = [addresses]
+
+        addresses = {item.lower() for item in addresses} if addresses else None
+
+        return [
+            log for log in self.logs
+            if first <= int(log['blockNumber'], 16) <= last and (addresses is None or log['address'] in addresses)
+        ]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+
+        try:
+            response = self.server.node.handle(json.loads(body.decode()))
+        except ValueError:
+            response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error.'}}
+
+        output = json.dumps(response).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(output)))
+        self.end_headers()
+        self.wfile.write(output)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(node=None, host='127.0.0.1', port=8545):
+    """
+    Starts serving a node in a background thread and returns the server.
+    Use port 0 for a free port; the URL is then in server.url.
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.node = node or StandInNode()
+    server.url = 'http://{0}:{1}'.format(*server.server_address)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8545)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    server.node = StandInNode()
+
+    print('Listening on http://{0}:{1}'.format(args.host, args.port))
+
+    for index, account in enumerate(server.node.evm.accounts):
+        print('0x{0} (private key 0x{1:064x})'.format(account.hex(), index + 1))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Packed batch transfer encoder for lockable_token.transferPacked.
+
+A transfer is packed in 32 bytes: the 20-byte recipient followed by the
+amount as a 12-byte big-endian integer, half the calldata of an ABI-encoded
+(address, uint256) pair. Recipients are streamed from a CSV file of
+`account,amount` rows, as read by tools/merkle.py, and packed into
+transactions of at most MAX_TRANSFERS transfers whose estimated gas fits in
+the gas limit, by default the block gas limit. The estimate is the intrinsic
+gas of the calldata plus upper bounds of the batch and of every transfer,
+derived by tools/build.py from the code of transferPacked in the build of
+the token being distributed, so that --option holder_index or dividends
+get the bounds of the storage writes they add, and priced for the fork
+the gas estimates of the artifacts are for (tools.build.GAS_FORK). The transactions are written
+as JSON lines with their calldata, the number of transfers, the sum of
+their amounts and the estimated gas.
+
+The benchmark distributes random amounts on the in-process EVM with
+transferPacked, to new recipients from a sender with a delegate and a
+pending snapshot, checking every transaction against its estimate and every
+balance, and then once more with one transfer per recipient.
+
+Usage:
+
+    python -m tools.packed airdrop.csv --output transactions.jsonl
+    python -m tools.packed airdrop.csv --gas-limit 1000000 --option holder_index
+    python -m tools.packed --benchmark 1000 --option dividends
+"""
+import argparse
+import json
+import random
+import sys
+
+from eth_abi import encode_abi
+from eth_utils import function_signature_to_4byte_selector
+
+from tools.build import CONSTANT_TRANSFORMS, TRANSFORMS, static_gas
+from tools.evm import DEFAULT_GAS_LIMIT, LocalEVM, intrinsic_gas
+from tools.merkle import read_entries
+from tools.scenarios import deploy_token
+
+# The capacity of the bytes argument of transferPacked.
+MAX_TRANSFERS = 32
+MAX_AMOUNT = 2 ** 96 - 1
+
+SELECTOR = function_signature_to_4byte_selector('transferPacked(bytes)')
+
+# The build options which can be used with the encoder.
+OPTIONS = sorted(set(TRANSFORMS) - CONSTANT_TRANSFORMS)
+
+
+def pack(account, amount):
+    if not 0 <= amount <= MAX_AMOUNT:
+        raise ValueError('The amount {0} of 0x{1} does not fit in 12 bytes.'.format(amount, account.hex()))
+
+    return account + amount.to_bytes(12, 'big')
+
+
+def calldata(transfers):
+    return SELECTOR + encode_abi(['bytes'], [b''.join(transfers)])
+
+
+def gas_bounds(options=()):
+    """
+    Returns upper bounds of the execution gas of a batch and of every
+    transfer in it: the static bound of transferPacked in lockable_token
+    built with the supplied options, split into the rounds of its loop and
+    the rest.
+    """
+    bounds = static_gas('lockable_token', options)
+    method_id = int.from_bytes(SELECTOR, 'big')
+    loops = []
+
+    def find_loops(node):
+        if node.value == 'repeat':
+            loops.append(node)
+
+        for argument in node.args:
+            find_loops(argument)
+
+    find_loops(bounds.public[method_id])
+
+    if len(loops) != 1 or loops[0].args[2].value != MAX_TRANSFERS:
+        raise ValueError('transferPacked does not have a single loop of {0} rounds.'.format(MAX_TRANSFERS))
+
+    transfer_gas = bounds.gas(loops[0].args[3], []) + 50
+    return bounds.function_gas(method_id) - MAX_TRANSFERS * transfer_gas, transfer_gas
+
+
+def estimate_gas(data, count, bounds):
+    batch_gas, transfer_gas = bounds
+    return intrinsic_gas(data) + batch_gas + count * transfer_gas
+
+
+def packed_batches(entries, gas_limit=DEFAULT_GAS_LIMIT, max_transfers=MAX_TRANSFERS, options=()):
+    """
+    Packs (account, amount) pairs into batches for lockable_token built with
+    the supplied options and yields (calldata, count, amount, estimated gas)
+    for each of them. The pairs are consumed lazily.
+    """
+    bounds = gas_bounds(options)
+
+    if estimate_gas(calldata([b'\0' * 32]), 1, bounds) > gas_limit:
+        raise ValueError('A gas limit of {0} does not fit a single transfer.'.format(gas_limit))
+
+    transfers = []
+    total = 0
+
+    for account, amount in entries:
+        transfers.append(pack(account, amount))
+
+        if len(transfers) > max_transfers or estimate_gas(calldata(transfers), len(transfers), bounds) > gas_limit:
+            last = transfers.pop()
+            data = calldata(transfers)
+            yield data, len(transfers), total, estimate_gas(data, len(transfers), bounds)
+            transfers = [last]
+            total = 0
+
+        total += amount
+
+    if transfers:
+        data = calldata(transfers)
+        yield data, len(transfers), total, estimate_gas(data, len(transfers), bounds)
+
+
+def write_batches(entries_path, output_file, gas_limit=DEFAULT_GAS_LIMIT, options=()):
+    """
+    Writes one JSON line per batch of a CSV file.
+    @return The number of batches, transfers and the total amount.
+    """
+    batches = 0
+    transfers = 0
+    total = 0
+
+    entries = ((account, amount) for index, account, amount in read_entries(entries_path))
+
+    for data, count, amount, gas in packed_batches(entries, gas_limit, options=options):
+        output_file.write(json.dumps({
+            'data': '0x' + data.hex(),
+            'transfers': count,
+            'amount': str(amount),
+            'gas': gas,
+        }) + '\n')
+
+        batches += 1
+        transfers += count
+        total += amount
+
+    return batches, transfers, total
+
+
+def benchmark(recipients, gas_limit=DEFAULT_GAS_LIMIT, seed=0, options=()):
+    random_state = random.Random(seed)
+    entries = [
+        (random_state.getrandbits(160).to_bytes(20, 'big'), random_state.randint(1, 10 ** 21))
+        for _ in range(recipients)
+    ]
+
+    evm = LocalEVM()
+    owner = evm.accounts[0]
+    token = deploy_token(evm, 'lockable_token', owner, options)
+    token.transact('delegate', owner, sender=owner)
+    token.transact('snapshot', sender=owner)
+
+    packed_gas = 0
+    packed_bytes = 0
+    batches = 0
+    headroom = None
+
+    for data, count, amount, gas in packed_batches(entries, gas_limit, options=options):
+        receipt = evm.execute(owner, token.address, data, gas=gas)
+
+        if not receipt.success:
+            raise RuntimeError('A batch of {0} transfers failed within its estimate of {1} gas.'.format(count, gas))
+
+        packed_gas += receipt.gas_used
+        packed_bytes += len(data)
+        batches += 1
+
+        if headroom is None or gas - receipt.gas_used < headroom:
+            headroom = gas - receipt.gas_used
+
+    for account, amount in entries:
+        if token.call('balanceOf', account) != amount:
+            raise RuntimeError('The balance of 0x{0} is wrong.'.format(account.hex()))
+
+    evm = LocalEVM()
+    token = deploy_token(evm, 'lockable_token', owner, options)
+    token.transact('delegate', owner, sender=owner)
+    token.transact('snapshot', sender=owner)
+
+    transfer_gas = 0
+    transfer_bytes = 0
+
+    for account, amount in entries:
+        data = token.encode('transfer', account, amount)
+        transfer_gas += evm.execute(owner, token.address, data).gas_used
+        transfer_bytes += len(data)
+
+    print('{0} recipients in {1} batches, at least {2} gas below the estimates'.format(recipients, batches, headroom))
+    print('    {0:<16} {1:>12} {2:>10} {3:>10}'.format('', 'gas', 'per entry', 'calldata'))
+    print('    {0:<16} {1:>12} {2:>10.0f} {3:>10}'.format('transferPacked', packed_gas, packed_gas / recipients, packed_bytes))
+    print('    {0:<16} {1:>12} {2:>10.0f} {3:>10}'.format('transfer', transfer_gas, transfer_gas / recipients, transfer_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entries', nargs='?', help='A CSV file of account,amount rows.')
+    parser.add_argument('--output', help='The JSON lines file to write the transactions to, by default the standard output.')
+    parser.add_argument('--gas-limit', type=int, default=DEFAULT_GAS_LIMIT, help='The gas limit of every transaction.')
+    parser.add_argument('--benchmark', type=int, metavar='RECIPIENTS', help='Distributes to random recipients on the in-process EVM.')
+    parser.add_argument('--option', action='append', default=[], choices=OPTIONS, dest='options',
+                        help='A build option of the token, such as holder_index.')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.gas_limit, options=args.options)
+        return
+
+    if not args.entries:
+        parser.error('a CSV file or --benchmark is required')
+
+    try:
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                batches, transfers, total = write_batches(args.entries, output_file, args.gas_limit, args.options)
+        else:
+            batches, transfers, total = write_batches(args.entries, sys.stdout, args.gas_limit, args.options)
+    except ValueError as error:
+        print('FAILED: {0}'.format(error), file=sys.stderr)
+        raise SystemExit(1)
+
+    print('{0} transfers of {1} in total packed into {2} transactions'.format(transfers, total, batches), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+A local relayer stand-in for the signed transfers of lockable_token.
+
+Holders sign EIP-712 transfer messages with their keys, and the relayer
+queues them and submits them with transferManyBySig in batches of ten,
+paying the gas itself. Pending nonces are tracked per holder, so a holder
+can sign several transfers before the first one is relayed.
+
+Run as a script, it deploys lockable_token on the in-process EVM, has every
+holder sign transfers, relays them one by one with transferBySig and in
+batches with transferManyBySig, checks the resulting balances and nonces
+and reports the gas per transfer of both.
+
+Usage:
+
+    python -m tools.relayer --transfers 200 --holders 8
+"""
+import argparse
+import sys
+from collections import defaultdict, namedtuple
+
+from eth_utils import keccak
+
+from tools.evm import LocalEVM
+from tools.model import CHAIN_ID, ZERO_ADDRESS
+from tools.scenarios import deploy_token
+
+BATCH_SIZE = 10
+DEADLINE = 60 * 60
+
+DOMAIN_TYPEHASH = keccak(b'EIP712Domain(uint256 chainId,address verifyingContract)')
+TRANSFER_TYPEHASH = keccak(b'Transfer(address from,address to,uint256 amount,uint256 nonce,uint256 deadline)')
+
+SignedTransfer = namedtuple('SignedTransfer', ['holder', 'to', 'amount', 'nonce', 'deadline', 'v', 'r', 's'])
+
+EMPTY_TRANSFER = SignedTransfer(ZERO_ADDRESS, ZERO_ADDRESS, 0, 0, 0, 0, b'\0' * 32, b'\0' * 32)
+
+
+def word(value):
+    if isinstance(value, bytes):
+        return value.rjust(32, b'\0')
+
+    return value.to_bytes(32, 'big')
+
+
+def domain_separator(token_address, chain_id=CHAIN_ID):
+    return keccak(DOMAIN_TYPEHASH + word(chain_id) + word(token_address))
+
+
+def transfer_digest(token_address, holder, to, amount, nonce, deadline, chain_id=CHAIN_ID):
+    """
+    Returns the EIP-712 digest a holder signs to authorize a transfer.
+    """
+    struct_hash = keccak(TRANSFER_TYPEHASH + word(holder) + word(to) + word(amount) + word(nonce) + word(deadline))
+    return keccak(b'\x19\x01' + domain_separator(token_address, chain_id) + struct_hash)
+
+
+def sign_transfer(key, token_address, to, amount, nonce, deadline, chain_id=CHAIN_ID):
+    """
+    Signs a transfer with an eth_keys private key.
+    """
+    holder = key.public_key.to_canonical_address()
+    signature = key.sign_msg_hash(transfer_digest(token_address, holder, to, amount, nonce, deadline, chain_id))
+
+    return SignedTransfer(holder, to, amount, nonce, deadline, signature.v + 27, word(signature.r), word(signature.s))
+
+
+class Relayer(object):
+    """
+    Queues signed transfers and submits them to a token in batches.
+    """
+
+    def __init__(self, token, sender, chain_id=CHAIN_ID):
+        self.token = token
+        self.sender = sender
+        self.chain_id = chain_id
+        self.pending = []
+        self.nonces = defaultdict(int)
+        self.receipts = []
+
+    def next_nonce(self, holder):
+        """
+        Returns the nonce of the next transfer of a holder, pending transfers included.
+        """
+        if holder not in self.nonces:
+            self.nonces[holder] = self.token.call('nonces', holder)
+
+        return self.nonces[holder]
+
+    def sign(self, key, to, amount, deadline):
+        """
+        Signs a transfer on behalf of a holder and queues it.
+        """
+        holder = key.public_key.to_canonical_address()
+        signed = sign_transfer(key, self.token.address, to, amount, self.next_nonce(holder), deadline, self.chain_id)
+        self.submit(signed)
+
+        return signed
+
+    def submit(self, signed):
+        self.pending.append(signed)
+        self.nonces[signed.holder] = max(self.next_nonce(signed.holder), signed.nonce + 1)
+
+    def relay(self, signed):
+        """
+        Submits a single signed transfer with transferBySig.
+        """
+        receipt = self.token.transact(
+            'transferBySig', signed.holder, signed.to, signed.amount, signed.deadline, signed.v, signed.r, signed.s,
+            sender=self.sender,
+        )
+        self.receipts.append(receipt)
+
+        return receipt
+
+    def flush(self):
+        """
+        Submits the pending transfers with transferManyBySig, ten per
+        transaction, and returns the number of transfers which were made.
+        """
+        made = 0
+
+        while self.pending:
+            batch = self.pending[:BATCH_SIZE]
+            self.pending = self.pending[BATCH_SIZE:]
+            batch += [EMPTY_TRANSFER] * (BATCH_SIZE - len(batch))
+
+            receipt = self.token.transact(
+                'transferManyBySig', *[list(column) for column in zip(*[
+                    (item.holder, item.to, item.amount, item.deadline, item.v, item.r, item.s) for item in batch
+                ])],
+                sender=self.sender,
+            )
+            self.receipts.append(receipt)
+
+            if not receipt.success:
+                raise RuntimeError('The batch was reverted: {0}'.format(receipt.error))
+
+            made += self.token.decode('transferManyBySig', receipt.output)
+
+        return made
+
+
+def run(transfers, holders, batched):
+    """
+    Relays the supplied number of transfers between the holders and returns
+    the relayer, after checking the balances and the nonces.
+    """
+    evm = LocalEVM(accounts=holders + 2)
+    owner, relayer_account = evm.accounts[:2]
+    keys = evm.keys[2:]
+    accounts = evm.accounts[2:]
+
+    token = deploy_token(evm, 'lockable_token', owner)
+    expected = {}
+
+    for account in accounts:
+        token.transact('transfer', account, transfers, sender=owner)
+        expected[account] = transfers
+
+    relayer = Relayer(token, relayer_account)
+    deadline = evm.timestamp + DEADLINE
+
+    for index in range(transfers):
+        key = keys[index % holders]
+        holder = accounts[index % holders]
+        to = accounts[(index + 1) % holders]
+        amount = index % 7 + 1
+
+        signed = relayer.sign(key, to, amount, deadline)
+        expected[holder] -= amount
+        expected[to] += amount
+
+        if not batched:
+            relayer.pending.remove(signed)
+            receipt = relayer.relay(signed)
+
+            if not receipt.success:
+                raise RuntimeError('transferBySig failed: {0}'.format(receipt.error))
+
+    if batched and relayer.flush() != transfers:
+        raise RuntimeError('Some of the signed transfers were not made.')
+
+    for account in accounts:
+        if token.call('balanceOf', account) != expected[account]:
+            raise RuntimeError('Unexpected balance of 0x{0}.'.format(account.hex()))
+
+        if token.call('nonces', account) != relayer.nonces[account]:
+            raise RuntimeError('Unexpected nonce of 0x{0}.'.format(account.hex()))
+
+    return relayer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transfers', type=int, default=100)
+    parser.add_argument('--holders', type=int, default=8)
+    args = parser.parse_args()
+
+    for label, batched in (('transferBySig', False), ('transferManyBySig', True)):
+        try:
+            relayer = run(args.transfers, args.holders, batched)
+        except RuntimeError as error:
+            print('FAILED ({0}): {1}'.format(label, error))
+            sys.exit(1)
+
+        gas = sum(receipt.gas_used for receipt in relayer.receipts)
+        print('{0:<18} {1:>6} transactions {2:>12} gas {3:>8.0f} gas per transfer'.format(
+            label, len(relayer.receipts), gas, gas / args.transfers
+        ))
+
+
+if __name__ == '__main__':
+    main()
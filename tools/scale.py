@@ -0,0 +1,392 @@
+"""
+Scaling benchmark of the token and vesting contracts with up to millions of holders.
+
+The token is deployed on the in-process EVM and its balances are seeded in
+batches up to each point of the curve, by default 1,000, 10,000, 100,000
+and 1,000,000 holders. Seeding does not go through transactions, which
+would take hours: the storage trie of the token is rebuilt bottom-up with
+the new balances, hashing every node once, and the total supply is raised
+to match. Every holder also gets an allowance for a spender, and every
+ADMIN_INTERVAL-th holder is made an administrator, so that allowed and
+admins grow with balances: a million holders come with a million
+allowances and 4,000 administrators.
+
+At every point transfer, transferFrom, mint, burn, addAdmin and the release
+of a vesting contract holding the token are measured on randomly chosen
+holders, transferFrom spending a seeded allowance and addAdmin re-adding a
+seeded administrator after removing it:
+the gas they use, which should not depend on the number of holders, and the
+wall clock time py-evm takes to apply them, which grows with the depth of
+the storage trie. The size of the storage of the token is reported as its
+number of slots and the number and total size of its trie nodes.
+
+The token can be built with build options. With --option dividends a
+distribution of dividends and their withdrawal by a holder are measured
+too, seeded holders get the dividend correction of a mint and the vesting
+contract is excluded from the dividends. lockable_token only fits the
+contract size limit with dividends when it is built with compact_errors too.
+
+Usage:
+
+    python -m tools.scale
+    python -m tools.scale --points 1000 10000 100000 --repeat 50 --output curve.json
+    python -m tools.scale --option dividends --option compact_errors --points 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import time
+from collections import OrderedDict
+
+import rlp
+from eth.constants import BLANK_ROOT_HASH
+from eth_utils import keccak
+
+from tools.build import TRANSFORMS, read_source, transform_source
+from tools.evm import LocalEVM
+from tools.scenarios import AMOUNT, DAY, deploy_token
+from tools.storage import storage_layout
+
+POINTS = [1000, 10000, 100000, 1000000]
+REPEAT = 20
+
+OPERATIONS = ('transfer', 'transferFrom', 'mint', 'burn', 'addAdmin', 'release', 'distributeDividends', 'withdrawDividend')
+
+# Seeded holders are numbered from here, clear of the LocalEVM accounts.
+FIRST_HOLDER = 2 ** 128
+
+# Every holder whose index is a multiple of this is an administrator.
+ADMIN_INTERVAL = 250
+
+
+def holder_address(index):
+    return (FIRST_HOLDER + index).to_bytes(20, 'big')
+
+
+def hex_prefix(path, leaf):
+    """
+    Returns the hex-prefix encoding of a path of nibbles given as hex text.
+    """
+    flag = 2 if leaf else 0
+
+    if len(path) % 2:
+        return bytes.fromhex('{0:x}{1}'.format(flag + 1, path))
+
+    return bytes.fromhex('{0:x}0{1}'.format(flag, path))
+
+
+def _reference(db, node):
+    encoded = rlp.encode(node)
+
+    if len(encoded) < 32:
+        return node
+
+    key = keccak(encoded)
+    db[key] = encoded
+    return key
+
+
+def _build(db, items, start, end, depth):
+    first = items[start][0]
+
+    if end - start == 1:
+        return [hex_prefix(first[depth:], True), items[start][1]]
+
+    # The keys are sorted, so the prefix shared by the first and the last is
+    # shared by all of them.
+    last = items[end - 1][0]
+    common = depth
+
+    while first[common] == last[common]:
+        common += 1
+
+    branch = [b''] * 17
+    index = start
+
+    while index < end:
+        nibble = items[index][0][common]
+        stop = index + 1
+
+        while stop < end and items[stop][0][common] == nibble:
+            stop += 1
+
+        branch[int(nibble, 16)] = _reference(db, _build(db, items, index, stop, common + 1))
+        index = stop
+
+    if common > depth:
+        return [hex_prefix(first[depth:common], False), _reference(db, branch)]
+
+    return branch
+
+
+def build_trie(db, items):
+    """
+    Writes the nodes of a hexary trie holding the supplied (hex key, value)
+    pairs, sorted by key, to the database and returns its root hash.
+    """
+    if not items:
+        return BLANK_ROOT_HASH
+
+    encoded = rlp.encode(_build(db, items, 0, len(items), 0))
+    root = keccak(encoded)
+    db[root] = encoded
+    return root
+
+
+def trie_items(db, root):
+    """
+    Returns the (hex key, value) pairs of a hexary trie, sorted by key, and
+    the number and total size of its nodes stored by hash.
+    """
+    items = []
+    nodes = 0
+    size = 0
+
+    if root == BLANK_ROOT_HASH:
+        return items, nodes, size
+
+    stack = [('', root)]
+
+    while stack:
+        path, node = stack.pop()
+
+        if isinstance(node, bytes):
+            encoded = db[node]
+            nodes += 1
+            size += len(encoded)
+            node = rlp.decode(encoded)
+
+        if len(node) == 17:
+            for nibble in range(15, -1, -1):
+                if node[nibble] != b'':
+                    stack.append((path + '{0:x}'.format(nibble), node[nibble]))
+
+            continue
+
+        key = node[0].hex()
+        flag = int(key[0], 16)
+        path += key[1:] if flag % 2 else key[2:]
+
+        if flag >= 2:
+            items.append((path, node[1]))
+        else:
+            stack.append((path, node[1]))
+
+    return items, nodes, size
+
+
+class ScaledToken(object):
+    """
+    A token and a vesting contract on a LocalEVM, with seeded holders.
+    """
+
+    def __init__(self, contract='lockable_token', options=()):
+        self.evm = LocalEVM()
+        self.owner, self.spender, self.beneficiary = self.evm.accounts[:3]
+        self.token = deploy_token(self.evm, contract, self.owner, options)
+
+        source = transform_source(read_source(contract), options)
+        slots = {variable.name: variable.slot for variable in storage_layout(source)}
+        self.balances_slot = slots['balances'].to_bytes(32, 'big')
+        self.allowed_slot = slots['allowed'].to_bytes(32, 'big')
+        self.admins_slot = slots['admins'].to_bytes(32, 'big') if 'admins' in slots else None
+        self.total_supply_slot = slots['totalSupply']
+        self.dividend_slots = None
+
+        if 'magnifiedDividendDebits' in slots:
+            self.dividend_slots = (slots['magnifiedDividendPerShare'], slots['magnifiedDividendDebits'].to_bytes(32, 'big'))
+
+        self.vesting = self.evm.deploy('token_vesting', self.beneficiary, self.evm.timestamp, 0, 3650 * DAY, True, sender=self.owner)
+
+        if 'excludeFromDividends' in self.token.functions:
+            self.token.transact('excludeFromDividends', self.vesting.address, sender=self.owner)
+
+        self.token.transact('transfer', self.vesting.address, 10 ** 6 * AMOUNT, sender=self.owner)
+        self.holders = 0
+
+    def storage_root(self):
+        return self.evm.state.account_db._get_account(self.token.address).storage_root
+
+    def seed(self, count):
+        """
+        Gives AMOUNT tokens and an allowance of AMOUNT for the spender to the
+        next `count` holders, makes every ADMIN_INTERVAL-th of them an
+        administrator and returns the time it took.
+        """
+        started = time.time()
+        account_db = self.evm.state.account_db
+        account_db.persist()
+
+        db = self.evm.state._db
+        items, nodes, size = trie_items(db, self.storage_root())
+        values = dict(items)
+        encoded = rlp.encode(AMOUNT)
+        debit = None
+
+        if self.dividend_slots:
+            # Like a mint, the debit makes up for the dividends distributed so far.
+            per_share = account_db.get_storage(self.token.address, self.dividend_slots[0])
+            debit = rlp.encode(per_share * AMOUNT) if per_share else None
+
+        spender = self.spender.rjust(32, b'\0')
+        admin = rlp.encode(1)
+
+        for index in range(self.holders, self.holders + count):
+            key = holder_address(index).rjust(32, b'\0')
+            values[keccak(keccak(self.balances_slot + key)).hex()] = encoded
+            values[keccak(keccak(keccak(self.allowed_slot + key) + spender)).hex()] = encoded
+
+            if self.admins_slot and index % ADMIN_INTERVAL == 0:
+                values[keccak(keccak(self.admins_slot + key)).hex()] = admin
+
+            if debit:
+                values[keccak(keccak(self.dividend_slots[1] + key)).hex()] = debit
+
+        root = build_trie(db, sorted(values.items()))
+        account = account_db._get_account(self.token.address)
+        account_db._set_account(self.token.address, account.copy(storage_root=root))
+
+        total_supply = account_db.get_storage(self.token.address, self.total_supply_slot)
+        account_db.set_storage(self.token.address, self.total_supply_slot, total_supply + count * AMOUNT)
+        account_db.persist()
+
+        self.holders += count
+        return time.time() - started
+
+    def storage_size(self):
+        self.evm.state.account_db.persist()
+        items, nodes, size = trie_items(self.evm.state._db, self.storage_root())
+        return len(items), nodes, size
+
+    def calls(self, operation, random_state):
+        """
+        Returns the (sender, contract, function, arguments, value) calls making
+        one measurement of an operation, the last of which is measured.
+        """
+        holder = holder_address(random_state.randrange(self.holders))
+        other = holder_address(random_state.randrange(self.holders))
+        token = self.token
+
+        if operation == 'transfer':
+            return [(holder, token, 'transfer', [other, 1], 0)]
+
+        if operation == 'transferFrom':
+            return [(self.spender, token, 'transferFrom', [holder, other, 1], 0)]
+
+        if operation == 'addAdmin':
+            admin = holder_address(ADMIN_INTERVAL * random_state.randrange(-(-self.holders // ADMIN_INTERVAL)))
+            return [
+                (self.owner, token, 'removeAdmin', [admin], 0),
+                (self.owner, token, 'addAdmin', [admin], 0),
+            ]
+
+        if operation == 'mint':
+            return [(self.owner, token, 'mint', [holder, 1], 0)]
+
+        if operation == 'burn':
+            return [(holder, token, 'burn', [1], 0)]
+
+        if operation == 'distributeDividends':
+            return [(self.owner, token, 'distributeDividends', [], AMOUNT)]
+
+        if operation == 'withdrawDividend':
+            return [
+                (self.owner, token, 'distributeDividends', [], AMOUNT),
+                (holder, token, 'withdrawDividend', [], 0),
+            ]
+
+        self.evm.timestamp += DAY
+        return [(self.beneficiary, self.vesting, 'release', [token.address], 0)]
+
+    def measure(self, operation, repeat, random_state):
+        """
+        Returns the average gas and wall clock time of an operation.
+        """
+        gas = 0
+        elapsed = 0
+
+        for _ in range(repeat):
+            *setup, (sender, contract, function, arguments, value) = self.calls(operation, random_state)
+
+            for setup_sender, setup_contract, setup_function, setup_arguments, setup_value in setup:
+                setup_contract.transact(setup_function, *setup_arguments, sender=setup_sender, value=setup_value)
+
+            data = contract.encode(function, *arguments)
+            started = time.time()
+            receipt = self.evm.execute(sender, contract.address, data, value=value)
+            elapsed += time.time() - started
+
+            if not receipt.success:
+                raise RuntimeError('{0} failed: {1}'.format(function, receipt.error))
+
+            gas += receipt.gas_used
+
+        return gas / repeat, elapsed / repeat
+
+
+def scaling_curve(points=POINTS, repeat=REPEAT, operations=OPERATIONS, contract='lockable_token', seed=0, log=print, options=()):
+    """
+    Seeds the holders up to every point and measures the operations there.
+    Operations the token does not have are skipped.
+    @return A list of points with the seeding time, the storage size and the
+    gas and time per operation.
+    """
+    scaled = ScaledToken(contract, options)
+    operations = [item for item in operations if item == 'release' or item in scaled.token.functions]
+    random_state = random.Random(seed)
+    curve = []
+
+    for holders in sorted(points):
+        seeding = scaled.seed(holders - scaled.holders)
+        slots, nodes, size = scaled.storage_size()
+
+        point = OrderedDict([
+            ('holders', holders),
+            ('seeding', seeding),
+            ('slots', slots),
+            ('nodes', nodes),
+            ('bytes', size),
+            ('operations', OrderedDict()),
+        ])
+
+        for operation in operations:
+            gas, elapsed = scaled.measure(operation, repeat, random_state)
+            point['operations'][operation] = OrderedDict([('gas', gas), ('seconds', elapsed)])
+
+        curve.append(point)
+
+        if log:
+            print_point(point, log)
+
+    return curve
+
+
+def print_point(point, log=print):
+    log('{0:>9} holders: seeded in {1:.1f}s, {2} slots, {3} trie nodes, {4:.1f} MB'.format(
+        point['holders'], point['seeding'], point['slots'], point['nodes'], point['bytes'] / 2 ** 20
+    ))
+
+    for operation, result in point['operations'].items():
+        log('    {0:<19} {1:>9.0f} gas {2:>8.2f} ms'.format(operation, result['gas'], result['seconds'] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, nargs='+', default=POINTS, metavar='HOLDERS')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='The number of measurements of each operation per point.')
+    parser.add_argument('--contract', default='lockable_token')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--option', action='append', default=[], choices=sorted(TRANSFORMS), dest='options',
+                        help='A build option of the token, such as dividends.')
+    parser.add_argument('--output', help='Writes the curve to a JSON file.')
+    args = parser.parse_args()
+
+    curve = scaling_curve(args.points, args.repeat, contract=args.contract, seed=args.seed, options=args.options)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(curve, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
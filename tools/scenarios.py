@@ -0,0 +1,244 @@
+"""
+Representative calls of the public functions of each contract.
+
+prepare() deploys a fresh contract on the supplied EVM, brings it into a
+state where the function succeeds and returns the call to make. The
+profiler and the gas tools share these scenarios so that their numbers are
+comparable.
+"""
+from collections import namedtuple
+
+from tools import merkle
+from tools.build import compile_contract
+from tools.model import CHAIN_ID, ZERO_ADDRESS
+
+SUPPLY = 10 ** 6 * 10 ** 18
+MAXIMUM_SUPPLY = 10 ** 7 * 10 ** 18
+AMOUNT = 10 ** 18
+
+DAY = 24 * 60 * 60
+
+Call = namedtuple('Call', ['contract', 'function', 'arguments', 'sender'])
+
+
+def token_arguments(name):
+    constructor = [item for item in compile_contract(name)['abi'] if item['type'] == 'constructor'][0]
+    inputs = [item['name'] for item in constructor['inputs']]
+    values = {
+        '_name': b'Name',
+        '_symbol': b'SYMBOL',
+        '_totalSupply': SUPPLY,
+        '_maximumSupply': MAXIMUM_SUPPLY,
+        '_decimals': 18,
+        '_chainId': CHAIN_ID,
+    }
+    return [values[item] for item in inputs]
+
+
+def deploy_token(evm, name, owner=None, options=()):
+    """
+    Deploys a token, built with the supplied build options, with the initial
+    supply assigned to the owner and transfers enabled.
+    """
+    owner = owner or evm.accounts[0]
+    token = evm.deploy(compile_contract(name, options), *token_arguments(name), sender=owner)
+
+    if 'transferLocked' in token.functions and token.call('transferLocked'):
+        token.transact('enableTransfers', sender=owner)
+
+    return token
+
+
+def constructor_arguments(evm, name, inputs):
+    """
+    Returns valid values for the supplied constructor parameters of a
+    contract. Contracts which hold a token get a fresh one.
+    """
+    values = dict(zip(['_name', '_symbol', '_totalSupply', '_maximumSupply', '_decimals', '_chainId'],
+                      [b'Name', b'SYMBOL', SUPPLY, MAXIMUM_SUPPLY, 18, CHAIN_ID]))
+    values.update({
+        '_beneficiary': evm.accounts[1],
+        '_start': evm.timestamp,
+        '_cliff': 30 * DAY,
+        '_duration': 365 * DAY,
+        '_revocable': True,
+        '_releaseTime': evm.timestamp + DAY,
+        '_merkleRoot': merkle.leaf_hash(0, evm.accounts[1], AMOUNT),
+        '_accept': True,
+    })
+
+    if '_token' in inputs:
+        values['_token'] = deploy_token(evm, 'erc20_standard_token').address
+
+    return [values[item] for item in inputs]
+
+
+def _load_votes(token, owner, pairs):
+    """
+    Opens a snapshot and gives every (account, delegatee) pair a delegate,
+    when the token has them, so that the next balance changes also record
+    the balances and votes of both sides.
+    """
+    if 'snapshot' in token.functions:
+        token.transact('snapshot', sender=owner)
+
+    if 'delegate' in token.functions:
+        for account, delegatee in pairs:
+            token.transact('delegate', delegatee, sender=account)
+
+
+def _token_call(evm, name, function, options, worst_case):
+    owner, holder, spender, recipient = evm.accounts[:4]
+    token = deploy_token(evm, name, owner, options)
+    amount = AMOUNT
+
+    # The holder and the recipient start with non-zero balances so that
+    # transfers measure the common case of updating existing balances. The
+    # worst case sends the whole balance of the holder to a new recipient,
+    # with a snapshot open and both sides delegating.
+    token.transact('transfer', holder, 10 * AMOUNT, sender=owner)
+    token.transact('approve', spender, 10 * AMOUNT, sender=holder)
+
+    if worst_case:
+        amount = 10 * AMOUNT
+        _load_votes(token, owner, [(holder, evm.accounts[4]), (recipient, evm.accounts[5]), (owner, evm.accounts[6])])
+    else:
+        token.transact('transfer', recipient, AMOUNT, sender=owner)
+
+    calls = {
+        'transfer': ([recipient, amount], holder),
+        'transferFrom': ([holder, recipient, amount], spender),
+        'approve': ([spender, AMOUNT], holder),
+        'increaseApproval': ([spender, AMOUNT], holder),
+        'decreaseApproval': ([spender, AMOUNT], holder),
+        'mint': ([recipient if worst_case else holder, AMOUNT], owner),
+        'burn': ([amount], holder),
+        'finishMinting': ([], owner),
+        'pause': ([], owner),
+        'disableTransfers': ([], owner),
+        'addAdmin': ([spender], owner),
+    }
+
+    if function not in calls or function not in token.functions:
+        return None
+
+    arguments, sender = calls[function]
+    return Call(token, function, arguments, sender)
+
+
+def _vesting_call(evm, function, options, worst_case):
+    owner, beneficiary = evm.accounts[:2]
+    token = deploy_token(evm, 'lockable_token' if worst_case else 'mintable_token', owner, options)
+
+    start = evm.timestamp
+    vesting = evm.deploy(compile_contract('token_vesting', options), beneficiary, start, 30 * DAY, 365 * DAY, True, sender=owner)
+    token.transact('transfer', vesting.address, 1000 * AMOUNT, sender=owner)
+
+    if worst_case:
+        _load_votes(token, owner, [(beneficiary, evm.accounts[4])])
+
+    evm.timestamp = start + 100 * DAY
+
+    tokens = [token.address] + [ZERO_ADDRESS] * 9
+
+    calls = {
+        'release': ([token.address], beneficiary),
+        'revoke': ([token.address], owner),
+        'releaseMany': ([tokens], beneficiary),
+        'revokeMany': ([tokens], owner),
+    }
+
+    if function not in calls:
+        return None
+
+    arguments, sender = calls[function]
+    return Call(vesting, function, arguments, sender)
+
+
+def _timelock_call(evm, function, options, worst_case):
+    owner, beneficiary = evm.accounts[:2]
+    token = deploy_token(evm, 'lockable_token' if worst_case else 'mintable_token', owner, options)
+
+    release_time = evm.timestamp + DAY
+    timelock = evm.deploy(compile_contract('token_timelock', options), token.address, beneficiary, release_time, sender=owner)
+    token.transact('transfer', timelock.address, 1000 * AMOUNT, sender=owner)
+
+    if worst_case:
+        _load_votes(token, owner, [(beneficiary, evm.accounts[4])])
+
+    evm.timestamp = release_time
+
+    if function != 'release':
+        return None
+
+    return Call(timelock, 'release', [], beneficiary)
+
+
+def _distributor_call(evm, function, options):
+    owner, first, second = evm.accounts[:3]
+    token = deploy_token(evm, 'erc20_standard_token', owner, options)
+
+    # A two entry tree: the root hashes both leaves in sorted order.
+    leaves = [merkle.leaf_hash(0, first, AMOUNT), merkle.leaf_hash(1, second, AMOUNT)]
+    distributor = evm.deploy(compile_contract('merkle_distributor', options), token.address, merkle.hash_pair(*leaves), sender=owner)
+    token.transact('transfer', distributor.address, 2 * AMOUNT, sender=owner)
+
+    if function != 'claim':
+        return None
+
+    return Call(distributor, 'claim', [1, second, AMOUNT, merkle.pad_proof([leaves[0]])], second)
+
+
+def _stream_call(evm, function, options):
+    owner, recipient = evm.accounts[:2]
+    token = deploy_token(evm, 'mintable_token', owner, options)
+    stream = evm.deploy(compile_contract('token_stream', options), sender=owner)
+    token.transact('approve', stream.address, 1000 * AMOUNT, sender=owner)
+
+    start = evm.timestamp + DAY
+    arguments = [recipient, token.address, AMOUNT // DAY, start, start + 365 * DAY]
+
+    if function == 'createStream':
+        return Call(stream, 'createStream', arguments, owner)
+
+    stream.transact('createStream', *arguments, sender=owner)
+    evm.timestamp = start + 100 * DAY
+
+    calls = {
+        'withdraw': ([1, AMOUNT], recipient),
+        'cancel': ([1], owner),
+    }
+
+    if function not in calls:
+        return None
+
+    arguments, sender = calls[function]
+    return Call(stream, function, arguments, sender)
+
+
+def prepare(evm, name, function, options=(), worst_case=False):
+    """
+    Returns the Call to make for `function` of contract `name`, or None when
+    there is no scenario for the function. The contracts are built with the
+    supplied build options. With worst_case, token transfers, mints, burns
+    and releases go to new recipients, with a snapshot open and delegates on
+    both sides, and vesting and timelocks hold a lockable_token, so that
+    they write every slot they can.
+    """
+    if name == 'token_vesting':
+        return _vesting_call(evm, function, options, worst_case)
+
+    if name == 'token_timelock':
+        return _timelock_call(evm, function, options, worst_case)
+
+    if name == 'merkle_distributor':
+        return _distributor_call(evm, function, options)
+
+    if name == 'token_stream':
+        return _stream_call(evm, function, options)
+
+    return _token_call(evm, name, function, options, worst_case)
+
+
+def run(call):
+    return call.contract.transact(call.function, *call.arguments, sender=call.sender)
@@ -0,0 +1,331 @@
+"""
+What-if simulator for batches of pending calls.
+
+A simulation file describes a setup and named scenarios:
+
+    {
+        "setup": {"contracts": [...], "transactions": [...]},
+        "scenarios": {
+            "mass-mint": [
+                {"contract": "token", "function": "mint", "arguments": ["@account3", "1000"], "sender": "@account0"},
+                ...
+            ]
+        }
+    }
+
+The setup is a tools.deploy manifest, deployed by account0 on a fresh
+in-process EVM. "@account0" to "@account9" refer to its funded accounts and
+"@id" to the contracts of the setup, in arguments and senders alike; the
+sender defaults to account0. Calls are applied as messages, so any account
+can be impersonated and nothing is signed.
+
+Every scenario runs on its own fork of the state after the setup, in a pool
+of worker processes. For every call the report has its gas, its outcome and
+its storage diff: the slots it changed with their old and new values,
+labelled as variable names (`token.balances[account3]`) where the key is a
+known address. The net diff of a scenario gives the final balances.
+
+Usage:
+
+    python -m tools.simulate simulation.json --processes 4 --output report.json
+    python -m tools.simulate --example 1000
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from collections import OrderedDict
+
+from eth_utils import keccak
+
+from tools.deploy import compile_entry, convert_argument, manifest_steps, read_json
+from tools.evm import LocalEVM, revert_reason
+from tools.storage import storage_layout
+
+ACCOUNTS = 10
+
+
+class SimulationError(Exception):
+    pass
+
+
+def setup_state(setup):
+    """
+    Deploys the setup manifest on a fresh EVM and returns it with the
+    addresses of its accounts and contracts by name.
+    """
+    evm = LocalEVM(accounts=ACCOUNTS)
+    deployer = evm.accounts[0]
+    addresses = OrderedDict(('account{0}'.format(index), account) for index, account in enumerate(evm.accounts))
+
+    for step in manifest_steps(setup):
+        to, data = step.transaction_data(addresses)
+
+        if step.is_deployment:
+            receipt, address = evm.deploy_code(data, sender=deployer, gas=step.gas())
+            addresses[step.key[len('deploy:'):]] = address
+        else:
+            receipt = evm.execute(deployer, to, data, gas=step.gas())
+
+        if not receipt.success:
+            raise SimulationError('Setup step {0} failed: {1}'.format(step.key, revert_reason(receipt.error) or receipt.error))
+
+    contracts = OrderedDict((entry['id'], entry) for entry in setup.get('contracts', []))
+    return evm, addresses, contracts
+
+
+def encode_calls(calls, addresses, contracts):
+    """
+    Encodes the calls of a scenario as (sender, to, data, gas) tuples.
+    """
+    steps = manifest_steps({'contracts': list(contracts.values()), 'transactions': calls})[len(contracts):]
+    encoded = []
+
+    for step, call in zip(steps, calls):
+        sender = convert_argument('address', call.get('sender', '@account0'), addresses)
+        to, data = step.transaction_data(addresses)
+        encoded.append((sender, to, data, step.gas()))
+
+    return encoded
+
+
+def run_scenario(payload):
+    """
+    Applies the calls of a scenario to a fork of the exported state and
+    returns (success, gas used, revert reason, storage diff) for each call.
+    Runs in a worker process.
+    """
+    state, calls = payload
+    evm = LocalEVM.from_state(state)
+    account_db = evm.state.account_db
+    set_storage = account_db.set_storage
+    touched = OrderedDict()
+
+    def recording_set_storage(address, slot, value):
+        if (address, slot) not in touched:
+            touched[address, slot] = account_db.get_storage(address, slot)
+
+        set_storage(address, slot, value)
+
+    account_db.set_storage = recording_set_storage
+    results = []
+
+    for sender, to, data, gas in calls:
+        touched.clear()
+        receipt = evm.execute(sender, to, data, gas=gas)
+        diff = []
+
+        if receipt.success:
+            for (address, slot), old in touched.items():
+                new = account_db.get_storage(address, slot)
+
+                if new != old:
+                    diff.append((address, slot, old, new))
+
+        results.append((receipt.success, receipt.gas_used, None if receipt.success else revert_reason(receipt.error), diff))
+
+    return results
+
+
+def slot_labels(addresses, contracts):
+    """
+    Names the slots of the storage variables of every contract, and the
+    mapping entries whose keys are known addresses.
+    """
+    names = {address: name for name, address in addresses.items()}
+    keys = [(name, address.rjust(32, b'\0')) for name, address in addresses.items()]
+    labels = {}
+
+    for contract_id, entry in contracts.items():
+        address = addresses[contract_id]
+
+        for variable in storage_layout(compile_entry(entry)['source']):
+            prefix = '{0}.{1}'.format(contract_id, variable.name)
+            base = variable.slot.to_bytes(32, 'big')
+            labels[address, variable.slot] = prefix
+
+            if not variable.type.startswith('map(address'):
+                continue
+
+            for key_name, key in keys:
+                slot = keccak(base + key)
+                labels[address, int.from_bytes(slot, 'big')] = '{0}[{1}]'.format(prefix, key_name)
+
+                if variable.type.startswith('map(address, map(address'):
+                    for inner_name, inner in keys:
+                        nested = int.from_bytes(keccak(slot + inner), 'big')
+                        labels[address, nested] = '{0}[{1}][{2}]'.format(prefix, key_name, inner_name)
+
+    return names, labels
+
+
+def label(names, labels, address, slot):
+    return labels.get((address, slot), '{0}[{1}]'.format(names.get(address, '0x' + address.hex()), hex(slot)))
+
+
+def net_diff(results):
+    """
+    Combines the diffs of the calls of a scenario into one diff from the
+    state before the first call to the state after the last one.
+    """
+    changes = OrderedDict()
+
+    for success, gas, reason, diff in results:
+        for address, slot, old, new in diff:
+            first = changes[address, slot][0] if (address, slot) in changes else old
+            changes[address, slot] = (first, new)
+
+    return [(address, slot, old, new) for (address, slot), (old, new) in changes.items() if old != new]
+
+
+def simulate(simulation, processes=None):
+    """
+    Runs the scenarios of a simulation and returns the report.
+    """
+    evm, addresses, contracts = setup_state(simulation.get('setup', {}))
+    state = evm.export_state()
+    scenarios = OrderedDict(simulation.get('scenarios', {}))
+
+    payloads = [(state, encode_calls(calls, addresses, contracts)) for calls in scenarios.values()]
+
+    started = time.time()
+
+    with multiprocessing.Pool(processes) as pool:
+        outcomes = pool.map(run_scenario, payloads)
+
+    elapsed = time.time() - started
+    names, labels = slot_labels(addresses, contracts)
+
+    def format_diff(diff):
+        return [
+            OrderedDict([('slot', label(names, labels, address, slot)), ('old', old), ('new', new)])
+            for address, slot, old, new in diff
+        ]
+
+    report = OrderedDict([('elapsed', elapsed), ('scenarios', OrderedDict())])
+
+    for (name, calls), results in zip(scenarios.items(), outcomes):
+        report['scenarios'][name] = OrderedDict([
+            ('calls', len(results)),
+            ('failed', sum(1 for result in results if not result[0])),
+            ('gas', sum(result[1] for result in results)),
+            ('diff', format_diff(net_diff(results))),
+            ('results', [
+                OrderedDict([
+                    ('function', call['function']),
+                    ('success', success),
+                    ('gas', gas),
+                    ('reason', reason),
+                    ('diff', format_diff(diff)),
+                ])
+                for call, (success, gas, reason, diff) in zip(calls, results)
+            ]),
+        ])
+
+    return report
+
+
+def print_report(report, limit=10):
+    for name, scenario in report['scenarios'].items():
+        print('{0}: {1} calls, {2} failed, {3} gas ({4:.0f} per call)'.format(
+            name, scenario['calls'], scenario['failed'], scenario['gas'], scenario['gas'] / max(scenario['calls'], 1)
+        ))
+
+        for change in scenario['diff'][:limit]:
+            print('    {0:<50} {1} -> {2}'.format(change['slot'], change['old'], change['new']))
+
+        if len(scenario['diff']) > limit:
+            print('    ... {0} more changed slots'.format(len(scenario['diff']) - limit))
+
+    print('{0} scenarios in {1:.1f}s'.format(len(report['scenarios']), report['elapsed']))
+
+
+def example(operations):
+    """
+    Returns a simulation of a mass mint, a burst of transfers after
+    enableTransfers and a bulk revoke of vesting contracts. The token of
+    the setup has its transfers locked, which would make every revoke fail,
+    so the bulk revoke enables them first.
+    """
+    supply = 10 ** 27
+    vestings = max(1, operations // 10)
+    holders = ['@account{0}'.format(index) for index in range(1, ACCOUNTS)]
+
+    contracts = [{
+        'id': 'token',
+        'contract': 'lockable_token',
+        'arguments': {
+            '_name': 'Token', '_symbol': 'TKN', '_totalSupply': str(supply), '_maximumSupply': str(2 * supply),
+            '_decimals': 18, '_chainId': 1,
+        },
+    }]
+    transactions = [
+        {'contract': 'token', 'function': 'transfer', 'arguments': [holder, str(10 ** 21)]} for holder in holders
+    ]
+
+    for index in range(vestings):
+        contracts.append({
+            'id': 'vesting{0}'.format(index),
+            'contract': 'token_vesting',
+            'arguments': {
+                '_beneficiary': holders[index % len(holders)], '_start': 1546300800, '_cliff': 0,
+                '_duration': 4 * 365 * 24 * 60 * 60, '_revocable': True,
+            },
+        })
+        transactions.append({'contract': 'token', 'function': 'transfer', 'arguments': ['@vesting{0}'.format(index), str(10 ** 21)]})
+
+    transfers = [{'contract': 'token', 'function': 'enableTransfers', 'arguments': []}]
+    transfers += [
+        {
+            'contract': 'token', 'function': 'transfer', 'sender': holders[index % len(holders)],
+            'arguments': [holders[(index + 1) % len(holders)], str(10 ** 18)],
+        }
+        for index in range(operations)
+    ]
+
+    return {
+        'setup': {'contracts': contracts, 'transactions': transactions},
+        'scenarios': OrderedDict([
+            ('mass-mint', [
+                {'contract': 'token', 'function': 'mint', 'arguments': [holders[index % len(holders)], str(10 ** 18)]}
+                for index in range(operations)
+            ]),
+            ('enable-and-transfer', transfers),
+            ('bulk-revoke', [{'contract': 'token', 'function': 'enableTransfers', 'arguments': []}] + [
+                {'contract': 'vesting{0}'.format(index), 'function': 'revoke', 'arguments': ['@token']}
+                for index in range(vestings)
+            ]),
+        ]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('simulation', nargs='?', help='The JSON simulation file.')
+    parser.add_argument('--processes', type=int, help='The number of worker processes, by default one per CPU.')
+    parser.add_argument('--output', help='Writes the full report with the result of every call to a JSON file.')
+    parser.add_argument('--example', type=int, metavar='OPERATIONS', help='Simulates the built-in example scenarios.')
+    args = parser.parse_args()
+
+    if args.example:
+        simulation = example(args.example)
+    elif args.simulation:
+        simulation = read_json(args.simulation)
+    else:
+        parser.error('a simulation file or --example is required')
+
+    try:
+        report = simulate(simulation, args.processes)
+    except (SimulationError, ValueError) as error:
+        print('FAILED: {0}'.format(error))
+        raise SystemExit(1)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
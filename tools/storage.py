@@ -0,0 +1,440 @@
+"""
+Storage layout and slot access report.
+
+For every contract this prints the storage layout and, for every public
+function, the storage variables it reads and writes (following calls to
+private functions and to the contract's own public functions). Mapping
+entries are listed with their key expressions, so `balances[msg.sender]`
+and `balances[_to]` count as two slots. The parameters in the keys of a
+called function are replaced by the arguments of each call, so a private
+function called for the sender and for the recipient counts the slots of
+both, and a parameter never adds a slot of its own. Accesses on every branch are
+included, so the static numbers are an upper bound.
+
+Vyper 0.1.0b6 gives every storage variable a full 32 byte slot. The report
+flags small variables that are accessed by the same functions and would fit
+in a single slot, together with the cold slot accesses (2100 gas each after
+the Berlin fork) that packing them would save.
+
+With --measure, the representative call of each function (see
+tools/scenarios.py) is traced and the slots it actually touched are listed.
+
+Usage:
+
+    python -m tools.storage lockable_token
+    python -m tools.storage lockable_token --measure
+    python -m tools.storage --json
+"""
+import argparse
+import ast
+import json
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+
+from vyper.parser import parser
+from vyper.parser.global_context import GlobalContext
+from vyper.types.types import BaseType, ListType, MappingType
+
+from tools.build import contract_names, read_source
+from tools.evm import LocalEVM
+from tools.scenarios import prepare, run
+from tools.trace import Tracer
+
+# Post-Berlin (EIP-2929) storage access costs.
+COLD_SLOAD_COST = 2100
+WARM_ACCESS_COST = 100
+
+SLOT_BITS = 256
+
+BITS = {
+    'bool': 1,
+    'address': 160,
+    'int128': 128,
+    'decimal': 168,
+}
+
+Variable = namedtuple('Variable', ['name', 'slot', 'type', 'bits'])
+
+
+def type_name(typ):
+    if isinstance(typ, MappingType):
+        return 'map({0}, {1})'.format(type_name(typ.keytype), type_name(typ.valuetype))
+
+    if isinstance(typ, ListType):
+        return '{0}[{1}]'.format(type_name(typ.subtype), typ.count)
+
+    return str(typ)
+
+
+def storage_layout(source):
+    """
+    Returns the storage variables in slot order. `bits` is the number of bits
+    the value needs, or None for mappings and other hashed types.
+    """
+    context = GlobalContext.get_global_context(parser.parse(source))
+    layout = []
+
+    for name, record in context._globals.items():
+        typ = record.typ
+
+        if isinstance(typ, BaseType):
+            bits = BITS.get(typ.typ, SLOT_BITS)
+        else:
+            bits = None
+
+        layout.append(Variable(name, record.pos, type_name(typ), bits))
+
+    return sorted(layout, key=lambda variable: variable.slot)
+
+
+def expression_text(node, arguments=None):
+    """
+    Returns the source text of a key expression, with the parameters of the
+    function replaced by the text of the arguments in `arguments`.
+    """
+    if isinstance(node, ast.Name):
+        return (arguments or {}).get(node.id, node.id)
+
+    if isinstance(node, ast.Attribute):
+        return '{0}.{1}'.format(expression_text(node.value, arguments), node.attr)
+
+    if isinstance(node, ast.Subscript):
+        return '{0}[{1}]'.format(expression_text(node.value, arguments), expression_text(subscript_key(node), arguments))
+
+    if isinstance(node, ast.Num):
+        return str(node.n)
+
+    return '...'
+
+
+def subscript_key(node):
+    return node.slice.value if isinstance(node.slice, ast.Index) else node.slice
+
+
+def storage_access(node, arguments=None):
+    """
+    Returns (variable, keys) for expressions like self.allowed[a][b], or None.
+    """
+    keys = []
+
+    while isinstance(node, ast.Subscript):
+        keys.insert(0, expression_text(subscript_key(node), arguments))
+        node = node.value
+
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'self':
+        return node.attr, tuple(keys)
+
+    return None
+
+
+def format_access(access):
+    variable, keys = access
+    return variable + ''.join('[{0}]'.format(key) for key in keys)
+
+
+class FunctionVisitor(ast.NodeVisitor):
+    """
+    Collects the storage reads, writes and self calls of a function body,
+    with the parameters of the function replaced by the text of the
+    arguments it was called with.
+    """
+
+    def __init__(self, variables, arguments=None):
+        self.variables = variables
+        self.arguments = arguments
+        self.reads = set()
+        self.writes = set()
+        self.calls = []
+
+    def _record(self, node, target):
+        access = storage_access(node, self.arguments)
+
+        if access and access[0] in self.variables:
+            target.add(access)
+            return True
+
+        return False
+
+    def visit_Assign(self, node):
+        for target in node.targets:
+            if not self._record(target, self.writes):
+                self.visit(target)
+
+        self.visit(node.value)
+
+    def visit_AugAssign(self, node):
+        if self._record(node.target, self.writes):
+            self._record(node.target, self.reads)
+        else:
+            self.visit(node.target)
+
+        self.visit(node.value)
+
+    def visit_Subscript(self, node):
+        if not self._record(node, self.reads):
+            self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if not self._record(node, self.reads):
+            self.generic_visit(node)
+
+    def visit_Call(self, node):
+        function = node.func
+
+        if isinstance(function, ast.Attribute) and isinstance(function.value, ast.Name) and function.value.id == 'self':
+            self.calls.append((function.attr, [expression_text(argument, self.arguments) for argument in node.args]))
+            for argument in node.args:
+                self.visit(argument)
+            return
+
+        self.generic_visit(node)
+
+
+def decorators(function):
+    return [decorator.id for decorator in function.decorator_list if isinstance(decorator, ast.Name)]
+
+
+def function_accesses(source):
+    """
+    Returns an ordered mapping of public function name to its (reads, writes),
+    including the accesses of the functions it calls on `self`, keyed by the
+    arguments of the calls: a private function called with `msg.sender` and
+    `_to` accesses balances[msg.sender] and balances[_to], not
+    balances[_account] once.
+    """
+    variables = {variable.name for variable in storage_layout(source)}
+    body = parser.parse(source)
+    functions = OrderedDict()
+    public = []
+
+    for node in body:
+        if isinstance(node, ast.FunctionDef):
+            functions[node.name] = node
+
+            if 'public' in decorators(node) and node.name != '__init__':
+                public.append(node.name)
+
+    def collect(name, arguments, seen):
+        visitor = FunctionVisitor(variables, arguments)
+
+        for statement in functions[name].body:
+            visitor.visit(statement)
+
+        reads, writes = set(visitor.reads), set(visitor.writes)
+
+        for callee, callee_arguments in visitor.calls:
+            if callee in functions and callee not in seen:
+                parameters = [argument.arg for argument in functions[callee].args.args]
+                callee_reads, callee_writes = collect(callee, dict(zip(parameters, callee_arguments)), seen | {callee})
+                reads |= callee_reads
+                writes |= callee_writes
+
+        return reads, writes
+
+    result = OrderedDict((name, collect(name, None, {name})) for name in public)
+
+    # Public storage variables have generated getters which read them.
+    for node in body:
+        if isinstance(node, ast.AnnAssign) and isinstance(node.annotation, ast.Call) \
+                and getattr(node.annotation.func, 'id', None) == 'public':
+            name = node.target.id
+            typ, keys = node.annotation.args[0], ()
+
+            while isinstance(typ, ast.Call) and getattr(typ.func, 'id', None) == 'map':
+                typ, keys = typ.args[1], keys + ('arg{0}'.format(len(keys)),)
+
+            result.setdefault(name, ({(name, keys)}, set()))
+
+    return result
+
+
+def packing_candidates(layout, accesses):
+    """
+    Groups small variables that share functions into candidate slots.
+    @return A list of (variables, savings) tuples, where savings maps every
+    function that would save cold slot accesses to the number saved.
+    """
+    small = {variable.name: variable for variable in layout if variable.bits is not None and variable.bits < SLOT_BITS}
+    users = defaultdict(set)
+
+    for function, (reads, writes) in accesses.items():
+        for variable, keys in reads | writes:
+            if variable in small and not keys:
+                users[variable].add(function)
+
+    together = Counter()
+    for first in users:
+        for second in users:
+            if first < second:
+                together[first, second] = len(users[first] & users[second])
+
+    groups = []
+    placed = set()
+
+    for (first, second), shared in together.most_common():
+        if shared == 0:
+            break
+
+        for group in groups:
+            bits = sum(small[name].bits for name in group)
+
+            if first in group and second not in placed and bits + small[second].bits <= SLOT_BITS:
+                group.append(second)
+                placed.add(second)
+            elif second in group and first not in placed and bits + small[first].bits <= SLOT_BITS:
+                group.append(first)
+                placed.add(first)
+
+        if first not in placed and second not in placed and small[first].bits + small[second].bits <= SLOT_BITS:
+            groups.append([first, second])
+            placed.update((first, second))
+
+    candidates = []
+
+    for group in groups:
+        savings = OrderedDict()
+
+        for function in accesses:
+            used = len([name for name in group if function in users[name]])
+
+            if used > 1:
+                savings[function] = used - 1
+
+        candidates.append((sorted(group, key=lambda name: small[name].slot), savings))
+
+    return candidates
+
+
+def measure(name, function):
+    """
+    Traces the representative call of a function and returns the storage
+    slots it read and wrote, labelled with variable names where possible.
+    """
+    evm = LocalEVM()
+    call = prepare(evm, name, function)
+
+    if call is None:
+        return None
+
+    with Tracer(evm) as tracer:
+        run(call)
+
+    layout = {variable.slot: variable.name for variable in storage_layout(read_source(name))}
+    labels = {slot: name for slot, name in layout.items()}
+
+    # Mapping slots are keccak256(slot ++ key); name them from the preimages.
+    for step in tracer.steps:
+        if step.mnemonic == 'SHA3' and len(step.arguments) == 2 and len(step.arguments[0]) == 64:
+            preimage, digest = step.arguments
+            base = int.from_bytes(preimage[:32], 'big')
+            key = preimage[32:]
+
+            if base in labels:
+                key_text = '0x' + key[12:].hex() if key[:12] == b'\0' * 12 else '0x' + key.hex()
+                labels[int.from_bytes(digest, 'big')] = '{0}[{1}]'.format(labels[base], key_text)
+
+    reads, writes = OrderedDict(), OrderedDict()
+
+    for step in tracer.steps:
+        if step.address != call.contract.address or step.mnemonic not in ('SLOAD', 'SSTORE'):
+            continue
+
+        slot = step.arguments[0]
+        target = reads if step.mnemonic == 'SLOAD' else writes
+        target[slot] = labels.get(slot, hex(slot))
+
+    return reads, writes
+
+
+def contract_report(name, with_measurements=False):
+    source = read_source(name)
+    layout = storage_layout(source)
+    accesses = function_accesses(source)
+
+    report = OrderedDict()
+    report['layout'] = [variable._asdict() for variable in layout]
+    report['functions'] = OrderedDict()
+
+    for function, (reads, writes) in accesses.items():
+        slots = reads | writes
+        entry = OrderedDict()
+        entry['reads'] = sorted(format_access(access) for access in reads)
+        entry['writes'] = sorted(format_access(access) for access in writes)
+        entry['slots'] = len(slots)
+        entry['cold_access_gas'] = len(slots) * COLD_SLOAD_COST
+
+        if with_measurements:
+            measured = measure(name, function)
+
+            if measured is not None:
+                measured_reads, measured_writes = measured
+                entry['measured_reads'] = list(measured_reads.values())
+                entry['measured_writes'] = list(measured_writes.values())
+                entry['measured_slots'] = len(set(measured_reads) | set(measured_writes))
+
+        report['functions'][function] = entry
+
+    report['packing'] = [
+        OrderedDict([('variables', group), ('saved_cold_accesses', savings)])
+        for group, savings in packing_candidates(layout, accesses)
+    ]
+
+    return report
+
+
+def print_report(name, report):
+    print('== {0}'.format(name))
+    print('')
+    print('{0:>5}  {1:<20} {2:<40} {3:>5}'.format('slot', 'variable', 'type', 'bits'))
+
+    for variable in report['layout']:
+        print('{0:>5}  {1:<20} {2:<40} {3:>5}'.format(
+            variable['slot'], variable['name'], variable['type'], variable['bits'] or 'hash'
+        ))
+
+    print('')
+
+    for function, entry in report['functions'].items():
+        print('{0}: {1} slots, {2} gas of cold accesses'.format(function, entry['slots'], entry['cold_access_gas']))
+        print('    reads:  {0}'.format(', '.join(entry['reads']) or '-'))
+        print('    writes: {0}'.format(', '.join(entry['writes']) or '-'))
+
+        if 'measured_slots' in entry:
+            print('    measured: {0} slots; reads {1}; writes {2}'.format(
+                entry['measured_slots'], ', '.join(entry['measured_reads']) or '-',
+                ', '.join(entry['measured_writes']) or '-'
+            ))
+
+    print('')
+
+    for candidate in report['packing']:
+        print('Packing opportunity: {0} fit in one slot. Cold slot accesses saved per call:'.format(
+            ', '.join(candidate['variables'])
+        ))
+
+        for function, saved in candidate['saved_cold_accesses'].items():
+            print('    {0:<20} {1} ({2} gas)'.format(function, saved, saved * (COLD_SLOAD_COST - WARM_ACCESS_COST)))
+
+    print('')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('contracts', nargs='*', help='Defaults to all contracts.')
+    parser.add_argument('--measure', action='store_true', help='Trace the representative call of each function.')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    reports = OrderedDict(
+        (name, contract_report(name, args.measure)) for name in (args.contracts or contract_names())
+    )
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for name, report in reports.items():
+        print_report(name, report)
+
+
+if __name__ == '__main__':
+    main()
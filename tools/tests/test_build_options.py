@@ -0,0 +1,136 @@
+import pytest
+from eth_utils import to_canonical_address
+
+from tools.evm import LocalEVM
+from tools.model import ZERO_ADDRESS
+from tools.scenarios import AMOUNT, SUPPLY, deploy_token
+
+TOKENS = ['burnable_token', 'erc20_standard_token', 'lockable_token', 'mintable_token', 'pausable_token']
+
+
+def holders(token):
+    return [to_canonical_address(token.call('holderAt', index)) for index in range(token.call('holderCount'))]
+
+
+@pytest.mark.parametrize('name', TOKENS)
+def test_holder_index_follows_transfers(name):
+    evm = LocalEVM()
+    owner, first, second = evm.accounts[:3]
+    token = deploy_token(evm, name, owner, ['holder_index'])
+
+    assert holders(token) == [owner]
+
+    token.transact('transfer', first, AMOUNT, sender=owner)
+    token.transact('transfer', second, AMOUNT, sender=owner)
+    assert holders(token) == [owner, first, second]
+
+    # Emptying a balance moves the last holder into its place.
+    token.transact('transfer', second, AMOUNT, sender=first)
+    assert holders(token) == [owner, second]
+    assert to_canonical_address(token.call('holderAt', 2)) == ZERO_ADDRESS
+
+    # Transfers of zero tokens neither add nor remove holders.
+    assert token.transact('transfer', first, 0, sender=second).success
+    assert token.transact('transfer', second, 0, sender=first).success
+    assert holders(token) == [owner, second]
+
+    token.transact('transfer', first, AMOUNT, sender=second)
+    assert holders(token) == [owner, second, first]
+
+
+@pytest.mark.parametrize('name', ['lockable_token', 'mintable_token'])
+def test_holder_index_follows_mints(name):
+    evm = LocalEVM()
+    owner, first = evm.accounts[:2]
+    token = deploy_token(evm, name, owner, ['holder_index'])
+
+    assert token.transact('mint', first, AMOUNT, sender=owner).success
+    assert holders(token) == [owner, first]
+
+
+@pytest.mark.parametrize('name', ['burnable_token', 'lockable_token'])
+def test_holder_index_follows_burns(name):
+    evm = LocalEVM()
+    owner, first = evm.accounts[:2]
+    token = deploy_token(evm, name, owner, ['holder_index'])
+    token.transact('transfer', first, AMOUNT, sender=owner)
+
+    assert token.transact('burn', AMOUNT, sender=first).success
+    assert holders(token) == [owner]
+
+
+DIVIDEND_TOKENS = ['lockable_token', 'mintable_token', 'pausable_token']
+DIVIDENDS = ['dividends', 'compact_errors']
+ETHER = 10 ** 18
+
+
+def deploy_dividends_token(name):
+    evm = LocalEVM()
+    owner, first = evm.accounts[:2]
+    token = deploy_token(evm, name, owner, DIVIDENDS)
+    token.transact('transfer', first, SUPPLY // 4, sender=owner)
+    return evm, token
+
+
+@pytest.mark.parametrize('name', DIVIDEND_TOKENS)
+def test_dividends_are_shared_by_balance(name):
+    evm, token = deploy_dividends_token(name)
+    owner, first, payer = evm.accounts[:3]
+
+    assert token.transact('distributeDividends', sender=payer, value=ETHER).success
+
+    # The share of each holder is rounded down by at most one wei.
+    assert ETHER // 4 - 1 <= token.call('dividendOf', first) <= ETHER // 4
+    assert 3 * ETHER // 4 - 1 <= token.call('dividendOf', owner) <= 3 * ETHER // 4
+    assert token.call('dividendOf', payer) == 0
+
+
+@pytest.mark.parametrize('name', DIVIDEND_TOKENS)
+def test_dividends_stay_with_the_holder_when_tokens_move(name):
+    evm, token = deploy_dividends_token(name)
+    owner, first, second = evm.accounts[:3]
+    token.transact('distributeDividends', sender=owner, value=ETHER)
+    earned = token.call('dividendOf', first)
+
+    token.transact('transfer', second, SUPPLY // 4, sender=first)
+
+    assert token.call('dividendOf', first) == earned
+    assert token.call('dividendOf', second) == 0
+
+
+@pytest.mark.parametrize('name', DIVIDEND_TOKENS)
+def test_withdraw_dividend_sends_the_dividends_once(name):
+    evm, token = deploy_dividends_token(name)
+    owner, first = evm.accounts[:2]
+    token.transact('distributeDividends', sender=owner, value=ETHER)
+    earned = token.call('dividendOf', first)
+    balance = evm.state.account_db.get_balance(first)
+
+    assert token.transact('withdrawDividend', sender=first).success
+    assert evm.state.account_db.get_balance(first) == balance + earned
+    assert token.call('withdrawnDividends', first) == earned
+    assert token.call('dividendOf', first) == 0
+    assert not token.transact('withdrawDividend', sender=first).success
+
+
+@pytest.mark.parametrize('name', DIVIDEND_TOKENS)
+def test_excluded_accounts_get_no_dividends(name):
+    evm, token = deploy_dividends_token(name)
+    owner, first = evm.accounts[:2]
+    token.transact('distributeDividends', sender=owner, value=ETHER)
+
+    assert not token.transact('excludeFromDividends', first, sender=first).success
+    assert token.transact('excludeFromDividends', first, sender=owner).success
+    assert token.call('dividendOf', first) == 0
+
+    # The other holders share the next distributions in full.
+    earned = token.call('dividendOf', owner)
+    token.transact('distributeDividends', sender=owner, value=ETHER)
+    assert ETHER - 1 <= token.call('dividendOf', owner) - earned <= ETHER
+
+
+def test_tokens_without_owner_have_no_dividends():
+    evm = LocalEVM()
+    token = deploy_token(evm, 'erc20_standard_token', options=DIVIDENDS)
+
+    assert 'distributeDividends' not in token.functions
@@ -0,0 +1,39 @@
+import pytest
+
+from tools.merkle import read_entries
+
+FIRST = '0x' + '11' * 20
+SECOND = '0x' + '22' * 20
+
+
+def write(tmp_path, lines):
+    path = tmp_path / 'entries.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def test_header_is_skipped(tmp_path):
+    path = write(tmp_path, ['account,amount', FIRST + ',1000', '', SECOND + ',2000'])
+
+    assert list(read_entries(path)) == [(0, bytes.fromhex('11' * 20), 1000), (1, bytes.fromhex('22' * 20), 2000)]
+
+
+def test_first_row_without_header_is_kept(tmp_path):
+    path = write(tmp_path, [FIRST + ',1000', SECOND + ',2000'])
+
+    assert [index for index, account, amount in read_entries(path)] == [0, 1]
+
+
+@pytest.mark.parametrize('amount', ['1e18', '', '1.5', '-'])
+def test_malformed_first_data_row_raises(tmp_path, amount):
+    path = write(tmp_path, ['account,amount', FIRST + ',' + amount, SECOND + ',2000'])
+
+    with pytest.raises(ValueError, match='line 2'):
+        list(read_entries(path))
+
+
+def test_malformed_address_raises(tmp_path):
+    path = write(tmp_path, [FIRST + ',1000', '0x1234,2000'])
+
+    with pytest.raises(ValueError, match='line 2'):
+        list(read_entries(path))
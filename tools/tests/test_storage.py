@@ -0,0 +1,36 @@
+from tools.storage import function_accesses
+
+SOURCE = '''
+balances: map(address, uint256)
+
+@private
+def credit(_account: address, _value: uint256):
+    self.balances[_account] += _value
+
+@private
+def move(_from: address, _to: address, _value: uint256):
+    self.balances[_from] -= _value
+    self.credit(_to, _value)
+
+@public
+def transfer(_to: address, _value: uint256):
+    self.move(msg.sender, _to, _value)
+
+@public
+def refund(_value: uint256):
+    self.credit(msg.sender, _value)
+    self.credit(msg.sender, 0)
+'''
+
+
+def test_parameters_are_replaced_by_the_arguments():
+    reads, writes = function_accesses(SOURCE)['transfer']
+
+    assert writes == {('balances', ('msg.sender',)), ('balances', ('_to',))}
+    assert reads == writes
+
+
+def test_calls_with_the_same_arguments_share_slots():
+    reads, writes = function_accesses(SOURCE)['refund']
+
+    assert writes == {('balances', ('msg.sender',))}
@@ -0,0 +1,294 @@
+"""
+Deterministic time-travel harness for token_vesting and token_timelock.
+
+Vesting schedules are generated from a seed, together with edge cases: no
+cliff, a cliff as long as the vesting, a one second vesting, amounts which
+do not divide evenly and very large amounts. Each schedule is deployed,
+funded and then swept across thousands of block timestamps on the
+in-process EVM, and checked against the Python model of tools/model.py:
+
+- Reads: getVestedAmount and getReleasableAmount at every timestamp in a
+  shuffled order, so that time travels backwards as well as forwards.
+  Nothing is persisted.
+- Releases: the timestamps are replayed in increasing order with a
+  release() at each of them, which must revert exactly when nothing is
+  releasable. Revocable schedules are revoked at a random timestamp on the
+  way. After every step the released amount and the balances of the
+  vesting contract, the beneficiary and the owner must match the model,
+  the released amount may only grow and no tokens may be created or lost.
+
+Timelocks are generated the same way, with edge cases releasing one second
+after deployment, a single token and very large amounts. Each timelock is
+swept across the timestamps in a shuffled order from a state snapshot:
+release() must revert before the release time and pay the whole balance to
+the beneficiary at or after it, a second release must revert as there is
+nothing left, and a release by anyone else must always revert.
+
+Every timestamp set includes the instants around the start, the end of the
+cliff and the end of the vesting, or around the release time. The same seed
+always sweeps the same schedules, timelocks and timestamps.
+
+Usage:
+
+    python -m tools.timetravel
+    python -m tools.timetravel --schedules 20 --timelocks 20 --timestamps 5000 --seed 7
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+
+from tools.evm import LocalEVM
+from tools.model import Revert, TimelockModel, VestingModel
+from tools.scenarios import DAY
+
+YEAR = 365 * DAY
+SUPPLY = 2 ** 200
+
+
+class Mismatch(Exception):
+    pass
+
+
+def make_schedules(count, random_state, now):
+    """
+    Returns (start, cliff, duration, revocable, amount) tuples, the edge
+    cases first and then random schedules up to `count`.
+    """
+    schedules = [
+        (now, 0, 4 * YEAR, True, 10 ** 24),
+        (now + DAY, YEAR, YEAR, True, 10 ** 21),
+        (now - YEAR, 90 * DAY, 2 * YEAR, False, 7),
+        (now, 0, 1, True, 10 ** 6 + 1),
+        (now + 30 * DAY, 30 * DAY, 3 * YEAR + 1, True, 10 ** 27 - 1),
+    ]
+
+    while len(schedules) < count:
+        duration = random_state.randint(1, 5 * YEAR)
+        schedules.append((
+            now + random_state.randint(-YEAR, YEAR),
+            random_state.randint(0, duration),
+            duration,
+            random_state.random() < 0.5,
+            random_state.choice([random_state.randint(1, 1000), random_state.randint(1, 10 ** 27)]),
+        ))
+
+    return schedules[:count]
+
+
+def make_timelocks(count, random_state, now):
+    """
+    Returns (release time, amount) pairs, the edge cases first and then
+    random timelocks up to `count`.
+    """
+    timelocks = [
+        (now + 1, 10 ** 24),
+        (now + YEAR, 1),
+        (now + DAY, 10 ** 27 - 1),
+    ]
+
+    while len(timelocks) < count:
+        timelocks.append((
+            now + random_state.randint(1, 5 * YEAR),
+            random_state.choice([random_state.randint(1, 1000), random_state.randint(1, 10 ** 27)]),
+        ))
+
+    return timelocks[:count]
+
+
+def make_timestamps(schedule, count, random_state):
+    """
+    Returns `count` sorted timestamps covering the schedule and a little
+    before and after it, including the instants around its boundaries.
+    """
+    start, cliff, duration = schedule[:3]
+    first = start - duration // 10 - 1
+    last = start + duration + duration // 10 + 1
+
+    edges = set()
+
+    for boundary in (start, start + cliff, start + duration):
+        edges.update((boundary - 1, boundary, boundary + 1))
+
+    timestamps = sorted(edge for edge in edges if edge >= 0)
+
+    while len(timestamps) < count:
+        timestamps.append(random_state.randint(max(first, 0), last))
+
+    return sorted(timestamps)
+
+
+def make_release_timestamps(now, release_time, count, random_state):
+    """
+    Returns `count` sorted timestamps from the deployment to a little after
+    the release time, including the instants around it.
+    """
+    last = release_time + (release_time - now) // 10 + 1
+    timestamps = [release_time - 1, release_time, release_time + 1]
+
+    while len(timestamps) < count:
+        timestamps.append(random_state.randint(now, last))
+
+    return sorted(timestamps)
+
+
+def check(name, expected, actual, timestamp):
+    if expected != actual:
+        raise Mismatch('{0} at {1}: expected {2}, got {3}'.format(name, timestamp, expected, actual))
+
+
+def sweep_reads(evm, vesting, token, model, timestamps, random_state, stats):
+    shuffled = list(timestamps)
+    random_state.shuffle(shuffled)
+
+    for timestamp in shuffled:
+        evm.timestamp = timestamp
+        check('getVestedAmount', model.getVestedAmount(timestamp), vesting.call('getVestedAmount', token.address), timestamp)
+        check('getReleasableAmount', model.getReleasableAmount(timestamp), vesting.call('getReleasableAmount', token.address), timestamp)
+        stats['reads'] += 2
+
+
+def sweep_releases(evm, vesting, token, model, timestamps, revoke_at, accounts, stats):
+    owner, beneficiary = accounts
+    amount = model.balance
+    owner_balance = token.call('balanceOf', owner)
+    refunded = 0
+    released = 0
+
+    for index, timestamp in enumerate(timestamps):
+        evm.timestamp = timestamp
+
+        if index == revoke_at:
+            refunded = model.revoke(timestamp)
+            receipt = vesting.transact('revoke', token.address, sender=owner)
+            check('revoke', True, receipt.success, timestamp)
+            stats['revokes'] += 1
+
+        try:
+            model.release(timestamp)
+            expected = True
+        except Revert:
+            expected = False
+
+        receipt = vesting.transact('release', token.address, sender=beneficiary)
+        check('release succeeds', expected, receipt.success, timestamp)
+        stats['releases' if expected else 'empty releases'] += 1
+
+        on_chain = vesting.call('released', token.address)
+        check('released', model.released, on_chain, timestamp)
+
+        if on_chain < released:
+            raise Mismatch('The released amount decreased at {0}.'.format(timestamp))
+
+        released = on_chain
+        check('vesting balance', model.balance, token.call('balanceOf', vesting.address), timestamp)
+        check('beneficiary balance', model.released, token.call('balanceOf', beneficiary), timestamp)
+        check('owner balance', owner_balance + refunded, token.call('balanceOf', owner), timestamp)
+        check('conservation', amount, model.balance + model.released + refunded, timestamp)
+
+
+def sweep_timelock(evm, timelock, token, model, timestamps, random_state, accounts, stats):
+    owner, beneficiary = accounts
+    shuffled = list(timestamps)
+    random_state.shuffle(shuffled)
+
+    for timestamp in shuffled:
+        evm.timestamp = timestamp
+        snapshot = evm.snapshot()
+
+        check('release by the owner', False, timelock.transact('release', sender=owner).success, timestamp)
+
+        expected = TimelockModel(model.beneficiary, model.releaseTime, model.balance)
+
+        try:
+            paid = expected.release(beneficiary, timestamp)
+        except Revert:
+            paid = 0
+
+        check('release succeeds', paid > 0, timelock.transact('release', sender=beneficiary).success, timestamp)
+        check('beneficiary balance', paid, token.call('balanceOf', beneficiary), timestamp)
+        check('timelock balance', expected.balance, token.call('balanceOf', timelock.address), timestamp)
+        check('second release succeeds', False, timelock.transact('release', sender=beneficiary).success, timestamp)
+        stats['timelock releases' if paid else 'early releases'] += 1
+
+        evm.revert(snapshot)
+
+
+def sweep(schedules=8, timestamps=2000, seed=0, timelocks=5):
+    """
+    Sweeps the schedules and the timelocks and returns the number of checks
+    of each kind.
+    """
+    random_state = random.Random(seed)
+    evm = LocalEVM(accounts=3)
+    owner = evm.accounts[0]
+    now = evm.timestamp
+    token = evm.deploy('erc20_standard_token', b'Vested', b'VST', SUPPLY, 18, sender=owner)
+    stats = Counter()
+
+    for index, schedule in enumerate(make_schedules(schedules, random_state, now)):
+        start, cliff, duration, revocable, amount = schedule
+        beneficiary = (index + 1).to_bytes(20, 'big')
+
+        vesting = evm.deploy('token_vesting', beneficiary, start, cliff, duration, revocable, sender=owner)
+        token.transact('transfer', vesting.address, amount, sender=owner)
+
+        times = make_timestamps(schedule, timestamps, random_state)
+        revoke_at = random_state.randrange(len(times)) if revocable else None
+
+        try:
+            sweep_reads(evm, vesting, token, VestingModel(start, cliff, duration, revocable, amount), times, random_state, stats)
+            sweep_releases(evm, vesting, token, VestingModel(start, cliff, duration, revocable, amount), times, revoke_at,
+                           (owner, beneficiary), stats)
+        except Mismatch as error:
+            raise Mismatch('Schedule {0} {1}: {2}'.format(index, schedule, error))
+
+        stats['schedules'] += 1
+        stats['timestamps'] += len(times)
+
+    for index, (release_time, amount) in enumerate(make_timelocks(timelocks, random_state, now)):
+        beneficiary = (schedules + index + 1).to_bytes(20, 'big')
+
+        evm.timestamp = now
+        timelock = evm.deploy('token_timelock', token.address, beneficiary, release_time, sender=owner)
+        token.transact('transfer', timelock.address, amount, sender=owner)
+
+        times = make_release_timestamps(now, release_time, timestamps, random_state)
+
+        try:
+            sweep_timelock(evm, timelock, token, TimelockModel(beneficiary, release_time, amount), times, random_state,
+                           (owner, beneficiary), stats)
+        except Mismatch as error:
+            raise Mismatch('Timelock {0} {1}: {2}'.format(index, (release_time, amount), error))
+
+        stats['timelocks'] += 1
+        stats['timestamps'] += len(times)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schedules', type=int, default=8)
+    parser.add_argument('--timelocks', type=int, default=5)
+    parser.add_argument('--timestamps', type=int, default=2000, help='The number of timestamps swept per schedule or timelock.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.time()
+
+    try:
+        stats = sweep(args.schedules, args.timestamps, args.seed, args.timelocks)
+    except Mismatch as error:
+        print('FAILED (seed {0}): {1}'.format(args.seed, error))
+        sys.exit(1)
+
+    for name, count in sorted(stats.items()):
+        print('{0:<16} {1:>10}'.format(name, count))
+
+    print('Swept in {0:.1f}s'.format(time.time() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Opcode level tracing for the in-process EVM.
+
+While a Tracer is active, every executed instruction is recorded with its
+call depth, code address, program counter and gas cost. The gas recorded
+for CALL, DELEGATECALL, STATICCALL and CREATE excludes the gas spent by the
+nested call, whose steps are recorded at depth + 1.
+
+    with Tracer(evm) as tracer:
+        token.transact('transfer', recipient, 100)
+
+    for step in tracer.steps:
+        ...
+"""
+from collections import namedtuple
+
+# `arguments` holds (slot,) for SLOAD, (slot, value) for SSTORE and
+# (preimage, digest) for SHA3. It is empty for other instructions.
+TraceStep = namedtuple('TraceStep', ['depth', 'address', 'pc', 'mnemonic', 'gas', 'arguments'])
+
+NESTED_CALLS = ('CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL', 'CREATE')
+LOGS = ('LOG0', 'LOG1', 'LOG2', 'LOG3', 'LOG4')
+
+
+def stack_item(computation, position):
+    value = computation._stack.values[-position]
+    return value if isinstance(value, int) else int.from_bytes(value, 'big')
+
+
+class TracedOpcode(object):
+
+    def __init__(self, opcode, tracer):
+        self.opcode = opcode
+        self.tracer = tracer
+        self.mnemonic = opcode.mnemonic
+        self.gas_cost = opcode.gas_cost
+
+    def __call__(self, computation):
+        pc = computation.code.pc - 1
+        gas = computation.get_gas_remaining()
+        mnemonic = self.mnemonic
+        arguments = ()
+
+        if mnemonic == 'SLOAD':
+            arguments = (stack_item(computation, 1),)
+        elif mnemonic == 'SSTORE':
+            arguments = (stack_item(computation, 1), stack_item(computation, 2))
+        elif mnemonic == 'SHA3':
+            start, size = stack_item(computation, 1), stack_item(computation, 2)
+            arguments = (computation.memory_read(start, size),)
+
+        steps = self.tracer.steps
+        first_nested = len(steps)
+
+        try:
+            self.opcode(computation=computation)
+        finally:
+            cost = gas - computation.get_gas_remaining()
+
+            if mnemonic in NESTED_CALLS:
+                # Every step recorded since the call started belongs to it.
+                cost -= sum(step.gas for step in steps[first_nested:])
+            elif mnemonic == 'SHA3' and computation._stack.values:
+                arguments += (stack_item(computation, 1).to_bytes(32, 'big'),)
+
+            steps.append(TraceStep(
+                computation.msg.depth,
+                computation.msg.storage_address,
+                pc,
+                mnemonic,
+                cost,
+                arguments,
+            ))
+
+
+class Tracer(object):
+    """
+    Records the instructions executed by a LocalEVM within a `with` block.
+    """
+
+    def __init__(self, evm):
+        self.computation_class = type(evm.state).computation_class
+        self.steps = []
+        self._opcodes = None
+
+    def __enter__(self):
+        self._opcodes = self.computation_class.opcodes
+        self.computation_class.opcodes = {
+            value: TracedOpcode(opcode, self) for value, opcode in self._opcodes.items()
+        }
+        return self
+
+    def __exit__(self, *exc_info):
+        self.computation_class.opcodes = self._opcodes
+        return False